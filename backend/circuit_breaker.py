@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+import numpy as np
+
+# Rolling window the error and slow-call rates are computed over
+CIRCUIT_WINDOW_SECONDS = float(os.environ.get('CIRCUIT_WINDOW_SECONDS', 60))
+# Calls needed in the window before a source can be judged
+CIRCUIT_MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', 5))
+# Failure share, and share of calls slower than CIRCUIT_SLOW_CALL_MS, that open the circuit
+CIRCUIT_ERROR_RATE = float(os.environ.get('CIRCUIT_ERROR_RATE', 0.5))
+CIRCUIT_SLOW_CALL_RATE = float(os.environ.get('CIRCUIT_SLOW_CALL_RATE', 0.8))
+CIRCUIT_SLOW_CALL_MS = float(os.environ.get('CIRCUIT_SLOW_CALL_MS', 5000))
+# How long an open circuit rejects calls before letting a probe through
+CIRCUIT_OPEN_SECONDS = float(os.environ.get('CIRCUIT_OPEN_SECONDS', 30))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Raised instead of calling a source whose circuit is open"""
+
+
+def _not_none(result):
+    return result is not None
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a rolling window of one source's calls
+
+    Closed: calls go through and their outcome and latency are recorded.
+    The circuit opens when the window holds at least CIRCUIT_MIN_CALLS and
+    either the error rate or the slow-call rate reaches its threshold.
+    Open: calls are rejected at once for CIRCUIT_OPEN_SECONDS. Half-open:
+    a single probe is let through; success closes the circuit with a fresh
+    window, failure opens it again. A probe that never reports back (e.g.
+    a cancelled request) is replaced after CIRCUIT_OPEN_SECONDS.
+
+    Safe to use from any thread.
+    """
+
+    def __init__(self, name, window_seconds=CIRCUIT_WINDOW_SECONDS, min_calls=CIRCUIT_MIN_CALLS,
+                 error_rate=CIRCUIT_ERROR_RATE, slow_call_rate=CIRCUIT_SLOW_CALL_RATE,
+                 slow_call_ms=CIRCUIT_SLOW_CALL_MS, open_seconds=CIRCUIT_OPEN_SECONDS):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call = slow_call_ms / 1000
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._calls = deque()
+        self._opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _prune(self, now):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _rates(self):
+        n = len(self._calls)
+        if not n:
+            return 0.0, 0.0
+        failures = sum(1 for _, ok, _ in self._calls if not ok)
+        slow = sum(1 for _, _, latency in self._calls if latency >= self.slow_call)
+        return failures / n, slow / n
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._probe_started = None
+        self.times_opened += 1
+
+    def allow(self):
+        """Whether a call may go to the source now; in half-open state this claims the probe"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probe_started is None or now - self._probe_started >= self.open_seconds:
+                    self._probe_started = now
+                    return True
+            elif self.state == CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def is_open(self):
+        with self._lock:
+            return self.state == OPEN
+
+    def record(self, ok, latency=0.0):
+        """Outcome and latency in seconds of a call let through by allow()"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if ok and latency < self.slow_call:
+                    self.state = CLOSED
+                    self._calls.clear()
+                    self._probe_started = None
+                else:
+                    self._open(now)
+                return
+            if self.state == OPEN:
+                return
+            self._calls.append((now, bool(ok), latency))
+            self._prune(now)
+            if len(self._calls) >= self.min_calls:
+                error_rate, slow_rate = self._rates()
+                if error_rate >= self.error_rate or slow_rate >= self.slow_call_rate:
+                    self._open(now)
+
+    def call(self, fn, *args, valid=_not_none, **kwargs):
+        """Call fn through the breaker; results failing `valid` and exceptions count as failures
+
+        Raises:
+            CircuitOpenError: The circuit is open and fn was not called
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit for {self.name} is open")
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(False, time.monotonic() - started)
+            raise
+        self.record(valid(result), time.monotonic() - started)
+        return result
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            state = self.state
+            if state == OPEN and now - self._opened_at >= self.open_seconds:
+                state = HALF_OPEN
+            error_rate, slow_rate = self._rates()
+            latencies = [latency for _, _, latency in self._calls]
+            stats = {
+                'state': state,
+                'calls': len(self._calls),
+                'error_rate': error_rate,
+                'slow_call_rate': slow_rate,
+                'p50_ms': float(np.percentile(latencies, 50)) * 1000 if latencies else None,
+                'p95_ms': float(np.percentile(latencies, 95)) * 1000 if latencies else None,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+                'retry_in_seconds': max(0.0, self._opened_at + self.open_seconds - now) if state == OPEN else 0.0,
+            }
+        # 1 for a healthy source, 0 for one that is being skipped
+        health = (1 - error_rate) * (1 - slow_rate)
+        stats['health'] = 0.0 if state == OPEN else health / 2 if state == HALF_OPEN else health
+        return stats
+
+
+class CircuitBreakerRegistry:
+    """One breaker per upstream source, created on first use"""
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name)
+            return self._breakers[name]
+
+    def stats(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.stats() for breaker in sorted(breakers, key=lambda b: b.name)}
+
+
+# Shared breakers for the whole process
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,234 @@
+"""Split-conformal prediction intervals from stored backtest residuals
+
+The nonconformity score of a forecast made at day t for day t + h is the
+absolute log error |log(close[t + h] / prediction_t)|. Scores are kept per
+coin and horizon in a small JSON file: a walk-forward pass of the coin's
+model over recent history (every origin scaled as a request made that day
+is) fills it, and every conformal forecast is kept as pending until its
+actual closes arrive and become new scores. The band
+for horizon h is prediction * exp(+-q_h), where q_h is the finite-sample
+conformal quantile of that horizon's scores, so serving needs one
+deterministic forward pass and a quantile lookup.
+"""
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Directory holding one residual file per coin
+CONFORMAL_STORE_DIR = os.environ.get('CONFORMAL_STORE_DIR', os.path.join('data', 'residuals'))
+# Most recent residuals kept per horizon; older ones age out as new closes arrive
+CONFORMAL_WINDOW = int(os.environ.get('CONFORMAL_WINDOW', 250))
+# History replayed by the walk-forward backfill
+CONFORMAL_BACKTEST_DAYS = int(os.environ.get('CONFORMAL_BACKTEST_DAYS', 365))
+# Miscoverage rate: 0.05 gives 95% intervals
+CONFORMAL_ALPHA = float(os.environ.get('CONFORMAL_ALPHA', 0.05))
+
+MAX_HORIZON = 30
+# Unresolved forecasts kept per coin, one per origin day
+MAX_PENDING = 2 * MAX_HORIZON
+
+
+def conformal_quantile(scores, alpha=CONFORMAL_ALPHA):
+    """The ceil((n + 1)(1 - alpha))-th smallest score, or None if n is too small for that level"""
+    n = len(scores)
+    k = math.ceil((n + 1) * (1 - alpha))
+    if k > n:
+        return None
+    return float(np.partition(np.asarray(scores, dtype=float), k - 1)[k - 1])
+
+
+def deterministic_predict(model, X):
+    """Single forward pass with dropout off, one scaled prediction per window"""
+    return np.asarray(model(np.ascontiguousarray(X, dtype=np.float32), training=False)).reshape(len(X), -1)[:, 0]
+
+
+def walk_forward_residuals(model, df, lookback=60, future_days=7, max_horizon=MAX_HORIZON):
+    """Scores of the model's next-day prediction at every origin of df against the following closes
+
+    Each origin's window and scaler cover the lookback + future_days days
+    ending there, as when a request is served that day
+    (prediction_utils.serving_windows).
+
+    Returns:
+        Mapping of horizon (1..max_horizon) to a list of scores, oldest first
+    """
+    from prediction_utils import serving_windows
+
+    windows, scale, offset = serving_windows(df, lookback, future_days)
+    predictions = (deterministic_predict(model, windows) - offset) / scale
+    closes = df['Close'].to_numpy(dtype=float)
+    span = lookback + future_days
+
+    residuals = {}
+    for h in range(1, max_horizon + 1):
+        # Window i ends at row i + span - 1, so its day-h target is row i + span + h - 1
+        n = len(closes) - span - h + 1
+        if n <= 0:
+            break
+        actual = closes[span + h - 1:span + h - 1 + n]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.abs(np.log(actual / predictions[:n]))
+        residuals[h] = scores[np.isfinite(scores)].tolist()
+    return residuals
+
+
+class ResidualStore:
+    """Per-coin store of conformal scores and of forecasts waiting for their closes
+
+    Each file remembers the mtime of the model that produced its scores; a
+    retrained model makes them stale and they are rebuilt by a backfill.
+    Files are replaced atomically, so several processes can share them.
+    """
+
+    def __init__(self, root=CONFORMAL_STORE_DIR, window=CONFORMAL_WINDOW):
+        self.root = root
+        self.window = window
+        self._lock = threading.Lock()
+        self.backfills = 0
+        self.resolved = 0
+
+    def _path(self, coin):
+        return os.path.join(self.root, f"{coin.upper()}.json")
+
+    def _load(self, coin):
+        try:
+            with open(self._path(coin)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, coin, state):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(coin)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def is_current(self, coin, model_mtime):
+        state = self._load(coin)
+        return state is not None and state.get('model_mtime') == model_mtime
+
+    def replace(self, coin, model_mtime, residuals):
+        """Start over with the scores of a new model"""
+        state = {
+            'model_mtime': model_mtime,
+            'residuals': {str(h): scores[-self.window:] for h, scores in residuals.items()},
+            'pending': [],
+        }
+        with self._lock:
+            self._save(coin, state)
+            self.backfills += 1
+
+    def record_forecast(self, coin, origin, prediction, horizons):
+        """Remember a served forecast so its errors are scored once the closes arrive"""
+        origin = pd.Timestamp(origin).strftime('%Y-%m-%d')
+        with self._lock:
+            state = self._load(coin)
+            if state is None:
+                return
+            pending = [p for p in state['pending'] if p['origin'] != origin]
+            pending.append({'origin': origin, 'prediction': float(prediction), 'horizons': int(horizons), 'next': 1})
+            state['pending'] = pending[-MAX_PENDING:]
+            self._save(coin, state)
+
+    def resolve(self, coin, closes):
+        """Score pending forecasts against the closes that have arrived since
+
+        Args:
+            closes: Close price Series indexed by day
+
+        Returns:
+            Number of new scores
+        """
+        closes = closes.copy()
+        closes.index = pd.DatetimeIndex(closes.index).normalize()
+        with self._lock:
+            state = self._load(coin)
+            if state is None or not state['pending']:
+                return 0
+            added, pending = 0, []
+            for forecast in state['pending']:
+                origin = pd.Timestamp(forecast['origin'])
+                h = forecast['next']
+                while h <= forecast['horizons']:
+                    target = origin + pd.Timedelta(days=h)
+                    if target not in closes.index:
+                        break
+                    scores = state['residuals'].setdefault(str(h), [])
+                    scores.append(abs(math.log(float(closes.loc[target]) / forecast['prediction'])))
+                    del scores[:-self.window]
+                    added += 1
+                    h += 1
+                if h <= forecast['horizons']:
+                    pending.append(dict(forecast, next=h))
+            state['pending'] = pending
+            if added:
+                self._save(coin, state)
+                self.resolved += added
+            return added
+
+    def quantiles(self, coin, future_days, alpha=CONFORMAL_ALPHA):
+        """Conformal quantile for horizons 1..future_days, or None if any horizon has too few scores"""
+        state = self._load(coin)
+        if state is None:
+            return None
+        quantiles = [conformal_quantile(state['residuals'].get(str(h), []), alpha) for h in range(1, future_days + 1)]
+        return None if any(q is None for q in quantiles) else np.array(quantiles)
+
+    def stats(self):
+        return {
+            'backfills': self.backfills,
+            'resolved': self.resolved,
+        }
+
+
+# Shared residual store for the whole process
+residual_store = ResidualStore()
+
+
+def backfill_residuals(coin_symbol, model, model_path, lookback=60, future_days=7):
+    """Rebuild a coin's scores from a walk-forward pass over its recent history"""
+    from prediction_utils import prepare_data
+
+    df, _, _ = prepare_data(coin_symbol, lookback, CONFORMAL_BACKTEST_DAYS + future_days)
+    residuals = walk_forward_residuals(model, df, lookback, future_days)
+    residual_store.replace(coin_symbol, os.path.getmtime(model_path), residuals)
+    print(f"[DEBUG] Conformal backfill for {coin_symbol}: {len(residuals.get(1, []))} day-1 residuals")
+
+
+def conformal_forecast(coin_symbol, model, model_path, df, last_sequence, scaler, future_days,
+                       alpha=CONFORMAL_ALPHA, deadline=None):
+    """Next-day prediction with split-conformal bands for every day of the horizon
+
+    A request with a deadline.Deadline doesn't wait for a backfill; it gets
+    None (and the 'conformal_backfill_skipped' degradation) instead.
+
+    Returns:
+        Dictionary of per-day arrays in price units: mean, lower, upper; or
+        None when the coin doesn't have enough scores for the requested level
+    """
+    if not residual_store.is_current(coin_symbol, os.path.getmtime(model_path)):
+        if deadline is not None:
+            deadline.degrade('conformal_backfill_skipped')
+            return None
+        backfill_residuals(coin_symbol, model, model_path, len(last_sequence), future_days)
+    residual_store.resolve(coin_symbol, df['Close'])
+
+    quantiles = residual_store.quantiles(coin_symbol, future_days, alpha)
+    if quantiles is None:
+        return None
+    prediction = (deterministic_predict(model, last_sequence[None])[0] - scaler.min_[0]) / scaler.scale_[0]
+    if not np.isfinite(prediction) or prediction <= 0:
+        return None
+    residual_store.record_forecast(coin_symbol, df.index[-1], prediction, future_days)
+    mean = np.full(future_days, prediction)
+    return {
+        'mean': mean,
+        'lower': mean * np.exp(-quantiles),
+        'upper': mean * np.exp(quantiles),
+    }
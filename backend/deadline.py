@@ -0,0 +1,41 @@
+import os
+import time
+
+# Share of a request's time budget the data fetch may use
+DEADLINE_DATA_SHARE = float(os.environ.get('DEADLINE_DATA_SHARE', 0.5))
+# Smallest budget worth starting another upstream source with
+DEADLINE_MIN_SOURCE_MS = int(os.environ.get('DEADLINE_MIN_SOURCE_MS', 500))
+# Time kept back for drawing the plots; with less left they are dropped
+DEADLINE_PLOT_RESERVE_MS = int(os.environ.get('DEADLINE_PLOT_RESERVE_MS', 400))
+
+
+class Deadline:
+    """Time budget of one request, shared by the stages of the prediction pipeline
+
+    Stages get their own Deadline from stage(), which never outlives the
+    parent; all of them record into the same list of degradations, so the
+    response can say which shortcuts were taken.
+    """
+
+    def __init__(self, budget_ms, expires_at=None, degradations=None):
+        self.budget = budget_ms / 1000
+        self.expires_at = expires_at if expires_at is not None else time.monotonic() + self.budget
+        self.degradations = degradations if degradations is not None else []
+
+    def remaining(self):
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def stage(self, share=1.0, reserve_ms=0):
+        """Deadline for one stage: at most `share` of the whole budget from now,
+        ending `reserve_ms` early to leave time for the stages after it"""
+        expires_at = min(self.expires_at - reserve_ms / 1000, time.monotonic() + share * self.budget)
+        return Deadline(self.budget * 1000, expires_at, self.degradations)
+
+    def degrade(self, name):
+        """Record a shortcut taken to stay within the budget"""
+        if name not in self.degradations:
+            self.degradations.append(name)
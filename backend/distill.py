@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from mc_dropout import mc_sample
+from model_registry import model_registry
+
+# MC dropout samples drawn from the teacher per training window
+DISTILL_TEACHER_SAMPLES = int(os.environ.get('DISTILL_TEACHER_SAMPLES', 100))
+# History used to distill; more windows give the student more teacher behaviour to copy
+DISTILL_TRAINING_DAYS = int(os.environ.get('DISTILL_TRAINING_DAYS', 730))
+# Jittered copies of every training window, and the noise (in scaled units) added to them.
+# The teacher labels them too, so the student sees inputs around the real windows
+DISTILL_AUGMENT_COPIES = int(os.environ.get('DISTILL_AUGMENT_COPIES', 3))
+DISTILL_AUGMENT_NOISE = float(os.environ.get('DISTILL_AUGMENT_NOISE', 0.02))
+
+# z-score of the two-sided 95% interval the student reports
+INTERVAL_Z = 1.959964
+
+
+def student_model_path_for(coin_symbol):
+    """Path of the saved distilled mean/variance model for a coin"""
+    return f'models/{coin_symbol.replace("-", "_")}_student_model.h5'
+
+
+def student_model_mtime(coin_symbol):
+    """Modification time of the coin's student model, or None if it has none"""
+    try:
+        return os.path.getmtime(student_model_path_for(coin_symbol))
+    except OSError:
+        return None
+
+
+def get_student_model(coin_symbol):
+    """Registry-cached student model for a coin, or None if none was distilled"""
+    from prediction_utils import load_prediction_model
+
+    model_path = student_model_path_for(coin_symbol)
+    if not os.path.exists(model_path):
+        return None
+    return model_registry.get(coin_symbol, model_path, load_prediction_model)
+
+
+def student_predict(model, X):
+    """Mean, std and 95% bounds from one deterministic pass of the student
+
+    Returns the same (mean, std, lower, upper) tuple, in scaled units, as
+    prediction_utils.mc_predict does for a single window.
+    """
+    output = np.asarray(model(np.asarray(X, dtype=np.float32), training=False)).reshape(-1, 2)
+    mean, log_var = output[0]
+    std = float(np.exp(0.5 * log_var))
+    return float(mean), std, float(mean - INTERVAL_Z * std), float(mean + INTERVAL_Z * std)
+
+
+def teacher_statistics(teacher, windows, n_samples=DISTILL_TEACHER_SAMPLES, chunk_size=None):
+    """Per-window mean, std and 95% quantile band of the teacher's MC dropout samples"""
+    samples = mc_sample(teacher, np.ascontiguousarray(windows, dtype=np.float32), n_samples, chunk_size)
+    lower, upper = np.quantile(samples, (0.025, 0.975), axis=0)
+    return samples.mean(axis=0), samples.std(axis=0), lower, upper
+
+
+def calibration_report(student, teacher_stats, windows, actual):
+    """Compare the student's intervals with the teacher's on held-out windows
+
+    Args:
+        teacher_stats: (mean, std, lower, upper) from teacher_statistics
+        actual: Realized next scaled close of every window
+
+    Returns:
+        Dictionary with mean/std agreement, interval overlap and the
+        empirical coverage of both 95% intervals
+    """
+    output = np.asarray(student(np.ascontiguousarray(windows, dtype=np.float32), training=False)).reshape(-1, 2)
+    mean, std = output[:, 0], np.exp(0.5 * output[:, 1])
+    lower, upper = mean - INTERVAL_Z * std, mean + INTERVAL_Z * std
+    t_mean, t_std, t_lower, t_upper = teacher_stats
+
+    overlap = np.clip(np.minimum(upper, t_upper) - np.maximum(lower, t_lower), 0, None)
+    union = np.maximum(upper, t_upper) - np.minimum(lower, t_lower)
+    return {
+        'windows': int(len(windows)),
+        'mean_abs_diff': float(np.abs(mean - t_mean).mean()),
+        'std_ratio': float(np.median(std / np.maximum(t_std, 1e-12))),
+        'interval_iou': float(np.mean(np.where(union > 0, overlap / np.maximum(union, 1e-12), 1.0))),
+        'student_coverage': float(np.mean((actual >= lower) & (actual <= upper))),
+        'teacher_coverage': float(np.mean((actual >= t_lower) & (actual <= t_upper))),
+        'nominal_coverage': 0.95,
+    }
+
+
+def distill_student_model(coin_symbol, windows, actual, teacher, epochs=50, validation_split=0.2,
+                          n_samples=DISTILL_TEACHER_SAMPLES, on_epoch_end=None, trained_through=None, seed=None,
+                          scaling_days=None):
+    """Train a small mean/log-variance network on the teacher's MC dropout statistics
+
+    The student is a Sequential LSTM with a two-unit head, fitted with MSE to
+    [teacher mean, log teacher variance], so it loads and serves like any
+    other model (including on the NumPy backend). It trains on the earlier
+    windows plus jittered copies of them; the last validation_split of the
+    windows is never seen and feeds the calibration report, which is stored
+    in the model's metadata.
+
+    Args:
+        windows: Windows scaled per origin as a request scales them, shape
+            (origins, lookback, features) (see prediction_utils.serving_windows)
+        actual: Realized next close of every window, in that window's scale
+        scaling_days: Days each window was scaled over, recorded in the metadata
+
+    Returns:
+        (model, history, report)
+    """
+    import tensorflow as tf
+
+    from prediction_utils import save_model
+
+    keras = tf.keras
+    rng = np.random.default_rng(seed)
+    windows = np.ascontiguousarray(windows, dtype=np.float32)
+    _, lookback, n_features = windows.shape
+    n_train = int(len(windows) * (1 - validation_split))
+    if n_train == 0:
+        raise ValueError(f"Not enough data to distill: {len(windows)} windows of {lookback} days")
+
+    X = windows[:n_train]
+    X = np.concatenate([X] + [X + rng.normal(0, DISTILL_AUGMENT_NOISE, X.shape).astype(np.float32)
+                              for _ in range(DISTILL_AUGMENT_COPIES)])
+    X = X[rng.permutation(len(X))]
+    print(f"[DEBUG] Sampling teacher statistics for {len(X)} training windows of {coin_symbol}")
+    t_mean, t_std, _, _ = teacher_statistics(teacher, X, n_samples)
+    targets = np.stack([t_mean, np.log(np.maximum(t_std, 1e-6) ** 2)], axis=1).astype(np.float32)
+
+    model = keras.Sequential([
+        keras.layers.LSTM(32, return_sequences=False, input_shape=(lookback, n_features)),
+        keras.layers.Dense(16, activation='relu'),
+        keras.layers.Dense(2)
+    ])
+    model.compile(optimizer='adam', loss='mse')
+
+    callbacks = [keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)]
+    if on_epoch_end is not None:
+        callbacks.append(keras.callbacks.LambdaCallback(on_epoch_end=on_epoch_end))
+    history = model.fit(X, targets, validation_split=0.1, epochs=epochs, batch_size=32,
+                        callbacks=callbacks, verbose=0)
+
+    held_out = windows[n_train:]
+    report = calibration_report(model, teacher_statistics(teacher, held_out, n_samples), held_out,
+                                actual[n_train:])
+    print(f"[DEBUG] Student calibration for {coin_symbol}: {report}")
+
+    save_model(coin_symbol, model, {
+        'mode': 'distill',
+        'lookback': lookback,
+        'scaling_days': scaling_days,
+        'teacher_samples': n_samples,
+        'augment_copies': DISTILL_AUGMENT_COPIES,
+        'trained_through': pd.Timestamp(trained_through).isoformat() if trained_through is not None else None,
+        'calibration': report,
+    }, model_path=student_model_path_for(coin_symbol))
+    return model, history, report
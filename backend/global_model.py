@@ -0,0 +1,315 @@
+"""Single forecasting model shared by every coin
+
+One LSTM is trained on the scaled Close/RSI/MACD/Signal windows of many
+coins at once, with a learned embedding of the coin id appended to every
+timestep. Features are MinMax-scaled per coin (as for per-coin models), so
+the network sees comparable inputs across coins. Index 0 of the embedding
+is reserved for coins that were not in the training set; it is trained by
+randomly hiding the coin id of a fraction of the windows.
+
+Usage:
+    python global_model.py BTC-USD ETH-USD SOL-USD --epochs 30
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from mc_dropout import MC_CHUNK_SIZE
+from model_registry import model_registry
+from windowing import sliding_windows, window_targets
+
+GLOBAL_MODEL_PATH = os.environ.get('GLOBAL_MODEL_PATH', os.path.join('models', 'global_model.h5'))
+# 'off' never uses the global model, 'fallback' uses it for coins without
+# their own model, 'always' serves every coin from it
+GLOBAL_MODEL_MODE = os.environ.get('GLOBAL_MODEL_MODE', 'fallback').lower()
+GLOBAL_EMBEDDING_DIM = int(os.environ.get('GLOBAL_EMBEDDING_DIM', 8))
+# Share of training windows whose coin id is hidden, to train the unknown-coin embedding
+GLOBAL_UNKNOWN_RATE = float(os.environ.get('GLOBAL_UNKNOWN_RATE', 0.1))
+
+UNKNOWN_COIN = 0
+
+
+def vocabulary_path_for(model_path):
+    return f"{model_path[:-3]}.coins.json"
+
+
+class CoinBoundModel:
+    """View of the global model for one coin with the per-coin model interface
+
+    model(X, training=...) and input_shape behave like a per-coin Keras model,
+    so MC dropout and rollout code can use it unchanged.
+    """
+
+    def __init__(self, global_model, coin_symbol):
+        self.global_model = global_model
+        self.coin_symbol = coin_symbol
+        self.input_shape = global_model.input_shape
+
+    def __call__(self, X, training=False):
+        return self.global_model(X, coins=[self.coin_symbol] * len(X), training=training)
+
+    def predict(self, X, verbose=0):
+        return np.asarray(self(X, training=False))
+
+
+class GlobalModel:
+    """Loaded global Keras model together with its coin vocabulary"""
+
+    def __init__(self, model, vocabulary):
+        self.model = model
+        self.vocabulary = vocabulary
+        self.input_shape = model.input_shape[0]
+
+    def coin_index(self, coin_symbol):
+        return self.vocabulary.get(coin_symbol, UNKNOWN_COIN)
+
+    def count_params(self):
+        return self.model.count_params()
+
+    def __call__(self, X, coins=None, training=False):
+        X = np.asarray(X, dtype=np.float32)
+        if coins is None:
+            ids = np.full((len(X), 1), UNKNOWN_COIN, dtype=np.int32)
+        else:
+            ids = np.array([[self.coin_index(coin)] for coin in coins], dtype=np.int32)
+        return self.model([X, ids], training=training)
+
+    def for_coin(self, coin_symbol):
+        return CoinBoundModel(self, coin_symbol)
+
+    def mc_sample_many(self, windows_by_coin, n_samples=100, chunk_size=None):
+        """MC dropout next-step samples for many coins in shared forward passes
+
+        Args:
+            windows_by_coin: Mapping of coin symbol to a scaled (lookback, features) window
+
+        Returns:
+            Mapping of coin symbol to an (n_samples,) array of scaled predictions
+        """
+        coins = list(windows_by_coin)
+        if not coins:
+            return {}
+        X = np.repeat(np.stack([np.asarray(windows_by_coin[coin], dtype=np.float32) for coin in coins]),
+                      n_samples, axis=0)
+        ids = np.repeat(np.array([self.coin_index(coin) for coin in coins], dtype=np.int32), n_samples)[:, None]
+
+        chunk_size = chunk_size or MC_CHUNK_SIZE
+        preds = np.empty(len(X), dtype=np.float32)
+        for start in range(0, len(X), chunk_size):
+            stop = start + chunk_size
+            preds[start:stop] = np.asarray(self.model([X[start:stop], ids[start:stop]], training=True)).reshape(-1)
+        return {coin: preds[i * n_samples:(i + 1) * n_samples] for i, coin in enumerate(coins)}
+
+
+def load_global_model(model_path=GLOBAL_MODEL_PATH):
+    """Load the global model and its coin vocabulary from disk"""
+    from prediction_utils import load_keras_model
+
+    with open(vocabulary_path_for(model_path)) as f:
+        vocabulary = json.load(f)['coins']
+    return GlobalModel(load_keras_model(model_path), vocabulary)
+
+
+def global_model_available(model_path=GLOBAL_MODEL_PATH):
+    return (GLOBAL_MODEL_MODE != 'off' and os.path.exists(model_path)
+            and os.path.exists(vocabulary_path_for(model_path)))
+
+
+def global_model_lookback(model_path=GLOBAL_MODEL_PATH):
+    """Window length the global model was trained on, or None if its vocabulary doesn't say"""
+    try:
+        with open(vocabulary_path_for(model_path)) as f:
+            return json.load(f).get('lookback')
+    except (OSError, ValueError):
+        return None
+
+
+def use_global_model(coin_has_model, lookback=None, model_path=GLOBAL_MODEL_PATH):
+    """Whether a prediction should be served by the global model
+
+    The model's input is fixed to the lookback it was trained on, so a
+    request with any other lookback is never served from it.
+    """
+    if not global_model_available(model_path):
+        return False
+    if lookback is not None and global_model_lookback(model_path) != lookback:
+        return False
+    return GLOBAL_MODEL_MODE == 'always' or not coin_has_model
+
+
+def get_global_model(model_path=GLOBAL_MODEL_PATH):
+    """Shared, registry-cached instance of the global model"""
+    return model_registry.get('__global__', model_path, load_global_model)
+
+
+def predict_many(coins, lookback=60, mc_samples=100, quantiles=(0.025, 0.975), model_path=GLOBAL_MODEL_PATH):
+    """Next-day MC dropout forecasts for many coins from one resident model
+
+    All coins' windows go through the same batched forward passes.
+
+    Returns:
+        Mapping of coin symbol to a dict with last_close, predicted_price,
+        lower_bound and upper_bound, or an error message for coins without data
+
+    Raises:
+        ValueError: If lookback is not the one the global model was trained on
+    """
+    from prediction_utils import prepare_data
+
+    trained_lookback = global_model_lookback(model_path)
+    if trained_lookback != lookback:
+        raise ValueError(f"The global model takes a lookback of {trained_lookback} days, got {lookback}")
+    model = get_global_model(model_path)
+    windows, scalers, last_closes, results = {}, {}, {}, {}
+    for coin in coins:
+        try:
+            df, scaled_data, scaler = prepare_data(coin, lookback)
+        except ValueError as e:
+            results[coin] = {'error': str(e)}
+            continue
+        windows[coin] = scaled_data[-lookback:]
+        scalers[coin] = scaler
+        last_closes[coin] = float(df['Close'].iloc[-1])
+
+    for coin, samples in model.mc_sample_many(windows, n_samples=mc_samples).items():
+        scale, offset = scalers[coin].scale_[0], scalers[coin].min_[0]
+        lower, upper = np.quantile(samples, quantiles)
+        results[coin] = {
+            'last_close': last_closes[coin],
+            'predicted_price': float((samples.mean() - offset) / scale),
+            'lower_bound': float((lower - offset) / scale),
+            'upper_bound': float((upper - offset) / scale),
+        }
+    return results
+
+
+def build_global_model(n_coins, lookback, n_features, embedding_dim=GLOBAL_EMBEDDING_DIM):
+    """LSTM over the feature window with the coin embedding appended to every timestep"""
+    import tensorflow as tf
+
+    keras = tf.keras
+    window = keras.Input(shape=(lookback, n_features), name='window')
+    coin = keras.Input(shape=(1,), dtype='int32', name='coin')
+    embedding = keras.layers.Flatten()(keras.layers.Embedding(n_coins + 1, embedding_dim, name='coin_embedding')(coin))
+    x = keras.layers.Concatenate()([window, keras.layers.RepeatVector(lookback)(embedding)])
+    x = keras.layers.LSTM(50, return_sequences=True)(x)
+    x = keras.layers.Dropout(0.2)(x)
+    x = keras.layers.LSTM(50, return_sequences=False)(x)
+    x = keras.layers.Dropout(0.2)(x)
+    output = keras.layers.Dense(1)(x)
+
+    model = keras.Model(inputs=[window, coin], outputs=output)
+    model.compile(optimizer='adam', loss=keras.losses.MeanSquaredError())
+    return model
+
+
+def _iter_multi_coin_batches(datasets, index, batch_size, shuffle, unknown_rate, seed=None):
+    """Yield ([X, coin_ids], y) batches forever from per-coin window views
+
+    index is an (n, 2) array of (dataset, window) pairs; only the rows of the
+    current batch are copied out of the strided views.
+    """
+    rng = np.random.default_rng(seed)
+    while True:
+        order = rng.permutation(len(index)) if shuffle else np.arange(len(index))
+        for start in range(0, len(order), batch_size):
+            rows = index[order[start:start + batch_size]]
+            X = np.stack([datasets[d][1][w] for d, w in rows]).astype(np.float32)
+            y = np.array([datasets[d][2][w] for d, w in rows], dtype=np.float32)
+            ids = np.array([[datasets[d][0]] for d, _ in rows], dtype=np.int32)
+            if unknown_rate:
+                ids[rng.random(len(ids)) < unknown_rate] = UNKNOWN_COIN
+            yield (X, ids), y
+
+
+def train_global_model(coins, lookback=60, future_days=7, epochs=30, batch_size=32, validation_split=0.2,
+                       model_path=GLOBAL_MODEL_PATH):
+    """Train the global model on every coin's windows and atomically replace it on disk
+
+    Returns:
+        (model, history)
+    """
+    import tensorflow as tf
+
+    from prediction_utils import prepare_data
+
+    keras = tf.keras
+    vocabulary, datasets, train_index, val_index = {}, [], [], []
+    for coin in coins:
+        try:
+            _, scaled_data, _ = prepare_data(coin, lookback, future_days)
+        except ValueError as e:
+            print(f"Skipping {coin}: {str(e)}")
+            continue
+        if len(scaled_data) <= lookback:
+            print(f"Skipping {coin}: not enough history for lookback {lookback}")
+            continue
+        vocabulary[coin] = len(vocabulary) + 1
+        n_windows = len(scaled_data) - lookback
+        n_train = int(n_windows * (1 - validation_split))
+        d = len(datasets)
+        datasets.append((vocabulary[coin], sliding_windows(scaled_data, lookback), window_targets(scaled_data, lookback)))
+        train_index += [(d, w) for w in range(n_train)]
+        val_index += [(d, w) for w in range(n_train, n_windows)]
+    if not train_index:
+        raise ValueError("No coin had enough data to train the global model")
+
+    train_index, val_index = np.array(train_index), np.array(val_index)
+    model = build_global_model(len(vocabulary), lookback, datasets[0][1].shape[2])
+    fit_args = {
+        'x': _iter_multi_coin_batches(datasets, train_index, batch_size, True, GLOBAL_UNKNOWN_RATE),
+        'steps_per_epoch': -(-len(train_index) // batch_size),
+    }
+    callbacks = []
+    if len(val_index):
+        fit_args['validation_data'] = _iter_multi_coin_batches(datasets, val_index, batch_size, False, 0.0)
+        fit_args['validation_steps'] = -(-len(val_index) // batch_size)
+        callbacks.append(keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True))
+    print(f"Training global model on {len(train_index)} windows from {len(vocabulary)} coins")
+    history = model.fit(**fit_args, epochs=epochs, callbacks=callbacks, verbose=2)
+
+    # Vocabulary first: a reader that sees the new model must also see its coin ids
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    vocabulary_path = vocabulary_path_for(model_path)
+    with open(f"{vocabulary_path}.tmp", 'w') as f:
+        json.dump({'coins': vocabulary, 'lookback': lookback}, f, indent=2)
+    os.replace(f"{vocabulary_path}.tmp", vocabulary_path)
+    tmp_path = f"{model_path[:-3]}.{os.getpid()}.tmp.h5"
+    try:
+        model.save(tmp_path)
+        os.replace(tmp_path, model_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return model, history
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the global multi-coin model")
+    parser.add_argument('coins', nargs='*', help="Coin symbols, e.g. BTC-USD ETH-USD")
+    parser.add_argument('--coins-file', help="File with one coin symbol per line")
+    parser.add_argument('--lookback', type=int, default=60)
+    parser.add_argument('--future-days', type=int, default=7)
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--output', default=GLOBAL_MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    coins = list(args.coins)
+    if args.coins_file:
+        with open(args.coins_file) as f:
+            coins += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    coins = list(dict.fromkeys(coin.upper() if coin.upper().endswith('-USD') else f"{coin.upper()}-USD"
+                               for coin in coins))
+    if not coins:
+        parser.error("no coins given")
+
+    train_global_model(coins, lookback=args.lookback, future_days=args.future_days, epochs=args.epochs,
+                       model_path=args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
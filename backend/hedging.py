@@ -0,0 +1,170 @@
+"""Hedged racing of interchangeable data sources
+
+Sources are tried in order of preference, but a slow one no longer holds
+up the rest: when the current source hasn't answered within its hedge
+delay (or has already failed), the next one is started alongside it. The
+first valid result wins and every request still running is cancelled.
+The hedge delay of a source is a high percentile of its recent successful
+latencies, so hedges only fire when a source is slower than it usually is.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from deadline import DEADLINE_MIN_SOURCE_MS
+from http_client import upstream
+
+# Hedge delay used until a source has HEDGE_MIN_SAMPLES latencies on record
+HEDGE_DELAY_MS = float(os.environ.get('HEDGE_DELAY_MS', 1000))
+# Latency percentile of a source that triggers the hedge, and its bounds
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 95))
+HEDGE_MIN_DELAY_MS = float(os.environ.get('HEDGE_MIN_DELAY_MS', 50))
+HEDGE_MAX_DELAY_MS = float(os.environ.get('HEDGE_MAX_DELAY_MS', 5000))
+# Recent successful latencies kept per source
+HEDGE_LATENCY_WINDOW = int(os.environ.get('HEDGE_LATENCY_WINDOW', 200))
+HEDGE_MIN_SAMPLES = 10
+
+
+class LatencyTracker:
+    """Recent latencies and race outcomes per data source"""
+
+    def __init__(self, window=HEDGE_LATENCY_WINDOW):
+        self.window = window
+        self._latencies = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _count(self, source, name):
+        counters = self._counters.setdefault(source, {'wins': 0, 'failures': 0, 'hedged': 0, 'cancelled': 0})
+        counters[name] += 1
+
+    def record(self, source, seconds):
+        """Latency of a request that returned a valid result"""
+        with self._lock:
+            self._latencies.setdefault(source, deque(maxlen=self.window)).append(seconds)
+
+    def count(self, source, name):
+        """Bump one of a source's wins/failures/hedged/cancelled counters"""
+        with self._lock:
+            self._count(source, name)
+
+    def percentile(self, source, q):
+        """q-th percentile of a source's latencies in seconds, or None with too few on record"""
+        with self._lock:
+            latencies = list(self._latencies.get(source, ()))
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return float(np.percentile(latencies, q))
+
+    def hedge_delay(self, source):
+        """Seconds to wait on a source before starting the next one"""
+        latency = self.percentile(source, HEDGE_PERCENTILE)
+        delay_ms = HEDGE_DELAY_MS if latency is None else latency * 1000
+        return min(HEDGE_MAX_DELAY_MS, max(HEDGE_MIN_DELAY_MS, delay_ms)) / 1000
+
+    def stats(self):
+        with self._lock:
+            sources = set(self._latencies) | set(self._counters)
+            counters = {source: dict(self._counters.get(source, {})) for source in sources}
+        result = {}
+        for source in sorted(sources):
+            p50, p95 = self.percentile(source, 50), self.percentile(source, 95)
+            result[source] = dict(
+                counters[source],
+                p50_ms=None if p50 is None else p50 * 1000,
+                p95_ms=None if p95 is None else p95 * 1000,
+                hedge_delay_ms=self.hedge_delay(source) * 1000,
+            )
+        return result
+
+
+# Shared latency history for the whole process
+latency_tracker = LatencyTracker()
+
+
+def _is_valid(result):
+    return result is not None
+
+
+async def _timed(source, factory):
+    started = time.monotonic()
+    return source, await factory(), time.monotonic() - started
+
+
+async def hedged_race(sources, deadline=None, valid=_is_valid, tracker=latency_tracker):
+    """First valid result of several sources, hedging to the next one when the current one is slow
+
+    Args:
+        sources: (name, factory) pairs in order of preference; factory()
+            returns an awaitable of the result
+        deadline: Optional deadline.Deadline; no hedge is started with less
+            than DEADLINE_MIN_SOURCE_MS left and the race ends when it runs out
+        valid: Predicate for results worth returning (default: not None)
+
+    Returns:
+        (name, result) of the winning source, or (None, None)
+    """
+    pending = list(sources)
+    running = {}
+
+    def launch():
+        name, factory = pending.pop(0)
+        if running:
+            tracker.count(name, 'hedged')
+        running[asyncio.ensure_future(_timed(name, factory))] = name
+        return name
+
+    try:
+        current = launch()
+        while running:
+            timeout = tracker.hedge_delay(current) if pending else None
+            if deadline is not None:
+                if timeout is None:
+                    timeout = deadline.remaining()
+                else:
+                    # Hedge early enough for the next source to have DEADLINE_MIN_SOURCE_MS of its own
+                    timeout = min(timeout, max(0.0, deadline.remaining() - DEADLINE_MIN_SOURCE_MS / 1000))
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                name = running.pop(task)
+                try:
+                    _, result, elapsed = task.result()
+                except Exception as e:
+                    print(f"[DEBUG] Data source {name} failed: {str(e)}")
+                    result = None
+                if valid(result):
+                    tracker.record(name, elapsed)
+                    tracker.count(name, 'wins')
+                    return name, result
+                tracker.count(name, 'failures')
+
+            if deadline is not None and deadline.expired():
+                deadline.degrade('upstream_deadline_exceeded')
+                break
+            # Hedge when the current source is slow, or move on when everything started has failed
+            if pending and (not done or not running):
+                if deadline is not None and deadline.remaining() * 1000 < DEADLINE_MIN_SOURCE_MS:
+                    deadline.degrade('skipped_fallback_source')
+                    pending.clear()
+                    continue
+                current = launch()
+        return None, None
+    finally:
+        for task, name in running.items():
+            task.cancel()
+            tracker.count(name, 'cancelled')
+
+
+def race(sources, deadline=None, valid=_is_valid):
+    """Blocking hedged_race for worker threads; the race runs on the shared upstream client loop"""
+    return upstream.run(hedged_race(sources, deadline, valid))
+
+
+def in_thread(fn, *args):
+    """Factory running a blocking source in a thread (it can't be interrupted; a lost result is dropped)"""
+    return lambda: asyncio.to_thread(fn, *args)
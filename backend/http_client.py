@@ -0,0 +1,268 @@
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from circuit_breaker import CircuitOpenError, circuit_breakers
+from rate_limiter import rate_limiters, request_priority
+
+# Connection, concurrency and retry settings for upstream market data APIs
+UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 10))
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get('UPSTREAM_MAX_CONNECTIONS', 50))
+UPSTREAM_MAX_KEEPALIVE = int(os.environ.get('UPSTREAM_MAX_KEEPALIVE', 20))
+UPSTREAM_MAX_PER_HOST = int(os.environ.get('UPSTREAM_MAX_PER_HOST', 8))
+UPSTREAM_MAX_RETRIES = int(os.environ.get('UPSTREAM_MAX_RETRIES', 2))
+UPSTREAM_BACKOFF_BASE = float(os.environ.get('UPSTREAM_BACKOFF_BASE', 0.5))
+UPSTREAM_BACKOFF_MAX = float(os.environ.get('UPSTREAM_BACKOFF_MAX', 8))
+UPSTREAM_MAX_RETRY_AFTER = float(os.environ.get('UPSTREAM_MAX_RETRY_AFTER', 10))
+
+# Market data API roots; point both at upstream_standin.py to run without the public APIs
+COINGECKO_BASE_URL = os.environ.get('COINGECKO_BASE_URL', 'https://api.coingecko.com/api/v3').rstrip('/')
+CRYPTOCOMPARE_BASE_URL = os.environ.get('CRYPTOCOMPARE_BASE_URL', 'https://min-api.cryptocompare.com').rstrip('/')
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/json',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Exception raised for transport failures and timeouts once retries are exhausted,
+# and for sources skipped because their circuit is open (CircuitOpenError)
+UpstreamError = httpx.HTTPError
+
+
+def source_for(url):
+    """Name of the data source a URL belongs to; its circuit breaker is shared by every caller"""
+    if url.startswith(COINGECKO_BASE_URL):
+        return 'coingecko'
+    if url.startswith(CRYPTOCOMPARE_BASE_URL):
+        return 'cryptocompare'
+    return urlsplit(url).netloc
+
+
+def _parse_retry_after(value):
+    """Convert a Retry-After header (seconds or HTTP date) to seconds"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamClient:
+    """Shared HTTP client for every upstream data source
+
+    A single httpx.AsyncClient with keep-alive connection pooling runs on a
+    dedicated background event loop. Async handlers await it with aget(),
+    while blocking pipeline code running in worker threads uses get(). Both
+    paths share the same connection pool, per-host concurrency limits,
+    retry policy, per-source circuit breakers (circuit_breaker.py) and
+    rate limits (rate_limiter.py). Identical GETs in flight are coalesced
+    into one upstream call.
+    """
+
+    def __init__(self, timeout=UPSTREAM_TIMEOUT, max_connections=UPSTREAM_MAX_CONNECTIONS,
+                 max_keepalive=UPSTREAM_MAX_KEEPALIVE, max_per_host=UPSTREAM_MAX_PER_HOST,
+                 max_retries=UPSTREAM_MAX_RETRIES, backoff_base=UPSTREAM_BACKOFF_BASE,
+                 backoff_max=UPSTREAM_BACKOFF_MAX, max_retry_after=UPSTREAM_MAX_RETRY_AFTER):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.max_per_host = max_per_host
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self._loop = None
+        self._client = None
+        self._host_limits = {}
+        self._in_flight = {}
+        self._start_lock = threading.Lock()
+        self.coalesced = 0
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='upstream-http', daemon=True).start()
+                self._client = asyncio.run_coroutine_threadsafe(self._open_client(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _open_client(self):
+        # Created on the client loop so the pool's primitives belong to it
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive
+            ),
+            follow_redirects=True
+        )
+
+    def _host_limit(self, url):
+        # Only touched from the client loop, so no extra locking is needed
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+
+    def _backoff(self, attempt, response=None):
+        """Delay before the next attempt, honoring Retry-After when present"""
+        if response is not None:
+            retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.max_retry_after)
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _request(self, method, url, params=None, headers=None, timeout=None, deadline=None):
+        if method != 'GET':
+            return await self._send(method, url, params, headers, timeout, deadline)
+
+        # Identical GETs in flight share one upstream call; a more urgent caller doesn't
+        # join a queued less urgent one but starts its own, which later callers then join
+        key = (url, tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items())))
+        level = request_priority.get()
+        entry = self._in_flight.get(key)
+        if entry is None or level < entry['priority']:
+            entry = {'task': asyncio.ensure_future(self._send(method, url, params, headers, timeout, deadline)),
+                     'priority': level, 'waiters': 0}
+            self._in_flight[key] = entry
+            entry['task'].add_done_callback(
+                lambda _: self._in_flight.pop(key) if self._in_flight.get(key) is entry else None
+            )
+        else:
+            self.coalesced += 1
+
+        entry['waiters'] += 1
+        try:
+            if deadline is None:
+                return await asyncio.shield(entry['task'])
+            try:
+                return await asyncio.wait_for(asyncio.shield(entry['task']), deadline.remaining())
+            except asyncio.TimeoutError:
+                raise httpx.TimeoutException(f"Deadline exceeded waiting for {url}")
+        finally:
+            # The call is cancelled once nobody is waiting for it any more (e.g. a lost hedge)
+            entry['waiters'] -= 1
+            if not entry['waiters'] and not entry['task'].done():
+                entry['task'].cancel()
+
+    async def _send(self, method, url, params=None, headers=None, timeout=None, deadline=None):
+        request_headers = dict(DEFAULT_HEADERS)
+        if headers:
+            request_headers.update(headers)
+        limit = self._host_limit(url)
+        timeout = timeout if timeout is not None else self.timeout
+        source = source_for(url)
+        rate_limiter = rate_limiters.get(source)
+        breaker = circuit_breakers.get(source)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit for {breaker.name} is open, skipping {url}")
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            if rate_limiter is not None:
+                # Every attempt spends one of the source's tokens
+                acquire = rate_limiter.acquire(request_priority.get())
+                try:
+                    await (acquire if deadline is None else asyncio.wait_for(acquire, deadline.remaining()))
+                except asyncio.TimeoutError:
+                    raise httpx.TimeoutException(f"Deadline exceeded waiting for a {source} rate limit token")
+            if deadline is not None:
+                # Never let one attempt outlive the caller's time budget
+                if deadline.expired():
+                    raise httpx.TimeoutException(f"Deadline exceeded before requesting {url}")
+                attempt_timeout = min(timeout, deadline.remaining())
+            else:
+                attempt_timeout = timeout
+            try:
+                async with limit:
+                    started = time.monotonic()
+                    response = await self._client.request(
+                        method, url, params=params, headers=request_headers, timeout=attempt_timeout
+                    )
+            except httpx.TransportError as e:
+                # A timeout cut short by the caller's deadline says nothing about the source
+                if not (isinstance(e, httpx.TimeoutException) and attempt_timeout < timeout):
+                    breaker.record(False, time.monotonic() - started)
+                # Stop retrying as soon as the source's circuit opens
+                if last_attempt or breaker.is_open():
+                    raise
+                delay = self._backoff(attempt)
+                if deadline is not None and delay >= deadline.remaining():
+                    raise
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record(response.status_code not in RETRY_STATUS_CODES, time.monotonic() - started)
+            if response.status_code in RETRY_STATUS_CODES and not last_attempt and not breaker.is_open():
+                delay = self._backoff(attempt, response)
+                if deadline is not None and delay >= deadline.remaining():
+                    return response
+                await asyncio.sleep(delay)
+                continue
+            return response
+
+    @staticmethod
+    async def _with_priority(coro, level):
+        # Runs as its own task on the client loop, so the caller's priority only applies to this request
+        request_priority.set(level)
+        return await coro
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(self._with_priority(coro, request_priority.get()), self._ensure_loop())
+
+    async def aget(self, url, params=None, headers=None, timeout=None, deadline=None):
+        """GET from an async context; the request runs on the shared client loop
+
+        With a deadline.Deadline, attempts and retries stop when it runs out.
+        """
+        return await asyncio.wrap_future(self._submit(self._request('GET', url, params, headers, timeout, deadline)))
+
+    def get(self, url, params=None, headers=None, timeout=None, deadline=None):
+        """Blocking GET for worker threads; the request runs on the shared client loop
+
+        With a deadline.Deadline, attempts and retries stop when it runs out.
+        """
+        return self._submit(self._request('GET', url, params, headers, timeout, deadline)).result()
+
+    async def fetch(self, url, params=None, headers=None, timeout=None, deadline=None):
+        """GET for coroutines that already run on the client loop (see run())"""
+        return await self._request('GET', url, params, headers, timeout, deadline)
+
+    def run(self, coro):
+        """Run a coroutine on the client loop and block until it finishes"""
+        return self._submit(coro).result()
+
+    def stats(self):
+        """Coalescing and rate limiting counters"""
+        return {
+            'in_flight': len(self._in_flight),
+            'coalesced': self.coalesced,
+            'rate_limits': rate_limiters.stats(),
+        }
+
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await asyncio.wrap_future(self._submit(self._client.aclose()))
+
+
+# Shared client for the whole process
+upstream = UpstreamClient()
@@ -0,0 +1,125 @@
+import numpy as np
+
+
+def _ewm_step(prev, cur, alpha):
+    """One adjust=False EWM update, written the way pandas evaluates it"""
+    old_wt = 1.0 - alpha
+    updated = (old_wt * prev + alpha * cur) / (old_wt + alpha)
+    # pandas leaves the average untouched when it already equals the new value
+    return np.where(prev != cur, updated, prev)
+
+
+class RSIState:
+    """Streaming RSI for many price paths at once
+
+    Carries the last `window` gains/losses in a ring buffer together with their
+    running sums, so each new close is an O(1) update per path. Values match
+    compute_rsi evaluated on the full close series, including its neutral 50
+    while fewer than window + 1 closes have been seen.
+    """
+
+    def __init__(self, last_close, gains, losses, n_seen, window=14):
+        self.window = window
+        self.last_close = np.array(last_close, dtype=float)
+        self.gains = np.array(gains, dtype=float)
+        self.losses = np.array(losses, dtype=float)
+        self.gain_sum = self.gains.sum(axis=1)
+        self.loss_sum = self.losses.sum(axis=1)
+        self.n_seen = n_seen
+        self.pos = n_seen % window
+
+    @classmethod
+    def from_history(cls, closes, n_paths=1, window=14):
+        """Seed the state from a close history shared by all paths"""
+        closes = np.asarray(closes, dtype=float)
+        delta = np.diff(closes)
+        n_seen = len(delta)
+
+        # Lay the most recent deltas out in ring order so that slot n_seen % window is the oldest
+        gains = np.zeros(window)
+        losses = np.zeros(window)
+        for i in range(max(0, n_seen - window), n_seen):
+            gains[i % window] = max(delta[i], 0.0)
+            losses[i % window] = max(-delta[i], 0.0)
+
+        return cls(
+            np.full(n_paths, closes[-1]),
+            np.tile(gains, (n_paths, 1)),
+            np.tile(losses, (n_paths, 1)),
+            n_seen,
+            window=window,
+        )
+
+    def value(self):
+        """Current RSI for every path"""
+        if self.n_seen < self.window:
+            return np.full(len(self.last_close), 50.0)
+        avg_gain = self.gain_sum / self.window
+        avg_loss = self.loss_sum / self.window
+        avg_loss = np.where(avg_loss == 0, 1e-10, avg_loss)
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+    def update(self, new_close):
+        """Advance every path by one close and return the new RSI values"""
+        new_close = np.asarray(new_close, dtype=float)
+        delta = new_close - self.last_close
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+
+        self.gain_sum += gain - self.gains[:, self.pos]
+        self.loss_sum += loss - self.losses[:, self.pos]
+        self.gains[:, self.pos] = gain
+        self.losses[:, self.pos] = loss
+
+        self.pos = (self.pos + 1) % self.window
+        self.n_seen += 1
+        self.last_close = new_close
+        return self.value()
+
+
+class MACDState:
+    """Streaming MACD and Signal line for many price paths at once
+
+    Carries EMA12, EMA26 and the Signal EMA, so each new close is an O(1)
+    update per path. Values match compute_macd evaluated on the full close
+    series, including its zeros while fewer than 26 closes have been seen
+    (the averages are still carried through that stretch).
+    """
+
+    # Closes compute_macd needs before it reports anything but zeros
+    MIN_CLOSES = 26
+
+    def __init__(self, ema12, ema26, signal, n_closes):
+        self.ema12 = np.array(ema12, dtype=float)
+        self.ema26 = np.array(ema26, dtype=float)
+        self.signal = np.array(signal, dtype=float)
+        self.n_closes = n_closes
+
+    @classmethod
+    def from_history(cls, closes, n_paths=1):
+        """Seed the state from a close history shared by all paths"""
+        closes = np.asarray(closes, dtype=float)
+        ema12 = ema26 = closes[0]
+        signal = 0.0
+        for close in closes[1:]:
+            ema12 = _ewm_step(ema12, close, 2 / 13)
+            ema26 = _ewm_step(ema26, close, 2 / 27)
+            signal = _ewm_step(signal, ema12 - ema26, 2 / 10)
+
+        return cls(np.full(n_paths, ema12), np.full(n_paths, ema26), np.full(n_paths, signal), len(closes))
+
+    def value(self):
+        """Current (macd, signal) for every path"""
+        if self.n_closes < self.MIN_CLOSES:
+            zeros = np.zeros(len(self.signal))
+            return zeros, zeros.copy()
+        return self.ema12 - self.ema26, self.signal
+
+    def update(self, new_close):
+        """Advance every path by one close and return the new (macd, signal) values"""
+        new_close = np.asarray(new_close, dtype=float)
+        self.ema12 = _ewm_step(self.ema12, new_close, 2 / 13)
+        self.ema26 = _ewm_step(self.ema26, new_close, 2 / 27)
+        self.signal = _ewm_step(self.signal, self.ema12 - self.ema26, 2 / 10)
+        self.n_closes += 1
+        return self.value()
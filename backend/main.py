@@ -1,18 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
 from typing import Optional, List, Dict, Any
 import uvicorn
 import logging
 import traceback
-from prediction_utils import predict_crypto, get_direct_crypto_data, generate_synthetic_data_for_prediction
+from prediction_utils import predict_crypto, get_direct_crypto_data, generate_synthetic_data_for_prediction, model_path_for, UNCERTAINTY_MODES
+from model_registry import model_registry
+from prediction_pool import prediction_pool, PoolSaturatedError
+from http_client import COINGECKO_BASE_URL, upstream, UpstreamError
+from ohlcv_store import last_closed_candle
+from result_cache import result_cache
+from training_jobs import training_jobs, TRAINING_MODES
+from multi_horizon import direct_model_mtime
+from distill import student_model_mtime
+from conformal import residual_store
+from deadline import Deadline
+from hedging import latency_tracker
+from circuit_breaker import CircuitOpenError, circuit_breakers
+from global_model import GLOBAL_MODEL_MODE, GLOBAL_MODEL_PATH, global_model_available, global_model_lookback, predict_many, use_global_model
 import yfinance as yf
-import requests
 import json
+import os
 from datetime import datetime, timedelta
 import pandas as pd
-import asyncio
-import random
 import re
 
 # Configure logging
@@ -40,6 +52,9 @@ class PredictionRequest(BaseModel):
     future_days: Optional[int] = Field(default=7, ge=1, le=30)
     mc_samples: Optional[int] = Field(default=100, ge=10, le=1000)
     train_new_model: Optional[bool] = Field(default=False)
+    uncertainty_mode: Optional[str] = Field(default='mc')
+    adaptive_mc: Optional[bool] = Field(default=False)
+    max_latency_ms: Optional[int] = Field(default=None, ge=100, le=600000)
 
     @validator('coin_symbol')
     def validate_coin_symbol(cls, v):
@@ -49,6 +64,12 @@ class PredictionRequest(BaseModel):
         v = v.replace('-USD', '')
         return v
 
+    @validator('uncertainty_mode')
+    def validate_uncertainty_mode(cls, v):
+        if v not in UNCERTAINTY_MODES:
+            raise ValueError(f"uncertainty_mode must be one of {', '.join(UNCERTAINTY_MODES)}")
+        return v
+
 class PredictionResponse(BaseModel):
     success: bool
     coin: Optional[str] = None
@@ -61,6 +82,13 @@ class PredictionResponse(BaseModel):
     training_plot_base64: Optional[str] = None
     date_generated: Optional[str] = None
     error: Optional[str] = None
+    training_job_id: Optional[str] = None
+    uncertainty_mode: Optional[str] = None
+    mc_samples_used: Optional[int] = None
+    mc_standard_error: Optional[float] = None
+    degradations: Optional[List[str]] = None
+    data_through: Optional[str] = None
+    synthetic_data: Optional[bool] = None
 
     class Config:
         schema_extra = {
@@ -93,10 +121,39 @@ class PredictionResponse(BaseModel):
                 "prediction_plot_base64": "base64_encoded_string",
                 "change_plot_base64": "base64_encoded_string",
                 "training_plot_base64": None,
+                "uncertainty_mode": "mc",
+                "mc_samples_used": 100,
+                "mc_standard_error": 12.5,
+                "degradations": None,
                 "date_generated": "2024-05-08 18:40:17"
             }
         }
 
+class TrainRequest(BaseModel):
+    coin_symbol: str = Field(..., min_length=2, max_length=10)
+    lookback: Optional[int] = Field(default=60, ge=30, le=365)
+    future_days: Optional[int] = Field(default=7, ge=1, le=30)
+    mode: Optional[str] = Field(default='full')
+
+    @validator('coin_symbol')
+    def validate_coin_symbol(cls, v):
+        return v.strip().upper().replace('-USD', '')
+
+    @validator('mode')
+    def validate_mode(cls, v):
+        if v not in TRAINING_MODES:
+            raise ValueError(f"mode must be one of {', '.join(TRAINING_MODES)}")
+        return v
+
+class PredictManyRequest(BaseModel):
+    coin_symbols: List[str] = Field(..., min_length=1, max_length=100)
+    lookback: Optional[int] = Field(default=60, ge=30, le=365)
+    mc_samples: Optional[int] = Field(default=100, ge=10, le=1000)
+
+    @validator('coin_symbols')
+    def validate_coin_symbols(cls, v):
+        return list(dict.fromkeys(f"{c.strip().upper().replace('-USD', '')}-USD" for c in v))
+
 @app.get("/")
 async def root():
     return {
@@ -104,7 +161,12 @@ async def root():
         "endpoints": {
             "/": "This help message",
             "/health": "Health check endpoint",
-            "/predict": "Prediction endpoint (POST)"
+            "/metrics": "Serving metrics (model registry, prediction pool, result cache, residual store)",
+            "/diagnostics": "Upstream data source health (circuit breakers, latencies)",
+            "/predict": "Prediction endpoint (POST)",
+            "/predict-many": "Next-day forecasts for many coins from the global model (POST)",
+            "/train": "Queue background model training (POST)",
+            "/jobs/{job_id}": "Training job status and progress"
         }
     }
 
@@ -112,27 +174,100 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Return in-process serving counters"""
+    return {
+        "data_sources": latency_tracker.stats(),
+        "model_registry": model_registry.stats(),
+        "prediction_pool": prediction_pool.stats(),
+        "result_cache": result_cache.stats(),
+        "residual_store": residual_store.stats(),
+        "training_jobs": training_jobs.stats(),
+        "upstream": upstream.stats()
+    }
+
+@app.get("/diagnostics")
+async def get_diagnostics():
+    """Return the health of every upstream data source"""
+    return {
+        "circuit_breakers": circuit_breakers.stats(),
+        "data_sources": latency_tracker.stats()
+    }
+
 @app.post("/predict", response_model=PredictionResponse)
-async def make_prediction(request: PredictionRequest):
+async def make_prediction(request: PredictionRequest,
+                          x_max_latency_ms: Optional[int] = Header(default=None, ge=100, le=600000)):
     try:
         logger.info(f"Received prediction request for {request.coin_symbol}")
         
+        # The time budget starts now, so queueing for a worker counts against it
+        budgets = [ms for ms in (request.max_latency_ms, x_max_latency_ms) if ms is not None]
+        deadline = Deadline(min(budgets)) if budgets else None
+        
         # Format coin symbol
         coin_symbol = request.coin_symbol
         if not coin_symbol.endswith('-USD'):
             coin_symbol = f"{coin_symbol}-USD"
         
         logger.info(f"Formatted coin symbol: {coin_symbol}")
-        logger.info(f"Request parameters: lookback={request.lookback}, future_days={request.future_days}, mc_samples={request.mc_samples}")
+        logger.info(f"Request parameters: lookback={request.lookback}, future_days={request.future_days}, mc_samples={request.mc_samples}, uncertainty_mode={request.uncertainty_mode}, adaptive_mc={request.adaptive_mc}")
 
-        # Get prediction
-        try:
-            result = predict_crypto(
+        # Training never runs inside the request: it is queued as a background job
+        model_path = model_path_for(coin_symbol)
+        model_exists = os.path.exists(model_path)
+        # Only if the request's lookback is the one the global model was trained on
+        serve_global = use_global_model(model_exists, request.lookback)
+        if serve_global:
+            logger.info(f"Serving {coin_symbol} from the global model")
+            model_path = GLOBAL_MODEL_PATH
+        training_job = None
+        # A coin without its own model gets one trained, unless the global model always serves it
+        always_global = serve_global and GLOBAL_MODEL_MODE == 'always'
+        if request.train_new_model or (not model_exists and not always_global):
+            training_job = training_jobs.submit(coin_symbol, lookback=request.lookback,
+                                                future_days=request.future_days)
+            logger.info(f"Training job {training_job['job_id']} for {coin_symbol} is {training_job['status']}")
+        if not model_exists and not serve_global:
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "success": False,
+                    "error": f"No model for {coin_symbol} yet; training job {training_job['job_id']} is {training_job['status']}",
+                    "training_job_id": training_job['job_id']
+                }
+            )
+
+        # Get prediction on the bounded worker pool so the event loop stays responsive
+        def run_prediction():
+            return prediction_pool.run(
+                predict_crypto,
                 coin_symbol=coin_symbol,
                 lookback=request.lookback,
                 future_days=request.future_days,
                 mc_samples=request.mc_samples,
-                train_new_model=request.train_new_model
+                use_global_model=serve_global,
+                uncertainty_mode=request.uncertainty_mode,
+                adaptive_mc=request.adaptive_mc,
+                deadline=deadline
+            )
+
+        try:
+            # Inputs only change when a new daily candle closes or the model is retrained,
+            # so identical requests share one result
+            cache_key = (coin_symbol, request.lookback, request.future_days, request.mc_samples,
+                         request.uncertainty_mode, request.adaptive_mc, model_path, os.path.getmtime(model_path),
+                         direct_model_mtime(coin_symbol), student_model_mtime(coin_symbol),
+                         last_closed_candle().isoformat())
+            # A request with a deadline takes a cached full result, but computes its own on a miss
+            # rather than waiting on someone else's unbounded computation
+            result = await result_cache.get_or_compute(cache_key, run_prediction, coalesce=deadline is None)
+        except PoolSaturatedError as busy_error:
+            logger.warning(f"Rejecting prediction for {coin_symbol}: {str(busy_error)}")
+            return JSONResponse(
+                status_code=503,
+                headers={"Retry-After": str(busy_error.retry_after)},
+                content={"success": False, "error": "Prediction service is busy, please retry later"}
             )
         except Exception as pred_error:
             logger.error(f"Error in predict_crypto: {str(pred_error)}")
@@ -150,6 +285,9 @@ async def make_prediction(request: PredictionRequest):
             )
 
         logger.info(f"Successfully generated prediction for {coin_symbol}")
+        if training_job is not None:
+            # Copy so the cached result doesn't carry this request's job id
+            result = {**result, 'training_job_id': training_job['job_id']}
         return result
 
     except Exception as e:
@@ -160,6 +298,51 @@ async def make_prediction(request: PredictionRequest):
             error=f"Internal server error: {str(e)}"
         )
 
+@app.post("/predict-many")
+async def make_many_predictions(request: PredictManyRequest):
+    """Next-day forecasts for many coins in shared forward passes of the global model"""
+    if not global_model_available():
+        raise HTTPException(status_code=404, detail="No global model is available")
+    trained_lookback = global_model_lookback()
+    if request.lookback != trained_lookback:
+        raise HTTPException(status_code=400,
+                            detail=f"The global model takes a lookback of {trained_lookback} days, got {request.lookback}")
+    try:
+        predictions = await prediction_pool.run(predict_many, request.coin_symbols,
+                                                lookback=request.lookback, mc_samples=request.mc_samples)
+    except PoolSaturatedError as busy_error:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(busy_error.retry_after)},
+            content={"success": False, "error": "Prediction service is busy, please retry later"}
+        )
+    except Exception as e:
+        logger.error(f"Error in predict_many: {str(e)}")
+        logger.error(traceback.format_exc())
+        return {"success": False, "error": f"Prediction failed: {str(e)}"}
+    return {"success": True, "predictions": predictions}
+
+@app.post("/train", status_code=202)
+async def train_model(request: TrainRequest):
+    """Queue background training for a coin; returns the (possibly already running) job"""
+    coin_symbol = f"{request.coin_symbol}-USD"
+    try:
+        job = training_jobs.submit(coin_symbol, lookback=request.lookback, future_days=request.future_days,
+                                   mode=request.mode)
+    except Exception as e:
+        logger.error(f"Could not queue training for {coin_symbol}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Could not queue training: {str(e)}")
+    logger.info(f"Training job {job['job_id']} for {coin_symbol} is {job['status']}")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and epoch progress of a training job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
 class CryptoDetailsRequest(BaseModel):
     coin_symbol: str = Field(..., min_length=2, max_length=20)
 
@@ -326,61 +509,50 @@ async def get_crypto_details(request: CryptoDetailsRequest):
         
         logger.info(f"Using coin ID: {coin_id}")
         
-        # Enhanced CoinGecko implementation with retry logic
-        max_retries = 3
-        retry_delay = 1
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/json',
-            'Accept-Language': 'en-US,en;q=0.9'
+        params = {
+            'localization': 'false',
+            'tickers': 'false',
+            'market_data': 'true',
+            'community_data': 'false',
+            'developer_data': 'false',
+            'sparkline': 'false'
         }
         
-        # Try to get the data from CoinGecko with retries
-        success = False
-        for attempt in range(max_retries):
+        # Safely extract other market data with proper type handling
+        def safe_float(data, *keys, default=None):
+            value = data
+            for key in keys:
+                if not isinstance(value, dict):
+                    return default
+                value = value.get(key)
+                if value is None:
+                    return default
             try:
-                # Direct API call to CoinGecko
-                url = f"https://api.coingecko.com/api/v3/coins/{coin_id}"
-                params = {
-                    'localization': 'false',
-                    'tickers': 'false',
-                    'market_data': 'true',
-                    'community_data': 'false',
-                    'developer_data': 'false',
-                    'sparkline': 'false'
-                }
-                
-                logger.info(f"Requesting crypto details from CoinGecko, attempt {attempt+1}/{max_retries}")
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-                
-                if response.status_code == 429:
-                    logger.warning(f"Rate limit hit for CoinGecko API, attempt {attempt+1}/{max_retries}")
-                    retry_after = int(response.headers.get('Retry-After', retry_delay * (attempt + 1)))
-                    await asyncio.sleep(retry_after)
-                    continue
-                    
-                if response.status_code != 200:
-                    logger.error(f"CoinGecko API error: {response.status_code} for {coin_id}, attempt {attempt+1}/{max_retries}")
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(retry_delay * (attempt + 1))
-                        continue
-                    else:
-                        # Try a search instead as last resort
-                        break
-                
+                return float(value)
+            except (TypeError, ValueError):
+                return default
+        
+        # Direct API call to CoinGecko; retries and backoff are handled by the shared upstream client
+        try:
+            url = f"{COINGECKO_BASE_URL}/coins/{coin_id}"
+            logger.info(f"Requesting crypto details from CoinGecko for {coin_id}")
+            response = await upstream.aget(url, params=params)
+            
+            if response.status_code != 200:
+                logger.error(f"CoinGecko API error: {response.status_code} for {coin_id}")
+            else:
                 # Process successful response
                 coin_data = response.json()
                 
-                # Get additional market chart data for price history with retry
-                price_url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
+                # Get additional market chart data for price history
+                price_url = f"{COINGECKO_BASE_URL}/coins/{coin_id}/market_chart"
                 price_params = {
                     'vs_currency': 'usd',
                     'days': '30',
                     'interval': 'daily'
                 }
                 
-                price_response = requests.get(price_url, params=price_params, headers=headers, timeout=10)
+                price_response = await upstream.aget(price_url, params=price_params)
                 
                 if price_response.status_code != 200:
                     logger.warning(f"Failed to get price history for {coin_id}, using empty history")
@@ -405,20 +577,6 @@ async def get_crypto_details(request: CryptoDetailsRequest):
                     current_price = float(market_data.get('current_price', {}).get('usd', 0))
                 except (TypeError, ValueError):
                     current_price = 0.0
-                    
-                # Safely extract other market data with proper type handling
-                def safe_float(data, *keys, default=None):
-                    value = data
-                    for key in keys:
-                        if not isinstance(value, dict):
-                            return default
-                        value = value.get(key)
-                        if value is None:
-                            return default
-                    try:
-                        return float(value)
-                    except (TypeError, ValueError):
-                        return default
                 
                 details = {
                     "success": True,
@@ -463,71 +621,63 @@ async def get_crypto_details(request: CryptoDetailsRequest):
                 }
                 
                 logger.info(f"Successfully fetched crypto details for {coin_id}")
-                success = True
                 return details
-                
-            except requests.exceptions.RequestException as req_ex:
-                logger.error(f"Request error for {coin_id}, attempt {attempt+1}/{max_retries}: {str(req_ex)}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay * (attempt + 1))
-                
-            except (KeyError, TypeError, ValueError) as ex:
-                logger.error(f"Data parsing error for {coin_id}, attempt {attempt+1}/{max_retries}: {str(ex)}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay * (attempt + 1))
-                    
-            except Exception as ex:
-                logger.error(f"Unexpected error for {coin_id}, attempt {attempt+1}/{max_retries}: {str(ex)}")
-                logger.error(traceback.format_exc())
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay * (attempt + 1))
+            
+        except UpstreamError as req_ex:
+            logger.error(f"Request error for {coin_id}: {str(req_ex)}")
+            
+        except (KeyError, TypeError, ValueError) as ex:
+            logger.error(f"Data parsing error for {coin_id}: {str(ex)}")
+            
+        except Exception as ex:
+            logger.error(f"Unexpected error for {coin_id}: {str(ex)}")
+            logger.error(traceback.format_exc())
         
-        # If we reach this point, all CoinGecko attempts have failed
+        # If we reach this point, the direct CoinGecko lookup has failed
         # Try a search endpoint as a last resort
-        if not success:
-            logger.warning(f"All direct attempts failed for {coin_id}, trying search endpoint")
-            try:
-                search_url = "https://api.coingecko.com/api/v3/search"
-                search_params = {'query': coin_symbol}
-                search_response = requests.get(search_url, headers=headers, params=search_params, timeout=10)
+        logger.warning(f"Direct lookup failed for {coin_id}, trying search endpoint")
+        try:
+            search_url = f"{COINGECKO_BASE_URL}/search"
+            search_params = {'query': coin_symbol}
+            search_response = await upstream.aget(search_url, params=search_params)
+            
+            if search_response.status_code == 200:
+                search_data = search_response.json()
+                coins = search_data.get('coins', [])
                 
-                if search_response.status_code == 200:
-                    search_data = search_response.json()
-                    coins = search_data.get('coins', [])
+                if coins:
+                    # Take the first match
+                    first_match = coins[0]
+                    new_coin_id = first_match.get('id')
+                    logger.info(f"Found alternate coin ID via search: {new_coin_id}")
+                    
+                    # Get data for this coin id
+                    alt_url = f"{COINGECKO_BASE_URL}/coins/{new_coin_id}"
+                    alt_response = await upstream.aget(alt_url, params=params)
                     
-                    if coins:
-                        # Take the first match
-                        first_match = coins[0]
-                        new_coin_id = first_match.get('id')
-                        logger.info(f"Found alternate coin ID via search: {new_coin_id}")
+                    if alt_response.status_code == 200:
+                        coin_data = alt_response.json()
+                        market_data = coin_data.get('market_data', {})
                         
-                        # Get data for this coin id
-                        alt_url = f"https://api.coingecko.com/api/v3/coins/{new_coin_id}"
-                        alt_response = requests.get(alt_url, headers=headers, params=params, timeout=10)
+                        # Build the response with the same structure as above
+                        details = {
+                            "success": True,
+                            "id": coin_data.get('id', new_coin_id),
+                            "name": coin_data.get('name', new_coin_id.capitalize()),
+                            "symbol": coin_data.get('symbol', '').upper(),
+                            "image": coin_data.get('image', {}).get('large'),
+                            "current_price": safe_float(market_data, 'current_price', 'usd', default=0),
+                            "market_cap": safe_float(market_data, 'market_cap', 'usd', default=0),
+                            "market_cap_rank": coin_data.get('market_cap_rank'),
+                            # ...include the rest of the fields as before
+                            "last_updated": market_data.get('last_updated', datetime.now().isoformat()),
+                            "price_history": []  # Empty history if we can't fetch it
+                        }
                         
-                        if alt_response.status_code == 200:
-                            coin_data = alt_response.json()
-                            market_data = coin_data.get('market_data', {})
-                            
-                            # Build the response with the same structure as above
-                            details = {
-                                "success": True,
-                                "id": coin_data.get('id', new_coin_id),
-                                "name": coin_data.get('name', new_coin_id.capitalize()),
-                                "symbol": coin_data.get('symbol', '').upper(),
-                                "image": coin_data.get('image', {}).get('large'),
-                                "current_price": safe_float(market_data, 'current_price', 'usd', default=0),
-                                "market_cap": safe_float(market_data, 'market_cap', 'usd', default=0),
-                                "market_cap_rank": coin_data.get('market_cap_rank'),
-                                # ...include the rest of the fields as before
-                                "last_updated": market_data.get('last_updated', datetime.now().isoformat()),
-                                "price_history": []  # Empty history if we can't fetch it
-                            }
-                            
-                            logger.info(f"Successfully fetched crypto details for {new_coin_id} via search")
-                            return details
-            except Exception as search_ex:
-                logger.error(f"Search endpoint error: {str(search_ex)}")
+                        logger.info(f"Successfully fetched crypto details for {new_coin_id} via search")
+                        return details
+        except Exception as search_ex:
+            logger.error(f"Search endpoint error: {str(search_ex)}")
 
         # If we've reached here, all CoinGecko attempts failed
         # Return an error response
@@ -549,88 +699,60 @@ async def get_crypto_details(request: CryptoDetailsRequest):
 async def get_coins():
     """Return a list of popular cryptocurrencies from CoinGecko"""
     try:
-        # Enhanced CoinGecko implementation with retry logic
-        max_retries = 3
-        retry_delay = 1
+        url = f"{COINGECKO_BASE_URL}/coins/markets"
+        params = {
+            'vs_currency': 'usd',
+            'order': 'market_cap_desc',
+            'per_page': 250,  # Get more coins for better coverage
+            'page': 1,
+            'sparkline': 'false',
+            'price_change_percentage': '24h'
+        }
         
-        for attempt in range(max_retries):
+        # Retries and backoff are handled by the shared upstream client
+        logger.info("Requesting coin list from CoinGecko")
+        response = await upstream.aget(url, params=params)
+        
+        if response.status_code != 200:
+            logger.error(f"CoinGecko API error: {response.status_code}")
+            return {"success": False, "error": f"CoinGecko API error: {response.status_code}", "coins": []}
+        
+        coins_data = response.json()
+        processed_coins = []
+        
+        for coin in coins_data:
             try:
-                url = "https://api.coingecko.com/api/v3/coins/markets"
-                params = {
-                    'vs_currency': 'usd',
-                    'order': 'market_cap_desc',
-                    'per_page': 250,  # Get more coins for better coverage
-                    'page': 1,
-                    'sparkline': False,
-                    'price_change_percentage': '24h'
-                }
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept': 'application/json',
-                    'Accept-Language': 'en-US,en;q=0.9'
+                coin_info = {
+                    "id": coin.get('id', ''),
+                    "name": coin.get('name', ''),
+                    "symbol": coin.get('symbol', '').upper(),
+                    "image": coin.get('image'),
+                    "price": coin.get('current_price'),
+                    "market_cap": coin.get('market_cap'),
+                    "market_cap_rank": coin.get('market_cap_rank'),
+                    "change_24h": coin.get('price_change_percentage_24h'),
+                    "isPositive": coin.get('price_change_percentage_24h', 0) > 0,
+                    "volume_24h": coin.get('total_volume'),
+                    "circulating_supply": coin.get('circulating_supply'),
+                    "total_supply": coin.get('total_supply'),
+                    "max_supply": coin.get('max_supply'),
+                    "ath": coin.get('ath'),
+                    "ath_change_percentage": coin.get('ath_change_percentage')
                 }
-                
-                logger.info(f"Requesting coin list from CoinGecko, attempt {attempt+1}/{max_retries}")
-                response = requests.get(url, params=params, headers=headers, timeout=10)
-                
-                if response.status_code == 429:
-                    logger.warning(f"Rate limit hit for CoinGecko API, attempt {attempt+1}/{max_retries}")
-                    retry_after = int(response.headers.get('Retry-After', retry_delay * (attempt + 1)))
-                    await asyncio.sleep(retry_after)
-                    continue
-                    
-                if response.status_code != 200:
-                    logger.error(f"CoinGecko API error: {response.status_code}, attempt {attempt+1}/{max_retries}")
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(retry_delay * (attempt + 1))
-                        continue
-                    else:
-                        # Return the popular coins list as fallback
-                        # (We're removing the fallback logic for this PR)
-                        return {"success": False, "error": f"CoinGecko API error: {response.status_code}", "coins": []}
-                
-                coins_data = response.json()
-                processed_coins = []
-                
-                for coin in coins_data:
-                    try:
-                        coin_info = {
-                            "id": coin.get('id', ''),
-                            "name": coin.get('name', ''),
-                            "symbol": coin.get('symbol', '').upper(),
-                            "image": coin.get('image'),
-                            "price": coin.get('current_price'),
-                            "market_cap": coin.get('market_cap'),
-                            "market_cap_rank": coin.get('market_cap_rank'),
-                            "change_24h": coin.get('price_change_percentage_24h'),
-                            "isPositive": coin.get('price_change_percentage_24h', 0) > 0,
-                            "volume_24h": coin.get('total_volume'),
-                            "circulating_supply": coin.get('circulating_supply'),
-                            "total_supply": coin.get('total_supply'),
-                            "max_supply": coin.get('max_supply'),
-                            "ath": coin.get('ath'),
-                            "ath_change_percentage": coin.get('ath_change_percentage')
-                        }
-                        processed_coins.append(coin_info)
-                    except Exception as coin_error:
-                        logger.warning(f"Error processing coin data: {str(coin_error)}")
-                        continue
-                
-                logger.info(f"Successfully retrieved {len(processed_coins)} coins from CoinGecko")
-                return {"success": True, "coins": processed_coins}
-                
-            except requests.exceptions.RequestException as req_ex:
-                logger.error(f"Request error for coin list, attempt {attempt+1}/{max_retries}: {str(req_ex)}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay * (attempt + 1))
-                
-            except Exception as ex:
-                logger.error(f"Unexpected error for coin list, attempt {attempt+1}/{max_retries}: {str(ex)}")
-                logger.error(traceback.format_exc())
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay * (attempt + 1))
+                processed_coins.append(coin_info)
+            except Exception as coin_error:
+                logger.warning(f"Error processing coin data: {str(coin_error)}")
+                continue
         
-        # If all attempts failed, return error
+        logger.info(f"Successfully retrieved {len(processed_coins)} coins from CoinGecko")
+        return {"success": True, "coins": processed_coins}
+        
+    except CircuitOpenError as open_ex:
+        logger.warning(f"Skipping coin list request: {str(open_ex)}")
+        return {"success": False, "error": "CoinGecko is temporarily unavailable, please try again shortly", "coins": []}
+        
+    except UpstreamError as req_ex:
+        logger.error(f"Request error for coin list: {str(req_ex)}")
         return {"success": False, "error": "Failed to retrieve coin list after multiple attempts", "coins": []}
         
     except Exception as e:
@@ -638,5 +760,13 @@ async def get_coins():
         logger.error(traceback.format_exc())
         return {"success": False, "error": "Failed to retrieve coin list", "coins": []}
 
+@app.on_event("shutdown")
+async def close_upstream_client():
+    await upstream.aclose()
+
+@app.on_event("shutdown")
+async def stop_training_jobs():
+    training_jobs.shutdown()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,129 @@
+import os
+import time
+
+import numpy as np
+
+# Upper bound on the number of rows sent through the model in one forward pass.
+# Large sample counts (mc_samples can go up to 1000) are split into chunks of
+# roughly this size to keep peak memory predictable.
+MC_CHUNK_SIZE = int(os.environ.get('MC_CHUNK_SIZE', 256))
+
+# Adaptive sampling draws this many samples per round and stops once the
+# standard error of the mean and the change of the 95% interval width over the
+# last round are within MC_ADAPTIVE_TOLERANCE (in model output units, i.e.
+# scaled prices, where 0.002 is 0.2% of the lookback window's price range)
+MC_ADAPTIVE_BATCH = int(os.environ.get('MC_ADAPTIVE_BATCH', 32))
+MC_ADAPTIVE_TOLERANCE = float(os.environ.get('MC_ADAPTIVE_TOLERANCE', 0.002))
+
+
+def mc_forward(model, X, chunk_size=None):
+    """Run one dropout-active forward pass over a batch of windows
+
+    Args:
+        model: Keras model with dropout layers
+        X: Input windows of shape (rows, lookback, features)
+        chunk_size: Maximum rows per forward pass (defaults to MC_CHUNK_SIZE)
+
+    Returns:
+        Array of shape (rows,) with one prediction per window, or
+        (rows, outputs) for models with several outputs per window
+    """
+    chunk_size = chunk_size or MC_CHUNK_SIZE
+    rows = X.shape[0]
+
+    output = None
+    for start in range(0, rows, chunk_size):
+        stop = min(start + chunk_size, rows)
+        chunk = np.asarray(model(X[start:stop], training=True)).reshape(stop - start, -1)
+        if output is None:
+            output = np.empty((rows, chunk.shape[1]), dtype=np.float32)
+        output[start:stop] = chunk
+
+    if output is None:
+        return np.empty(0, dtype=np.float32)
+    return output[:, 0] if output.shape[1] == 1 else output
+
+
+def mc_sample(model, X, n_samples=100, chunk_size=None):
+    """Draw Monte Carlo dropout samples with batched forward passes
+
+    The input windows are tiled into a (n_samples * batch, lookback, features)
+    tensor and evaluated with training=True, so every row gets its own dropout
+    mask. This replaces n_samples separate model.predict calls with one call
+    per chunk.
+
+    Args:
+        model: Keras model with dropout layers
+        X: Input windows of shape (batch, lookback, features) or (lookback, features)
+        n_samples: Number of Monte Carlo samples
+        chunk_size: Maximum rows per forward pass (defaults to MC_CHUNK_SIZE)
+
+    Returns:
+        Array of shape (n_samples, batch) with one prediction per sample and window,
+        or (n_samples, batch, outputs) for models with several outputs
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim == 2:
+        X = X[np.newaxis]
+
+    batch = X.shape[0]
+
+    # Sample-major tiling: rows [k*batch, (k+1)*batch) belong to sample k
+    tiled = np.broadcast_to(X, (n_samples,) + X.shape).reshape((n_samples * batch,) + X.shape[1:])
+    output = mc_forward(model, tiled, chunk_size)
+    return output.reshape((n_samples, batch) + output.shape[1:])
+
+
+def mc_sample_adaptive(model, X, max_samples=1000, batch_samples=None, tolerance=None, chunk_size=None,
+                       deadline=None):
+    """Draw Monte Carlo dropout samples in rounds until the estimate converges
+
+    Each round is one mc_sample call; its mean and sum of squared deviations
+    are merged into the running totals (Chan's batched form of Welford's
+    update). Sampling stops when, for every window and output, the standard
+    error of the mean and the change of the +-1.96 std interval width since
+    the previous round are both within tolerance, or after max_samples.
+    With a deadline.Deadline it also stops before a round that would not
+    finish in time, recording the 'mc_samples_truncated' degradation; the
+    first round is always drawn.
+
+    Args:
+        max_samples: Upper bound on the number of samples
+        batch_samples: Samples per round (defaults to MC_ADAPTIVE_BATCH)
+        tolerance: Convergence tolerance (defaults to MC_ADAPTIVE_TOLERANCE)
+        deadline: Optional deadline.Deadline bounding the sampling time
+
+    Returns:
+        (samples, standard_error): samples shaped like mc_sample's output with
+        as many rows as were drawn, and the standard error of the mean with
+        the shape of one sample
+    """
+    batch_samples = batch_samples or MC_ADAPTIVE_BATCH
+    tolerance = MC_ADAPTIVE_TOLERANCE if tolerance is None else tolerance
+
+    rounds = []
+    count, mean, m2, width = 0, 0.0, 0.0, None
+    started = time.perf_counter()
+    while count < max_samples:
+        if deadline is not None and rounds and deadline.remaining() < (time.perf_counter() - started) / len(rounds):
+            deadline.degrade('mc_samples_truncated')
+            break
+        n = min(batch_samples, max_samples - count)
+        batch = mc_sample(model, X, n, chunk_size).astype(np.float64)
+        rounds.append(batch)
+
+        batch_mean = batch.mean(axis=0)
+        delta = batch_mean - mean
+        total = count + n
+        mean = mean + delta * n / total
+        m2 = m2 + ((batch - batch_mean) ** 2).sum(axis=0) + delta ** 2 * count * n / total
+        count = total
+
+        std = np.sqrt(m2 / count)
+        standard_error = std / np.sqrt(count)
+        new_width = 2 * 1.96 * std
+        if (width is not None and np.all(standard_error <= tolerance)
+                and np.all(np.abs(new_width - width) <= tolerance)):
+            break
+        width = new_width
+    return np.concatenate(rounds).astype(np.float32), standard_error
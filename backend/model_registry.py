@@ -0,0 +1,147 @@
+import gc
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Budget for models kept in memory. Whichever limit is hit first triggers
+# eviction of the least recently used model.
+MODEL_REGISTRY_MAX_MODELS = int(os.environ.get('MODEL_REGISTRY_MAX_MODELS', 8))
+MODEL_REGISTRY_MAX_BYTES = int(os.environ.get('MODEL_REGISTRY_MAX_BYTES', 512 * 1024 * 1024))
+
+
+def _artifact_mtime(path):
+    """Modification time of a model artifact, or None if it does not exist"""
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _estimate_model_bytes(model):
+    """Approximate resident size of a model from its float32 parameter count"""
+    try:
+        return int(model.count_params()) * 4
+    except Exception:
+        return 0
+
+
+def _warm_model(model):
+    """Run one dummy forward pass so the first real request doesn't pay for tracing"""
+    try:
+        input_shape = model.input_shape
+        model(np.zeros((1,) + tuple(input_shape[1:]), dtype=np.float32), training=False)
+    except Exception as e:
+        print(f"Model warm-up skipped: {str(e)}")
+
+
+class ModelRegistry:
+    """In-process cache of loaded models with LRU eviction
+
+    Entries are keyed by (coin, artifact path) and remember the artifact's
+    mtime, so a retrained model file is picked up on the next lookup.
+    """
+
+    def __init__(self, max_models=MODEL_REGISTRY_MAX_MODELS, max_bytes=MODEL_REGISTRY_MAX_BYTES):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, coin, path):
+        return (coin, os.path.abspath(path))
+
+    def _lookup(self, key, mtime):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['mtime'] == mtime:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry['model']
+            return None
+
+    def get(self, coin, path, loader):
+        """Return the model for coin/path, loading it with loader(path) on a miss"""
+        key = self._key(coin, path)
+        model = self._lookup(key, _artifact_mtime(path))
+        if model is not None:
+            return model
+
+        # Serialize loads of the same artifact so concurrent misses load it once
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            mtime = _artifact_mtime(path)
+            model = self._lookup(key, mtime)
+            if model is not None:
+                return model
+
+            with self._lock:
+                self.misses += 1
+            model = loader(path)
+            _warm_model(model)
+            self._store(key, model, mtime)
+            return model
+
+    def put(self, coin, path, model):
+        """Register a freshly trained model under its saved artifact"""
+        self._store(self._key(coin, path), model, _artifact_mtime(path))
+
+    def _store(self, key, model, mtime):
+        with self._lock:
+            if key in self._entries:
+                self._release(key)
+            self._entries[key] = {
+                'model': model,
+                'mtime': mtime,
+                'bytes': _estimate_model_bytes(model),
+            }
+            self._evict_over_budget()
+
+    def _total_bytes(self):
+        return sum(entry['bytes'] for entry in self._entries.values())
+
+    def _evict_over_budget(self):
+        # Always keep the most recently stored model, even if it alone exceeds the budget
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_models or self._total_bytes() > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._release(oldest)
+            self.evictions += 1
+
+    def _release(self, key):
+        entry = self._entries.pop(key)
+        entry['model'] = None
+        del entry
+        gc.collect()
+
+    def clear(self):
+        """Drop every cached model"""
+        with self._lock:
+            for key in list(self._entries):
+                self._release(key)
+
+    def stats(self):
+        """Counters and current occupancy for diagnostics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'models_loaded': len(self._entries),
+                'bytes_loaded': self._total_bytes(),
+                'max_models': self.max_models,
+                'max_bytes': self.max_bytes,
+            }
+
+
+# Shared registry for the whole process
+model_registry = ModelRegistry()
@@ -0,0 +1,171 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from mc_dropout import MC_CHUNK_SIZE, mc_sample, mc_sample_adaptive
+from model_registry import model_registry
+from rollout import rollout_forecast
+from windowing import window_batches
+
+# Number of days predicted by the direct multi-horizon head
+DIRECT_HORIZON = int(os.environ.get('DIRECT_HORIZON', 30))
+# History fetched to train a direct model; every window needs lookback + future_days + horizon days
+DIRECT_TRAINING_DAYS = int(os.environ.get('DIRECT_TRAINING_DAYS', 730))
+
+
+def direct_model_path_for(coin_symbol):
+    """Path of the saved direct multi-horizon model for a coin"""
+    return f'models/{coin_symbol.replace("-", "_")}_direct_model.h5'
+
+
+def direct_model_mtime(coin_symbol):
+    """Modification time of the coin's direct model, or None if it has none"""
+    try:
+        return os.path.getmtime(direct_model_path_for(coin_symbol))
+    except OSError:
+        return None
+
+
+def get_direct_model(coin_symbol, future_days):
+    """Registry-cached direct model for a coin if one exists and covers future_days, else None"""
+    from prediction_utils import load_prediction_model
+
+    model_path = direct_model_path_for(coin_symbol)
+    if not os.path.exists(model_path):
+        return None
+    model = model_registry.get(coin_symbol, model_path, load_prediction_model)
+    return model if direct_horizon(model) >= future_days else None
+
+
+def direct_horizon(model):
+    """Number of days a direct model predicts per forward pass"""
+    output_shape = getattr(model, 'output_shape', None)
+    if output_shape is None:
+        # NumPy backend: width of the final Dense kernel
+        output_shape = (None, model.layers[-1].kernel.shape[1])
+    return output_shape[-1]
+
+
+def train_direct_model(coin_symbol, windows, targets, epochs=50, on_epoch_end=None, trained_through=None,
+                       scaling_days=None):
+    """Train an LSTM whose output layer predicts the next `horizon` closes at once
+
+    Same trunk as the one-step model; only the Dense head is horizon wide.
+    windows and targets come from prediction_utils.serving_windows and
+    serving_targets, so every window and its following closes are scaled the
+    way a request at that origin scales them.
+
+    Args:
+        windows: Scaled windows of shape (origins, lookback, features)
+        targets: The following `horizon` closes of every window, shape (origins, horizon)
+        scaling_days: Days each window was scaled over, recorded in the metadata
+
+    Returns:
+        (model, history)
+    """
+    import tensorflow as tf
+
+    from prediction_utils import save_model
+
+    keras = tf.keras
+    _, lookback, n_features = windows.shape
+    horizon = targets.shape[1]
+    model = keras.Sequential([
+        keras.layers.LSTM(50, return_sequences=True, input_shape=(lookback, n_features)),
+        keras.layers.Dropout(0.2),
+        keras.layers.LSTM(50, return_sequences=False),
+        keras.layers.Dropout(0.2),
+        keras.layers.Dense(horizon)
+    ])
+    model.compile(optimizer='adam', loss=keras.losses.MeanSquaredError())
+
+    callbacks = [keras.callbacks.EarlyStopping(monitor='val_loss', patience=10)]
+    if on_epoch_end is not None:
+        callbacks.append(keras.callbacks.LambdaCallback(on_epoch_end=on_epoch_end))
+    history = model.fit(**window_batches(windows, targets, batch_size=32, validation_split=0.2),
+                        epochs=epochs, callbacks=callbacks, verbose=0)
+
+    save_model(coin_symbol, model, {
+        'mode': 'direct',
+        'lookback': lookback,
+        'horizon': horizon,
+        'scaling_days': scaling_days,
+        'trained_through': pd.Timestamp(trained_through).isoformat() if trained_through is not None else None,
+    }, model_path=direct_model_path_for(coin_symbol))
+    return model, history
+
+
+def direct_forecast(model, history, future_days, n_samples=100, quantiles=(0.025, 0.975), chunk_size=None,
+                    adaptive=False, deadline=None):
+    """MC dropout forecast of the whole horizon from one forward pass per sample
+
+    Args:
+        model: Direct model with a horizon-wide output layer
+        history: Scaled feature window of shape (lookback, features)
+        adaptive: Treat n_samples as a cap and stop sampling once every day converged
+        deadline: Optional deadline.Deadline that cuts sampling short
+
+    Returns:
+        Dictionary of per-day arrays in scaled units: mean, std, lower, upper,
+        the same layout rollout_forecast returns, plus the number of samples drawn
+    """
+    if adaptive:
+        samples, _ = mc_sample_adaptive(model, history, n_samples, chunk_size=chunk_size, deadline=deadline)
+    elif deadline is not None:
+        samples, _ = mc_sample_adaptive(model, history, n_samples, batch_samples=MC_CHUNK_SIZE, tolerance=0.0,
+                                        chunk_size=chunk_size, deadline=deadline)
+    else:
+        samples = mc_sample(model, history, n_samples, chunk_size)
+    samples = samples[:, 0, :future_days]
+    lower, upper = np.quantile(samples, quantiles, axis=0)
+    return {
+        'mean': samples.mean(axis=0),
+        'std': samples.std(axis=0),
+        'lower': lower,
+        'upper': upper,
+        'samples': len(samples),
+    }
+
+
+def compare_direct_vs_rollout(direct_model, step_model, history, scaler, future_days, n_samples=100,
+                              close_history=None, actual=None):
+    """Run the direct head and the iterative rollout on the same window
+
+    Args:
+        direct_model: Model predicting the horizon in one pass
+        step_model: One-step model used by rollout_forecast
+        actual: Optional realized closes for the forecast days, to score both
+
+    Returns:
+        Dictionary with wall time of both methods, speedup, mean/max absolute
+        difference of their mean paths (price units) and, with `actual`, the
+        mean absolute error of each
+    """
+    scale, offset = scaler.scale_[0], scaler.min_[0]
+
+    started = time.perf_counter()
+    direct = direct_forecast(direct_model, history, future_days, n_samples)
+    direct_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rolled = rollout_forecast(step_model, history, scaler, future_days, n_samples=n_samples,
+                              close_history=close_history)
+    rollout_seconds = time.perf_counter() - started
+
+    direct_mean = (direct['mean'] - offset) / scale
+    rollout_mean = (rolled['mean'] - offset) / scale
+    diff = np.abs(direct_mean - rollout_mean)
+    report = {
+        'direct_seconds': direct_seconds,
+        'rollout_seconds': rollout_seconds,
+        'speedup': rollout_seconds / direct_seconds if direct_seconds else float('inf'),
+        'mean_abs_diff': float(diff.mean()),
+        'max_abs_diff': float(diff.max()),
+    }
+    if actual is not None:
+        actual = np.asarray(actual, dtype=float)[:future_days]
+        report['direct_mae'] = float(np.abs(direct_mean[:len(actual)] - actual).mean())
+        report['rollout_mae'] = float(np.abs(rollout_mean[:len(actual)] - actual).mean())
+    return report
@@ -0,0 +1,225 @@
+import json
+import os
+
+import h5py
+import numpy as np
+
+# 'keras' serves with TensorFlow; 'numpy' serves saved .h5 models with NumpyLSTMModel
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras').lower()
+
+ACTIVATIONS = {
+    'sigmoid': lambda x: 1.0 / (1.0 + np.exp(-x)),
+    'hard_sigmoid': lambda x: np.clip(0.2 * x + 0.5, 0.0, 1.0),
+    'tanh': np.tanh,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'linear': lambda x: x,
+}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation: {name}")
+    return ACTIVATIONS[name]
+
+
+def _dropout_mask(rng, shape, rate, dtype=np.float32):
+    """Inverted dropout mask, scaled the same way as Keras"""
+    return (rng.random(shape) >= rate).astype(dtype) / dtype(1.0 - rate)
+
+
+class LSTMLayer:
+    """Forward pass of a Keras LSTM layer (gate order i, f, c, o)"""
+
+    def __init__(self, kernel, recurrent_kernel, bias, config):
+        self.kernel = kernel.astype(np.float32)
+        self.recurrent_kernel = recurrent_kernel.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.units = config['units']
+        self.return_sequences = config.get('return_sequences', False)
+        self.activation = _activation(config.get('activation', 'tanh'))
+        self.recurrent_activation = _activation(config.get('recurrent_activation', 'sigmoid'))
+        self.dropout = config.get('dropout', 0.0)
+        self.recurrent_dropout = config.get('recurrent_dropout', 0.0)
+
+    def masks(self, rng, batch, input_dim, training):
+        """Per-sequence input and recurrent dropout masks, or None outside training"""
+        input_mask = recurrent_mask = None
+        if training and 0 < self.dropout < 1:
+            input_mask = _dropout_mask(rng, (batch, input_dim), self.dropout)
+        if training and 0 < self.recurrent_dropout < 1:
+            recurrent_mask = _dropout_mask(rng, (batch, self.units), self.recurrent_dropout)
+        return input_mask, recurrent_mask
+
+    def step(self, x_proj, h, c, recurrent_mask=None):
+        """Advance one timestep given the input already multiplied by the kernel"""
+        h_in = h if recurrent_mask is None else h * recurrent_mask
+        z = x_proj + h_in @ self.recurrent_kernel
+        units = self.units
+        i = self.recurrent_activation(z[:, :units])
+        f = self.recurrent_activation(z[:, units:2 * units])
+        g = self.activation(z[:, 2 * units:3 * units])
+        o = self.recurrent_activation(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * self.activation(c)
+        return h, c
+
+    def run(self, x, input_mask=None, recurrent_mask=None):
+        """Run a whole sequence from a zero state and return (outputs, h, c)"""
+        batch, steps, _ = x.shape
+        if input_mask is not None:
+            x = x * input_mask[:, np.newaxis, :]
+
+        # Project every timestep through the input kernel with one matmul
+        x_proj = x @ self.kernel + self.bias
+        h = np.zeros((batch, self.units), dtype=np.float32)
+        c = np.zeros((batch, self.units), dtype=np.float32)
+        outputs = np.empty((batch, steps, self.units), dtype=np.float32) if self.return_sequences else None
+        for t in range(steps):
+            h, c = self.step(x_proj[:, t], h, c, recurrent_mask)
+            if outputs is not None:
+                outputs[:, t] = h
+        return (outputs if outputs is not None else h), h, c
+
+    def __call__(self, x, rng=None, training=False):
+        batch, _, input_dim = x.shape
+        return self.run(x, *self.masks(rng, batch, input_dim, training))[0]
+
+
+class DropoutLayer:
+    def __init__(self, config):
+        self.rate = config.get('rate', 0.0)
+
+    def __call__(self, x, rng=None, training=False):
+        if not training or not 0 < self.rate < 1:
+            return x
+        return x * _dropout_mask(rng, x.shape, self.rate)
+
+
+class DenseLayer:
+    def __init__(self, kernel, bias, config):
+        self.kernel = kernel.astype(np.float32)
+        self.bias = bias.astype(np.float32) if bias is not None else 0.0
+        self.activation = _activation(config.get('activation', 'linear'))
+
+    def __call__(self, x, rng=None, training=False):
+        return self.activation(x @ self.kernel + self.bias)
+
+
+def _layer_weights(weights_group, layer_name):
+    group = weights_group[layer_name]
+    names = [n.decode() if isinstance(n, bytes) else n for n in group.attrs.get('weight_names', [])]
+    return [np.asarray(group[name]) for name in names]
+
+
+class LSTMStepper:
+    """Carries the recurrent state of every LSTM layer so a sequence can be extended one timestep at a time
+
+    Created by NumpyLSTMModel.start_stepping(). Each row keeps the dropout
+    masks it was started with, so with training=True every row is one fixed
+    sampled network, as in a single MC dropout pass over the whole sequence.
+    """
+
+    def __init__(self, model, states, output, rng=None, training=False):
+        self.model = model
+        self.states = states
+        self.output = output
+        self.rng = rng
+        self.training = training
+
+    def step(self, x_t):
+        """Feed one timestep of shape (batch, features) and return the new outputs"""
+        x = np.asarray(x_t, dtype=np.float32)
+        for layer, state in zip(self.model.layers, self.states):
+            if state is None:
+                x = layer(x, rng=self.rng, training=self.training)
+                continue
+            input_mask, recurrent_mask, h, c = state
+            if input_mask is not None:
+                x = x * input_mask
+            h, c = layer.step(x @ layer.kernel + layer.bias, h, c, recurrent_mask)
+            state[2], state[3] = h, c
+            x = h
+        self.output = x.reshape(len(x), -1)[:, 0]
+        return self.output
+
+
+class NumpyLSTMModel:
+    """Inference-only Sequential LSTM/Dropout/Dense stack evaluated with NumPy
+
+    Mirrors the parts of the Keras model interface the serving code uses:
+    model(X, training=...) for batched (MC dropout) forward passes, predict(),
+    input_shape and count_params(). With training=True each row gets its own
+    dropout masks, exactly like the Keras layers.
+    """
+
+    def __init__(self, layers, input_shape):
+        self.layers = layers
+        self.input_shape = input_shape
+
+    @classmethod
+    def from_h5(cls, path):
+        """Build the model from a Keras .h5 file (architecture and weights)"""
+        with h5py.File(path, 'r') as f:
+            config = json.loads(f.attrs['model_config'])
+            if config.get('class_name') != 'Sequential':
+                raise ValueError(f"Only Sequential models are supported, got {config.get('class_name')}")
+            weights_group = f['model_weights'] if 'model_weights' in f else f
+
+            layers = []
+            input_shape = None
+            for layer in config['config']['layers']:
+                class_name, layer_config = layer['class_name'], layer['config']
+                if input_shape is None:
+                    input_shape = layer_config.get('batch_shape') or layer_config.get('batch_input_shape')
+                if class_name == 'InputLayer':
+                    continue
+                if class_name == 'LSTM':
+                    kernel, recurrent_kernel, bias = _layer_weights(weights_group, layer_config['name'])
+                    layers.append(LSTMLayer(kernel, recurrent_kernel, bias, layer_config))
+                elif class_name == 'Dropout':
+                    layers.append(DropoutLayer(layer_config))
+                elif class_name == 'Dense':
+                    weights = _layer_weights(weights_group, layer_config['name'])
+                    layers.append(DenseLayer(weights[0], weights[1] if len(weights) > 1 else None, layer_config))
+                else:
+                    raise ValueError(f"Unsupported layer type: {class_name}")
+
+        return cls(layers, tuple(input_shape) if input_shape else None)
+
+    def __call__(self, X, training=False):
+        x = np.asarray(X, dtype=np.float32)
+        rng = np.random.default_rng() if training else None
+        for layer in self.layers:
+            x = layer(x, rng=rng, training=training)
+        return x
+
+    def start_stepping(self, X, training=False):
+        """Run X of shape (batch, steps, features) and keep the state after its last timestep
+
+        Returns an LSTMStepper whose output holds the prediction for X; each
+        later step() appends one timestep instead of re-running the window.
+        """
+        x = np.asarray(X, dtype=np.float32)
+        rng = np.random.default_rng() if training else None
+        states = []
+        for layer in self.layers:
+            if isinstance(layer, LSTMLayer):
+                input_mask, recurrent_mask = layer.masks(rng, x.shape[0], x.shape[2], training)
+                x, h, c = layer.run(x, input_mask, recurrent_mask)
+                states.append([input_mask, recurrent_mask, h, c])
+            else:
+                x = layer(x, rng=rng, training=training)
+                states.append(None)
+        return LSTMStepper(self, states, x.reshape(len(x), -1)[:, 0], rng=rng, training=training)
+
+    def predict(self, X, verbose=0):
+        return self(X, training=False)
+
+    def count_params(self):
+        total = 0
+        for layer in self.layers:
+            for name in ('kernel', 'recurrent_kernel', 'bias'):
+                weights = getattr(layer, name, None)
+                if isinstance(weights, np.ndarray):
+                    total += weights.size
+        return total
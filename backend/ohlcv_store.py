@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Directory holding one memory-mappable segment per coin
+OHLCV_STORE_DIR = os.environ.get('OHLCV_STORE_DIR', os.path.join('data', 'ohlcv'))
+# Closed candles the stored tail may lag behind when upstream is unreachable
+OHLCV_MAX_STALE_DAYS = int(os.environ.get('OHLCV_MAX_STALE_DAYS', 3))
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+# One record per closed daily candle; ts is the candle's UTC day in epoch seconds
+RECORD_DTYPE = np.dtype([('ts', '<i8')] + [(column, '<f8') for column in COLUMNS])
+
+DAY_SECONDS = 86400
+
+
+def _today_ts():
+    """Epoch seconds of the current (still open) UTC daily candle"""
+    return int(pd.Timestamp.now(tz='UTC').floor('D').timestamp())
+
+
+def last_closed_candle():
+    """Date of the newest daily candle that has closed"""
+    return pd.Timestamp(_today_ts() - DAY_SECONDS, unit='s')
+
+
+def _frame_to_records(df):
+    """Convert an OHLCV frame to closed-candle records, one per UTC day"""
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    days = index.floor('D').as_unit('s').asi8
+
+    records = np.empty(len(df), dtype=RECORD_DTYPE)
+    records['ts'] = days
+    for column in COLUMNS:
+        source = 'Close' if column == 'Adj Close' and column not in df else column
+        records[column] = df[source].to_numpy(dtype=float) if source in df else np.nan
+
+    # Keep the last row per day and drop the candle that hasn't closed yet
+    order = np.argsort(records['ts'], kind='stable')
+    records = records[order]
+    last_per_day = np.append(records['ts'][1:] != records['ts'][:-1], True)
+    records = records[last_per_day]
+    return records[records['ts'] < _today_ts()]
+
+
+def _records_to_frame(records):
+    df = pd.DataFrame({column: np.asarray(records[column]) for column in COLUMNS},
+                      index=pd.to_datetime(np.asarray(records['ts']), unit='s'))
+    df.index.name = 'Date'
+    return df
+
+
+class OHLCVStore:
+    """Per-coin on-disk store of daily OHLCV candles
+
+    Each coin is one structured NumPy array of closed candles sorted by
+    timestamp, read with mmap so several worker processes can share the page
+    cache. Writers merge new candles into a temporary file and atomically
+    replace the segment, so readers never see a partial write.
+    """
+
+    def __init__(self, root=OHLCV_STORE_DIR):
+        self.root = root
+        self._write_lock = threading.Lock()
+
+    def _segment_path(self, coin):
+        return os.path.join(self.root, f"{coin.upper()}.npy")
+
+    def _meta_path(self, coin):
+        return os.path.join(self.root, f"{coin.upper()}.json")
+
+    def _load(self, coin):
+        try:
+            return np.load(self._segment_path(coin), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def _meta(self, coin):
+        try:
+            with open(self._meta_path(coin)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _atomic_write(self, path, write):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def last_timestamp(self, coin):
+        """Timestamp of the newest stored candle, or None"""
+        records = self._load(coin)
+        if records is None or len(records) == 0:
+            return None
+        return pd.Timestamp(int(records['ts'][-1]), unit='s')
+
+    def read(self, coin, start=None, end=None):
+        """Return stored candles with start <= Date < end as a DataFrame, or None"""
+        records = self._load(coin)
+        if records is None or len(records) == 0:
+            return None
+        ts = records['ts']
+        lo = 0 if start is None else np.searchsorted(ts, int(pd.Timestamp(start).timestamp()), side='left')
+        hi = len(ts) if end is None else np.searchsorted(ts, int(pd.Timestamp(end).timestamp()), side='left')
+        if hi <= lo:
+            return None
+        return _records_to_frame(records[lo:hi])
+
+    def append(self, coin, df, covered_from=None):
+        """Merge candles from df into the coin's segment
+
+        Candles already stored are kept as they are: they are closed and final.
+        covered_from records how far back upstream history was requested, so
+        young coins aren't re-downloaded just because their history is short.
+        """
+        new_records = _frame_to_records(df)
+        os.makedirs(self.root, exist_ok=True)
+
+        with self._write_lock:
+            existing = self._load(coin)
+            if existing is not None and len(existing):
+                existing = np.array(existing)
+                fresh = new_records[~np.isin(new_records['ts'], existing['ts'])]
+                merged = np.concatenate([existing, fresh])
+                merged = merged[np.argsort(merged['ts'], kind='stable')]
+            else:
+                merged = new_records
+
+            self._atomic_write(self._segment_path(coin), lambda f: np.save(f, merged))
+
+            meta = self._meta(coin)
+            if covered_from is not None:
+                meta['covered_from'] = min(meta.get('covered_from', covered_from), covered_from)
+            elif len(merged):
+                meta.setdefault('covered_from', int(merged['ts'][0]))
+            self._atomic_write(self._meta_path(coin), lambda f: f.write(json.dumps(meta).encode()))
+
+    def _covers(self, coin, start, today):
+        """Whether stored candles span the window from `start` with at most OHLCV_MAX_STALE_DAYS missing at the end"""
+        records = self._load(coin)
+        covered_from = self._meta(coin).get('covered_from')
+        if records is None or len(records) == 0 or covered_from is None or covered_from > start:
+            return False
+        return records['ts'][-1] >= today - (OHLCV_MAX_STALE_DAYS + 1) * DAY_SECONDS
+
+    def get_history(self, coin, days, fetch):
+        """Return the last `days` closed candles, downloading only what is missing
+
+        Args:
+            coin: Coin symbol used as the segment name (e.g. 'BTC-USD')
+            days: Number of daily candles wanted
+            fetch: Callable fetch(n_days) returning an upstream OHLCV frame or None
+
+        Returns:
+            DataFrame indexed by Date, or None if upstream has nothing and the
+            store can't cover the window (never stored from `days` back, or
+            more than OHLCV_MAX_STALE_DAYS behind)
+        """
+        today = _today_ts()
+        start = today - days * DAY_SECONDS
+
+        records = self._load(coin)
+        covered_from = self._meta(coin).get('covered_from')
+
+        if records is None or len(records) == 0 or covered_from is None or covered_from > start:
+            # Nothing stored for the requested range yet: download the full window
+            fetch_days, fetch_from = days, start
+        elif records['ts'][-1] < today - DAY_SECONDS:
+            # Only the tail since the newest stored candle is missing
+            fetch_days, fetch_from = int((today - records['ts'][-1]) // DAY_SECONDS) + 1, None
+        else:
+            fetch_days = 0
+
+        if fetch_days:
+            print(f"[DEBUG] OHLCV store: fetching {fetch_days} days for {coin}")
+            df = fetch(fetch_days)
+            if df is not None and not df.empty:
+                self.append(coin, df, covered_from=fetch_from)
+            elif self._covers(coin, start, today):
+                print(f"[DEBUG] OHLCV store: upstream returned nothing for {coin}, serving stored data")
+            else:
+                # Let the caller fall back instead of serving a truncated window
+                print(f"[DEBUG] OHLCV store: upstream returned nothing for {coin} and the store can't cover the window")
+                return None
+        else:
+            print(f"[DEBUG] OHLCV store: serving {coin} from local store")
+
+        return self.read(coin, start=pd.Timestamp(start, unit='s'))
+
+
+# Shared store for the whole process
+ohlcv_store = OHLCVStore()
@@ -0,0 +1,110 @@
+import asyncio
+import functools
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Number of predictions that run at the same time
+PREDICT_WORKERS = int(os.environ.get('PREDICT_WORKERS', 2))
+# Number of predictions allowed to wait for a worker before new ones are rejected
+PREDICT_MAX_QUEUE = int(os.environ.get('PREDICT_MAX_QUEUE', 8))
+
+
+class PoolSaturatedError(Exception):
+    """Raised when a job is rejected because the pool is at its in-flight limit"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Prediction capacity exhausted, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PredictionPool:
+    """Bounded executor for blocking prediction work
+
+    Jobs run on a fixed set of worker threads so the event loop stays free for
+    cheap endpoints. At most max_workers + max_queue jobs are admitted at once;
+    anything beyond that is rejected immediately with PoolSaturatedError.
+    """
+
+    def __init__(self, max_workers=PREDICT_WORKERS, max_queue=PREDICT_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_in_flight = max_workers + max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='predict')
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_times = deque(maxlen=1000)
+        self._run_times = deque(maxlen=1000)
+
+    def _admit(self):
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self.rejected += 1
+                raise PoolSaturatedError(self._retry_after())
+            self._in_flight += 1
+
+    def _retry_after(self):
+        # Expected time until a queue slot frees up, from recent run times
+        avg_run = sum(self._run_times) / len(self._run_times) if self._run_times else 1.0
+        waiting = max(0, self._in_flight - self._running)
+        return max(1, math.ceil(avg_run * (waiting + 1) / self.max_workers))
+
+    def _execute(self, fn, submitted_at):
+        started_at = time.monotonic()
+        with self._lock:
+            self._running += 1
+            self._wait_times.append(started_at - submitted_at)
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._in_flight -= 1
+                self.completed += 1
+                self._run_times.append(time.monotonic() - started_at)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on a worker thread and await its result"""
+        self._admit()
+        try:
+            call = functools.partial(self._execute, functools.partial(fn, *args, **kwargs), time.monotonic())
+            future = self._executor.submit(call)
+        except Exception:
+            self._release_slot()
+            raise
+        # A job cancelled before it starts never reaches _execute, so free its slot here
+        future.add_done_callback(lambda f: f.cancelled() and self._release_slot())
+        return await asyncio.wrap_future(future)
+
+    def _release_slot(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self):
+        """Queue depth, utilization and wait-time percentiles for diagnostics"""
+        with self._lock:
+            waits = np.array(self._wait_times) * 1000
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'running': self._running,
+                'queue_depth': self._in_flight - self._running,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'wait_ms_avg': float(waits.mean()) if len(waits) else 0.0,
+                'wait_ms_p95': float(np.percentile(waits, 95)) if len(waits) else 0.0,
+                'wait_ms_max': float(waits.max()) if len(waits) else 0.0,
+            }
+
+
+# Shared pool for the whole process
+prediction_pool = PredictionPool()
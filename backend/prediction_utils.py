@@ -1,28 +1,62 @@
 import yfinance as yf
 import pandas as pd
 import numpy as np
-from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import LSTM, Dense, Dropout
-from tensorflow.keras.regularizers import l2
-from tensorflow.keras.callbacks import EarlyStopping
-import tensorflow as tf
-from tensorflow.keras import losses
 import datetime
+import functools
+import json
 import os
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+import threading
 from io import BytesIO
 import base64
-import requests
 from bs4 import BeautifulSoup
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import MinMaxScaler
+from global_model import get_global_model
+from hedging import race
+from http_client import COINGECKO_BASE_URL, CRYPTOCOMPARE_BASE_URL, upstream
+from conformal import backfill_residuals, conformal_forecast
+from deadline import DEADLINE_DATA_SHARE, DEADLINE_MIN_SOURCE_MS, DEADLINE_PLOT_RESERVE_MS
+from distill import DISTILL_TRAINING_DAYS, distill_student_model, get_student_model, student_predict
+from mc_dropout import MC_CHUNK_SIZE, mc_sample, mc_sample_adaptive
+from model_registry import model_registry
+from multi_horizon import DIRECT_HORIZON, DIRECT_TRAINING_DAYS, direct_forecast, get_direct_model, train_direct_model
+from numpy_lstm import INFERENCE_BACKEND, NumpyLSTMModel
+from ohlcv_store import ohlcv_store
+from synthetic_data import generate_synthetic_data
+from windowing import sliding_windows, training_batches, window_targets
 
-# Enable memory growth for GPU usage
-try:
-    physical_devices = tf.config.list_physical_devices('GPU')
-    if physical_devices:
-        tf.config.experimental.set_memory_growth(physical_devices[0], True)
-except:
-    pass
+# Serializes pyplot usage across prediction worker threads
+_plot_lock = threading.Lock()
+
+# Model input columns, in order
+FEATURES = ['Close', 'RSI', 'MACD', 'Signal']
+
+# How /predict derives its interval: 'mc' samples the model with dropout, 'fast' serves the
+# distilled student, 'conformal' uses bands from the coin's backtest residuals
+UNCERTAINTY_MODES = ('mc', 'fast', 'conformal')
+
+# Incremental fine-tuning: epochs over the new windows, number of older windows
+# replayed alongside them, and the (lower) learning rate used to warm-start
+FINE_TUNE_EPOCHS = int(os.environ.get('FINE_TUNE_EPOCHS', 5))
+FINE_TUNE_REPLAY = int(os.environ.get('FINE_TUNE_REPLAY', 64))
+FINE_TUNE_LEARNING_RATE = float(os.environ.get('FINE_TUNE_LEARNING_RATE', 1e-4))
+
+@functools.lru_cache(maxsize=None)
+def _tensorflow():
+    """Import TensorFlow on first use, so workers serving with the numpy backend never load it"""
+    import tensorflow as tf
+    
+    # Enable memory growth for GPU usage
+    try:
+        physical_devices = tf.config.list_physical_devices('GPU')
+        if physical_devices:
+            tf.config.experimental.set_memory_growth(physical_devices[0], True)
+    except:
+        pass
+    return tf
 
 def compute_rsi(close_series, window=14):
     """Calculate RSI for a given price series"""
@@ -78,28 +112,32 @@ def compute_macd(close_series):
         print(f"Error in MACD calculation: {str(e)}")
         return pd.Series([0] * len(close_series), index=close_series.index), pd.Series([0] * len(close_series), index=close_series.index)
 
-def mc_predict(model, X, n_samples=100):
-    """Make predictions using Monte Carlo dropout and calculate confidence intervals"""
+def mc_predict(model, X, n_samples=100, adaptive=False, deadline=None):
+    """Make predictions using Monte Carlo dropout and calculate confidence intervals
+
+    With adaptive, n_samples is an upper bound: samples are drawn in rounds
+    until the mean and interval width converge (see mc_sample_adaptive).
+    A deadline.Deadline cuts sampling short when it runs out.
+
+    Returns:
+        (mean, std, lower_bound, upper_bound, samples_used)
+    """
     try:
-        predictions = []
-        
-        # Enable dropout during inference (MC Dropout)
-        for _ in range(n_samples):
-            pred = model.predict(X, verbose=0)
-            predictions.append(pred)
-        
-        # Convert predictions to numpy array and ensure proper shape
-        predictions = np.array(predictions)
+        # Run all samples in batched forward passes with dropout active (MC Dropout)
+        if adaptive:
+            predictions, _ = mc_sample_adaptive(model, X, n_samples, deadline=deadline)
+        elif deadline is not None:
+            # Full-size rounds with zero tolerance: only the deadline stops sampling early
+            predictions, _ = mc_sample_adaptive(model, X, n_samples, batch_samples=MC_CHUNK_SIZE, tolerance=0.0,
+                                                deadline=deadline)
+        else:
+            predictions = mc_sample(model, X, n_samples)
         
         # Handle both single prediction and multiple predictions
-        if len(predictions.shape) == 3:  # Multiple predictions
-            predictions = predictions.squeeze()
-            mean_pred = np.mean(predictions, axis=0)
-            std_pred = np.std(predictions, axis=0)
-        else:  # Single prediction
-            predictions = predictions.squeeze()
-            mean_pred = np.mean(predictions)
-            std_pred = np.std(predictions)
+        if predictions.shape[1] == 1:  # Single prediction
+            predictions = predictions[:, 0]
+        mean_pred = np.mean(predictions, axis=0)
+        std_pred = np.std(predictions, axis=0)
         
         # Ensure predictions are valid
         if np.isnan(mean_pred) or np.isnan(std_pred):
@@ -117,11 +155,32 @@ def mc_predict(model, X, n_samples=100):
         if upper_bound > mean_pred * 2:
             upper_bound = mean_pred * 1.05  # 5% above mean
         
-        return mean_pred, std_pred, lower_bound, upper_bound
+        return mean_pred, std_pred, lower_bound, upper_bound, len(predictions)
     except Exception as e:
         print(f"Error in MC prediction: {str(e)}")
         # Return fallback values
-        return X[0, -1, 0], 0.01, X[0, -1, 0] * 0.95, X[0, -1, 0] * 1.05
+        return X[0, -1, 0], 0.01, X[0, -1, 0] * 0.95, X[0, -1, 0] * 1.05, 0
+
+def load_prediction_model(model_path):
+    """Load a saved prediction model from disk with the configured inference backend"""
+    if INFERENCE_BACKEND == 'numpy':
+        try:
+            return NumpyLSTMModel.from_h5(model_path)
+        except Exception as e:
+            print(f"NumPy backend could not load {model_path}, falling back to Keras: {str(e)}")
+    return load_keras_model(model_path)
+
+def load_keras_model(model_path):
+    """Load a saved model as a trainable Keras model"""
+    losses = _tensorflow().keras.losses
+    
+    # Register custom objects for model loading
+    custom_objects = {
+        'mse': losses.MeanSquaredError(),
+        'mean_squared_error': losses.MeanSquaredError(),
+        'MSE': losses.MeanSquaredError()
+    }
+    return _tensorflow().keras.models.load_model(model_path, custom_objects=custom_objects)
 
 def update_indicators(prev_data, new_close, scaler):
     """Update technical indicators with new predicted close price"""
@@ -148,11 +207,147 @@ def update_indicators(prev_data, new_close, scaler):
     # Scale data back
     return scaler.transform([new_unscaled_datapoint])[0]
 
-def get_direct_crypto_data(coin_symbol, days=1000):
-    """Direct cryptocurrency data retrieval from multiple reliable public APIs"""
+def get_direct_crypto_data(coin_symbol, days=1000, deadline=None):
+    """Daily OHLCV history served from the local store, topped up from public APIs"""
+    try:
+        return ohlcv_store.get_history(
+            coin_symbol, days,
+            lambda fetch_days: fetch_upstream_crypto_data(coin_symbol, days=fetch_days, deadline=deadline)
+        )
+    except Exception as e:
+        print(f"[DEBUG] OHLCV store unavailable, fetching directly: {str(e)}")
+        return fetch_upstream_crypto_data(coin_symbol, days=days, deadline=deadline)
+
+def _coingecko_frame(data):
+    """yfinance-style OHLCV frame from a CoinGecko market_chart response, or None"""
+    prices = data.get('prices', [])
+    volumes = data.get('total_volumes', [])
+    if not prices:
+        return None
+
+    print(f"[DEBUG] Found {len(prices)} price points from CoinGecko")
+    print(f"[DEBUG] First price point: {prices[0]}")
+    print(f"[DEBUG] Last price point: {prices[-1]}")
+    
+    df_prices = pd.DataFrame(prices, columns=['timestamp', 'price'])
+    df_prices['timestamp'] = pd.to_datetime(df_prices['timestamp'], unit='ms')
+    
+    # Process volume data if available
+    if volumes:
+        print(f"[DEBUG] Found {len(volumes)} volume points from CoinGecko")
+        print(f"[DEBUG] First volume point: {volumes[0]}")
+        print(f"[DEBUG] Last volume point: {volumes[-1]}")
+        
+        df_volumes = pd.DataFrame(volumes, columns=['timestamp', 'volume'])
+        df_volumes['timestamp'] = pd.to_datetime(df_volumes['timestamp'], unit='ms')
+        df = pd.merge(df_prices, df_volumes, on='timestamp')
+    else:
+        print("[DEBUG] No volume data found, using default volume")
+        df = df_prices.copy()
+        df['volume'] = 1000000  # Default volume
+    
+    # Rename columns to match yfinance format
+    df = df.rename(columns={
+        'timestamp': 'Date',
+        'price': 'Close',
+        'volume': 'Volume'
+    })
+    
+    # Set date as index
+    df = df.set_index('Date')
+    
+    # Create synthetic OHLC data based on Close
+    df['Adj Close'] = df['Close']
+    df['Open'] = df['Close'].shift(1)
+    df['High'] = df['Close'] * 1.02
+    df['Low'] = df['Close'] * 0.98
+    
+    # Fill first row NaN values using loc to avoid chained assignment warning
+    first_date = df.index[0]
+    if pd.isna(df.loc[first_date, 'Open']):
+        df.loc[first_date, 'Open'] = df.loc[first_date, 'Close'] * 0.99
+    return df
+
+def _cryptocompare_frame(data):
+    """yfinance-style OHLCV frame from a CryptoCompare histoday response, or None"""
+    if data.get('Response') != 'Success':
+        print(f"[DEBUG] CryptoCompare API error: {data.get('Message', 'Unknown error')}")
+        return None
+    history = data.get('Data', {}).get('Data', [])
+    if not history:
+        print("[DEBUG] No data found in CryptoCompare response")
+        return None
+
+    print(f"[DEBUG] Successfully retrieved {len(history)} data points from CryptoCompare")
+    print(f"[DEBUG] First data point: {history[0]}")
+    print(f"[DEBUG] Last data point: {history[-1]}")
+    
+    df = pd.DataFrame(history)
+    df['Date'] = pd.to_datetime(df['time'], unit='s')
+    df = df.set_index('Date')
+    
+    # Rename columns to match yfinance format
+    df = df.rename(columns={
+        'close': 'Close',
+        'high': 'High',
+        'low': 'Low',
+        'open': 'Open',
+        'volumefrom': 'Volume'
+    })
+    
+    # Add Adj Close
+    df['Adj Close'] = df['Close']
+    
+    # Keep only necessary columns
+    cols = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+    return df[cols]
+
+async def _fetch_coingecko(coin_id, days, deadline=None):
+    url = f"{COINGECKO_BASE_URL}/coins/{coin_id}/market_chart"
+    params = {
+        'vs_currency': 'usd',
+        'days': min(days, 2000),  # CoinGecko limit
+        'interval': 'daily'
+    }
+    print(f"[DEBUG] Attempting CoinGecko API call to: {url}")
+    print(f"[DEBUG] With parameters: {params}")
+    
+    response = await upstream.fetch(url, params=params, deadline=deadline)
+    print(f"[DEBUG] CoinGecko API response status: {response.status_code}")
+    return _coingecko_frame(response.json()) if response.status_code == 200 else None
+
+async def _fetch_cryptocompare(symbol, days, deadline=None):
+    url = f"{CRYPTOCOMPARE_BASE_URL}/data/v2/histoday"
+    params = {
+        'fsym': symbol.upper(),
+        'tsym': 'USD',
+        'limit': min(days, 2000),
+        'api_key': 'your_api_key_here'  # Not required but helps avoid rate limits
+    }
+    print(f"[DEBUG] Attempting CryptoCompare API call to: {url}")
+    print(f"[DEBUG] With parameters: {params}")
+    
+    response = await upstream.fetch(url, params=params, deadline=deadline)
+    print(f"[DEBUG] CryptoCompare API response status: {response.status_code}")
+    return _cryptocompare_frame(response.json()) if response.status_code == 200 else None
+
+def fetch_upstream_crypto_data(coin_symbol, days=1000, deadline=None):
+    """Direct cryptocurrency data retrieval from multiple reliable public APIs
+
+    CoinGecko is asked first; CryptoCompare is raced against it when it
+    fails or takes longer than its hedge delay, and the slower request is
+    cancelled (see hedging.py). With a deadline.Deadline, requests are cut
+    off when it runs out and a source is skipped when less than
+    DEADLINE_MIN_SOURCE_MS is left for it.
+    """
     print(f"\n[DEBUG] Starting data retrieval for {coin_symbol}")
     print(f"[DEBUG] Requested days: {days}")
     
+    if deadline is not None and deadline.remaining() * 1000 < DEADLINE_MIN_SOURCE_MS:
+        print(f"[DEBUG] No time left to fetch {coin_symbol}, serving stored data")
+        deadline.degrade('skipped_upstream_fetch')
+        return None
+    
     try:
         # Clean up the symbol for API use
         if '-USD' in coin_symbol:
@@ -162,7 +357,6 @@ def get_direct_crypto_data(coin_symbol, days=1000):
         
         print(f"[DEBUG] Cleaned symbol: {symbol}")
         
-        # 1. Try CoinGecko API first (most reliable)
         coin_id_map = {
             'btc': 'bitcoin',
             'eth': 'ethereum',
@@ -180,135 +374,23 @@ def get_direct_crypto_data(coin_symbol, days=1000):
         coin_id = coin_id_map.get(symbol, symbol)
         print(f"[DEBUG] Using CoinGecko ID: {coin_id}")
         
-        url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-        params = {
-            'vs_currency': 'usd',
-            'days': min(days, 2000),  # CoinGecko limit
-            'interval': 'daily'
-        }
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        print(f"[DEBUG] Attempting CoinGecko API call to: {url}")
-        print(f"[DEBUG] With parameters: {params}")
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        print(f"[DEBUG] CoinGecko API response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            print("[DEBUG] Successfully retrieved data from CoinGecko")
-            data = response.json()
-            prices = data.get('prices', [])
-            volumes = data.get('total_volumes', [])
-            
-            if prices:
-                print(f"[DEBUG] Found {len(prices)} price points from CoinGecko")
-                print(f"[DEBUG] First price point: {prices[0]}")
-                print(f"[DEBUG] Last price point: {prices[-1]}")
-                
-                df_prices = pd.DataFrame(prices, columns=['timestamp', 'price'])
-                df_prices['timestamp'] = pd.to_datetime(df_prices['timestamp'], unit='ms')
-                
-                # Process volume data if available
-                if volumes:
-                    print(f"[DEBUG] Found {len(volumes)} volume points from CoinGecko")
-                    print(f"[DEBUG] First volume point: {volumes[0]}")
-                    print(f"[DEBUG] Last volume point: {volumes[-1]}")
-                    
-                    df_volumes = pd.DataFrame(volumes, columns=['timestamp', 'volume'])
-                    df_volumes['timestamp'] = pd.to_datetime(df_volumes['timestamp'], unit='ms')
-                    df = pd.merge(df_prices, df_volumes, on='timestamp')
-                else:
-                    print("[DEBUG] No volume data found, using default volume")
-                    df = df_prices.copy()
-                    df['volume'] = 1000000  # Default volume
-                
-                # Rename columns to match yfinance format
-                df = df.rename(columns={
-                    'timestamp': 'Date',
-                    'price': 'Close',
-                    'volume': 'Volume'
-                })
-                
-                # Set date as index
-                df = df.set_index('Date')
-                
-                # Create synthetic OHLC data based on Close
-                df['Adj Close'] = df['Close']
-                df['Open'] = df['Close'].shift(1)
-                df['High'] = df['Close'] * 1.02
-                df['Low'] = df['Close'] * 0.98
-                
-                # Fill first row NaN values using loc to avoid chained assignment warning
-                first_date = df.index[0]
-                if pd.isna(df.loc[first_date, 'Open']):
-                    df.loc[first_date, 'Open'] = df.loc[first_date, 'Close'] * 0.99
-                
-                print(f"[DEBUG] Final DataFrame shape: {df.shape}")
-                print(f"[DEBUG] Date range: {df.index[0]} to {df.index[-1]}")
-                print(f"[DEBUG] Price range: ${df['Close'].min():.2f} to ${df['Close'].max():.2f}")
-                print(f"[DEBUG] Volume range: {df['Volume'].min():.0f} to {df['Volume'].max():.0f}")
-                return df
-                
-        # 2. Try CryptoCompare API as backup
-        if response.status_code != 200:
-            print("[DEBUG] CoinGecko API failed, trying CryptoCompare...")
-            url = "https://min-api.cryptocompare.com/data/v2/histoday"
-            params = {
-                'fsym': symbol.upper(),
-                'tsym': 'USD',
-                'limit': min(days, 2000),
-                'api_key': 'your_api_key_here'  # Not required but helps avoid rate limits
-            }
-            
-            print(f"[DEBUG] Attempting CryptoCompare API call to: {url}")
-            print(f"[DEBUG] With parameters: {params}")
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            print(f"[DEBUG] CryptoCompare API response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('Response') == 'Success':
-                    history = data.get('Data', {}).get('Data', [])
-                    
-                    if history:
-                        print(f"[DEBUG] Successfully retrieved {len(history)} data points from CryptoCompare")
-                        print(f"[DEBUG] First data point: {history[0]}")
-                        print(f"[DEBUG] Last data point: {history[-1]}")
-                        
-                        df = pd.DataFrame(history)
-                        df['Date'] = pd.to_datetime(df['time'], unit='s')
-                        df = df.set_index('Date')
-                        
-                        # Rename columns to match yfinance format
-                        df = df.rename(columns={
-                            'close': 'Close',
-                            'high': 'High',
-                            'low': 'Low',
-                            'open': 'Open',
-                            'volumefrom': 'Volume'
-                        })
-                        
-                        # Add Adj Close
-                        df['Adj Close'] = df['Close']
-                        
-                        # Keep only necessary columns
-                        cols = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
-                        df = df[cols]
-                        
-                        print(f"[DEBUG] Final DataFrame shape: {df.shape}")
-                        print(f"[DEBUG] Date range: {df.index[0]} to {df.index[-1]}")
-                        print(f"[DEBUG] Price range: ${df['Close'].min():.2f} to ${df['Close'].max():.2f}")
-                        print(f"[DEBUG] Volume range: {df['Volume'].min():.0f} to {df['Volume'].max():.0f}")
-                        return df
-                    else:
-                        print("[DEBUG] No data found in CryptoCompare response")
-                else:
-                    print(f"[DEBUG] CryptoCompare API error: {data.get('Message', 'Unknown error')}")
+        # CoinGecko is the most reliable, CryptoCompare the hedge
+        source, df = race([
+            ('coingecko', lambda: _fetch_coingecko(coin_id, days, deadline)),
+            ('cryptocompare', lambda: _fetch_cryptocompare(symbol, days, deadline)),
+        ], deadline=deadline)
+        
+        if df is not None:
+            print(f"[DEBUG] Successfully retrieved data from {source}")
+            print(f"[DEBUG] Final DataFrame shape: {df.shape}")
+            print(f"[DEBUG] Date range: {df.index[0]} to {df.index[-1]}")
+            print(f"[DEBUG] Price range: ${df['Close'].min():.2f} to ${df['Close'].max():.2f}")
+            print(f"[DEBUG] Volume range: {df['Volume'].min():.0f} to {df['Volume'].max():.0f}")
+            return df
     
     except Exception as e:
+        if deadline is not None and deadline.expired():
+            deadline.degrade('upstream_deadline_exceeded')
         print(f"[DEBUG] Error in direct crypto data retrieval: {str(e)}")
         print(f"[DEBUG] Error type: {type(e).__name__}")
         import traceback
@@ -319,180 +401,418 @@ def get_direct_crypto_data(coin_symbol, days=1000):
 
 def generate_synthetic_data_for_prediction(coin_symbol):
     """Generate realistic synthetic data for prediction"""
-    crypto_profiles = {
-        'BTC-USD': {'price': 66000, 'volatility': 0.028, 'uptrend': 0.0005, 'seed': 42},
-        'ETH-USD': {'price': 3500, 'volatility': 0.032, 'uptrend': 0.0006, 'seed': 43},
-        'SOL-USD': {'price': 140, 'volatility': 0.045, 'uptrend': 0.0008, 'seed': 44},
-        'ADA-USD': {'price': 0.45, 'volatility': 0.035, 'uptrend': 0.0002, 'seed': 45},
-        'DOGE-USD': {'price': 0.12, 'volatility': 0.055, 'uptrend': 0.0001, 'seed': 46},
-        'DOT-USD': {'price': 7.2, 'volatility': 0.035, 'uptrend': 0.0003, 'seed': 47},
-        'AVAX-USD': {'price': 35, 'volatility': 0.045, 'uptrend': 0.0004, 'seed': 48},
-        'XRP-USD': {'price': 0.50, 'volatility': 0.040, 'uptrend': 0.0003, 'seed': 49},
-        'MATIC-USD': {'price': 0.60, 'volatility': 0.042, 'uptrend': 0.0005, 'seed': 50},
-        'BNB-USD': {'price': 600, 'volatility': 0.030, 'uptrend': 0.0004, 'seed': 51},
-    }
+    return generate_synthetic_data(coin_symbol)
+
+def model_path_for(coin_symbol):
+    """Path of the saved model artifact for a coin"""
+    return f'models/{coin_symbol.replace("-", "_")}_model.h5'
+
+def model_meta_path_for(coin_symbol):
+    """Path of the metadata sidecar (data watermark) of a coin's model"""
+    return f'{model_path_for(coin_symbol)[:-3]}.meta.json'
+
+def read_model_meta(coin_symbol):
+    """Metadata recorded with the saved model, or {} if there is none"""
+    try:
+        with open(model_meta_path_for(coin_symbol)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_model_meta(path, meta):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, path)
+
+def save_model(coin_symbol, model, meta, model_path=None):
+    """Atomically replace a saved model of a coin and record its metadata
+
+    The model is written to a temporary file next to the artifact and moved
+    over it with os.replace, so readers (including other processes) only ever
+    see the old or the new model, never a half-written one. Metadata goes to
+    a .meta.json sidecar next to the artifact.
+
+    Args:
+        model_path: Artifact to replace (defaults to the coin's prediction model)
+    """
+    model_path = model_path or model_path_for(coin_symbol)
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    tmp_path = f'{model_path[:-3]}.{os.getpid()}.tmp.h5'
+    try:
+        model.save(tmp_path)
+        os.replace(tmp_path, model_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _write_model_meta(f'{model_path[:-3]}.meta.json', dict(meta, updated_at=datetime.datetime.now().isoformat()))
+    model_registry.put(coin_symbol, model_path, model)
+
+def _candle_date(timestamp):
+    """UTC day of a candle timestamp, as a naive Timestamp"""
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.normalize()
+
+def prepare_data(coin_symbol, lookback=60, future_days=7, deadline=None):
+    """Fetch history, add indicators and scale the features
+
+    Returns:
+        (df, scaled_data, scaler)
+
+    Raises:
+        ValueError: If no usable price data is available
+    """
+    # Get historical data
+    df = get_direct_crypto_data(coin_symbol, days=lookback + future_days, deadline=deadline)
+    if df is None or df.empty:
+        print(f"Could not fetch data for {coin_symbol}, trying synthetic data...")
+        df = generate_synthetic_data_for_prediction(coin_symbol)
+        if df is None or df.empty:
+            raise ValueError(f'Could not fetch or generate data for {coin_symbol}')
+        df.attrs['synthetic'] = True
+
+    # Validate data
+    if len(df) < lookback:
+        raise ValueError(f'Insufficient data points. Need at least {lookback} days of data.')
+
+    # Ensure Close prices are valid
+    if df['Close'].isna().any() or (df['Close'] <= 0).any():
+        raise ValueError('Invalid price data detected. Please try again.')
+
+    scaled_data, scaler = scale_features(df)
+    return df, scaled_data, scaler
+
+def scale_features(df):
+    """Add the indicator columns to df in place and fit a MinMaxScaler over FEATURES
+
+    Returns:
+        (scaled_data, scaler)
+    """
+    # Calculate technical indicators
+    df['RSI'] = compute_rsi(df['Close'])
+    df['MACD'], df['Signal'] = compute_macd(df['Close'])
     
-    default_profile = {'price': 100, 'volatility': 0.035, 'uptrend': 0.0003, 'seed': 42}
-    profile = crypto_profiles.get(coin_symbol, default_profile)
+    # Check for NaN values in indicators
+    if df['RSI'].isna().any() or df['MACD'].isna().any() or df['Signal'].isna().any():
+        print("NaN values detected in indicators. Filling with default values...")
+        df['RSI'] = df['RSI'].fillna(50)
+        df['MACD'] = df['MACD'].fillna(0)
+        df['Signal'] = df['Signal'].fillna(0)
     
-    if coin_symbol not in crypto_profiles:
-        try:
-            if '-USD' in coin_symbol:
-                symbol = coin_symbol.replace('-USD', '')
-                if symbol.lower() in ['btc', 'bitcoin']:
-                    profile['price'] = 65000
-                elif symbol.lower() in ['eth', 'ethereum']:
-                    profile['price'] = 3400
-                elif symbol.lower() in ['sol', 'solana']:
-                    profile['price'] = 140
-                else:
-                    profile['price'] = 50
-        except:
-            pass
-    
-    current_price = profile['price']
-    daily_volatility = profile['volatility']
-    daily_uptrend = profile['uptrend']
-    seed = profile['seed']
-    
-    np.random.seed(seed)
-    
-    days = 1095
-    end_date = datetime.datetime.now()
-    start_date = end_date - datetime.timedelta(days=days)
-    date_range = pd.date_range(start=start_date, end=end_date, freq='D')
-    
-    # Ensure date_range length matches days
-    if len(date_range) != days:
-        date_range = date_range[:days]
-    
-    prices = [current_price]
-    cycle_period = 365
-    cycle_amplitude = 0.5
-    
-    for i in range(1, days):
-        cycle_component = np.sin(2 * np.pi * i / cycle_period) * cycle_amplitude
-        random_component = np.random.normal(0, daily_volatility)
-        trend_component = -daily_uptrend
-        daily_return = random_component + trend_component + cycle_component/100
-        new_price = prices[-1] / (1 + daily_return)
-        prices.append(new_price)
-    
-    prices.reverse()
-    
-    # Ensure prices length matches date_range length
-    if len(prices) != len(date_range):
-        prices = prices[:len(date_range)]
-    
-    df = pd.DataFrame(index=date_range)
-    df['Close'] = prices
-    df['Open'] = df['Close'].shift(1) * (1 + np.random.normal(0, daily_volatility/2, len(df)))
-    df['High'] = df.apply(lambda x: max(x['Open'] if not pd.isna(x['Open']) else x['Close'], x['Close']) * (1 + abs(np.random.normal(0, daily_volatility/2))), axis=1)
-    df['Low'] = df.apply(lambda x: min(x['Open'] if not pd.isna(x['Open']) else x['Close'], x['Close']) * (1 - abs(np.random.normal(0, daily_volatility/2))), axis=1)
-    df['Adj Close'] = df['Close']
+    # Scale the features
+    scaler = MinMaxScaler()
+    scaled_data = scaler.fit_transform(df[FEATURES].values)
+    return scaled_data, scaler
+
+def serving_windows(df, lookback=60, future_days=7):
+    """Every lookback window of a long history, scaled the way a request at its last day is
+
+    A request fetches only the lookback + future_days days ending at its
+    origin and computes indicators and a fresh MinMaxScaler over them
+    (prepare_data), so windows cut from one scaler over a long history are
+    not what a served model sees. This replays prepare_data per origin:
+    window i uses rows i .. i + span - 1 (span = lookback + future_days) and
+    ends at row i + span - 1.
+
+    Returns:
+        (windows, scale, offset): float32 windows of shape
+        (origins, lookback, features), and per origin the Close scaling, so
+        that price = (scaled - offset) / scale
+
+    Raises:
+        ValueError: If df is shorter than one span
+    """
+    span = lookback + future_days
+    n_origins = len(df) - span + 1
+    if n_origins <= 0:
+        raise ValueError(f'Insufficient data points. Need at least {span} days of data.')
+
+    closes = df[['Close']]
+    windows = np.empty((n_origins, lookback, len(FEATURES)), dtype=np.float32)
+    scale = np.empty(n_origins)
+    offset = np.empty(n_origins)
+    for i in range(n_origins):
+        scaled_data, scaler = scale_features(closes.iloc[i:i + span].copy())
+        windows[i] = scaled_data[-lookback:]
+        scale[i], offset[i] = scaler.scale_[0], scaler.min_[0]
+    return windows, scale, offset
+
+def serving_targets(df, lookback, future_days, scale, offset, horizon=1):
+    """The `horizon` closes after every serving window that has them, each in its origin's scale
+
+    Returns:
+        Array of shape (origins, horizon) for the first len(df) - span - horizon + 1
+        windows of serving_windows(df, lookback, future_days)
+    """
+    span = lookback + future_days
+    targets = sliding_window_view(df['Close'].to_numpy(dtype=float)[span:], horizon)
+    n = len(targets)
+    return targets * scale[:n, None] + offset[:n, None]
+
+def train_prediction_model(coin_symbol, scaled_data, lookback=60, epochs=50, on_epoch_end=None,
+                           trained_through=None):
+    """Train the LSTM for a coin from scratch and atomically replace its saved model
+
+    Args:
+        on_epoch_end: Optional callable(epoch, logs) called after every epoch
+        trained_through: Date of the newest candle in scaled_data, recorded as
+            the watermark for incremental fine-tuning
+    """
+    keras = _tensorflow().keras
+    model = keras.Sequential([
+        keras.layers.LSTM(50, return_sequences=True, input_shape=(lookback, scaled_data.shape[1])),
+        keras.layers.Dropout(0.2),
+        keras.layers.LSTM(50, return_sequences=False),
+        keras.layers.Dropout(0.2),
+        keras.layers.Dense(1)
+    ])
+    
+    model.compile(optimizer='adam', loss=keras.losses.MeanSquaredError())
     
-    base_volume = current_price * 1000
-    df['Volume'] = base_volume * (1 + np.random.normal(0, 0.3, len(df)))
+    callbacks = [keras.callbacks.EarlyStopping(monitor='val_loss', patience=10)]
+    if on_epoch_end is not None:
+        callbacks.append(keras.callbacks.LambdaCallback(on_epoch_end=on_epoch_end))
+    # Windows are streamed batch by batch from a strided view of scaled_data
+    history = model.fit(**training_batches(scaled_data, lookback, batch_size=32, validation_split=0.2),
+                        epochs=epochs, callbacks=callbacks, verbose=0)
     
-    for i, idx in enumerate(df.index):
-        if idx.weekday() >= 5:
-            df.loc[idx, 'Volume'] *= 0.7
-        if idx.day <= 3 or idx.day >= 28:
-            df.loc[idx, 'High'] = df.loc[idx, 'High'] * 1.003
-            df.loc[idx, 'Low'] = df.loc[idx, 'Low'] * 0.997
+    save_model(coin_symbol, model, {
+        'mode': 'full',
+        'lookback': lookback,
+        'trained_through': pd.Timestamp(trained_through).isoformat() if trained_through is not None else None,
+    })
+    return model, history
+
+def fine_tune_prediction_model(coin_symbol, df, scaled_data, lookback=60, epochs=FINE_TUNE_EPOCHS,
+                               replay_size=FINE_TUNE_REPLAY, on_epoch_end=None):
+    """Warm-start the saved model on the candles that arrived since it was last fit
+
+    Only windows whose target candle is newer than the recorded watermark are
+    trained on, together with a random replay sample of older windows so the
+    model doesn't drift towards the last few days. Falls back to a full
+    retrain when there is no saved model or watermark to start from.
+
+    Args:
+        df: Frame indexed by date that scaled_data was built from
+        on_epoch_end: Optional callable(epoch, logs) called after every epoch
+
+    Returns:
+        (model, history); history is None if the model was already up to date
+    """
+    model_path = model_path_for(coin_symbol)
+    meta = read_model_meta(coin_symbol)
+    if not os.path.exists(model_path) or not meta.get('trained_through') or meta.get('lookback') != lookback:
+        print(f"[DEBUG] No watermark for {coin_symbol}, running a full retrain")
+        return train_prediction_model(coin_symbol, scaled_data, lookback, on_epoch_end=on_epoch_end,
+                                      trained_through=df.index[-1])
     
-    df.loc[df.index[0], 'Open'] = df.loc[df.index[0], 'Close'] * 0.99
-    df = df.dropna()
+    windows = sliding_windows(scaled_data, lookback)
+    targets = window_targets(scaled_data, lookback)
+    target_dates = pd.DatetimeIndex(df.index[lookback:])
+    is_new = target_dates > pd.Timestamp(meta['trained_through'])
+    new_index = np.flatnonzero(is_new)
+    if len(new_index) == 0:
+        print(f"[DEBUG] Model for {coin_symbol} is already trained through {meta['trained_through']}")
+        return model_registry.get(coin_symbol, model_path, load_prediction_model), None
     
-    return df
+    old_index = np.flatnonzero(~is_new)
+    replay = np.random.default_rng().choice(old_index, size=min(replay_size, len(old_index)), replace=False)
+    index = np.concatenate([new_index, replay])
+    print(f"[DEBUG] Fine-tuning {coin_symbol} on {len(new_index)} new and {len(replay)} replayed windows")
+    
+    keras = _tensorflow().keras
+    model = load_keras_model(model_path)
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=FINE_TUNE_LEARNING_RATE),
+                  loss=keras.losses.MeanSquaredError())
+    callbacks = []
+    if on_epoch_end is not None:
+        callbacks.append(keras.callbacks.LambdaCallback(on_epoch_end=on_epoch_end))
+    # Only the selected windows are copied out of the strided view
+    history = model.fit(windows[index].astype(np.float32), targets[index].astype(np.float32),
+                        epochs=epochs, batch_size=32, shuffle=True, callbacks=callbacks, verbose=0)
+    
+    save_model(coin_symbol, model, {
+        'mode': 'incremental',
+        'lookback': lookback,
+        'trained_through': pd.Timestamp(df.index[-1]).isoformat(),
+        'new_windows': int(len(new_index)),
+        'replayed_windows': int(len(replay)),
+    })
+    return model, history
+
+def train_coin_model(coin_symbol, lookback=60, future_days=7, mode='full', epochs=50, on_epoch_end=None):
+    """Fetch data for a coin and (re)train its model end to end
+
+    Args:
+        mode: 'full' to train from scratch, 'incremental' to fine-tune the saved model,
+            'direct' to train the coin's direct multi-horizon model, 'distill' to fit the
+            fast uncertainty student to the coin's saved model
 
-def predict_crypto(coin_symbol, lookback=60, future_days=7, mc_samples=100, train_new_model=False):
-    """Main prediction function that orchestrates the entire prediction process"""
+    Returns:
+        Dictionary summarizing the fit: windows trained on, epochs run and final losses
+    """
+    if mode == 'direct':
+        # Every training window needs lookback + DIRECT_HORIZON days, so fetch a longer history
+        df, _, _ = prepare_data(coin_symbol, lookback, DIRECT_TRAINING_DAYS)
+        # Each window is scaled over the lookback + future_days days a request at its origin fetches
+        windows, scale, offset = serving_windows(df, lookback, future_days)
+        targets = serving_targets(df, lookback, future_days, scale, offset, DIRECT_HORIZON)
+        _, history = train_direct_model(coin_symbol, windows[:len(targets)], targets, epochs=epochs,
+                                        on_epoch_end=on_epoch_end, trained_through=df.index[-1],
+                                        scaling_days=lookback + future_days)
+        metrics = history.history
+        return {
+            'mode': 'direct',
+            'windows': len(targets),
+            'epochs_run': len(metrics.get('loss', [])),
+            'loss': float(metrics['loss'][-1]) if metrics.get('loss') else None,
+            'val_loss': float(metrics['val_loss'][-1]) if metrics.get('val_loss') else None,
+        }
+    if mode == 'distill':
+        # The student copies the coin's current model, so that model must exist first
+        model_path = model_path_for(coin_symbol)
+        if not os.path.exists(model_path):
+            raise ValueError(f"No model to distill for {coin_symbol}; train it first")
+        teacher = model_registry.get(coin_symbol, model_path, load_prediction_model)
+        df, _, _ = prepare_data(coin_symbol, lookback, DISTILL_TRAINING_DAYS)
+        # The student sees the windows a request at each origin would serve it
+        windows, scale, offset = serving_windows(df, lookback, future_days)
+        actual = serving_targets(df, lookback, future_days, scale, offset)[:, 0]
+        _, history, report = distill_student_model(coin_symbol, windows[:len(actual)], actual, teacher,
+                                                   epochs=epochs, on_epoch_end=on_epoch_end,
+                                                   trained_through=df.index[-1],
+                                                   scaling_days=lookback + future_days)
+        metrics = history.history
+        return {
+            'mode': 'distill',
+            'windows': len(actual),
+            'epochs_run': len(metrics.get('loss', [])),
+            'loss': float(metrics['loss'][-1]) if metrics.get('loss') else None,
+            'val_loss': float(metrics['val_loss'][-1]) if metrics.get('val_loss') else None,
+            'calibration': report,
+        }
+    
+    df, scaled_data, _ = prepare_data(coin_symbol, lookback, future_days)
+    if mode == 'incremental':
+        model, history = fine_tune_prediction_model(coin_symbol, df, scaled_data, lookback, on_epoch_end=on_epoch_end)
+    else:
+        model, history = train_prediction_model(coin_symbol, scaled_data, lookback, epochs=epochs,
+                                                on_epoch_end=on_epoch_end, trained_through=df.index[-1])
+    # Score the new model on recent history so conformal intervals are ready when it is served
+    try:
+        backfill_residuals(coin_symbol, model, model_path_for(coin_symbol), lookback, future_days)
+    except Exception as e:
+        print(f"[DEBUG] Conformal backfill failed for {coin_symbol}: {str(e)}")
+    
+    metrics = history.history if history is not None else {}
+    meta = read_model_meta(coin_symbol)
+    if history is None:
+        windows = 0
+    elif meta.get('mode') == 'incremental':
+        windows = meta.get('new_windows', 0) + meta.get('replayed_windows', 0)
+    else:
+        windows = len(scaled_data) - lookback
+    return {
+        'mode': meta.get('mode', mode),
+        'windows': windows,
+        'epochs_run': len(metrics.get('loss', [])),
+        'loss': float(metrics['loss'][-1]) if metrics.get('loss') else None,
+        'val_loss': float(metrics['val_loss'][-1]) if metrics.get('val_loss') else None,
+    }
+
+def _draw_plots(coin_symbol, df, lookback, future_dates, mean_path, lower_path, upper_path):
+    """Render the prediction and daily change charts as base64 PNGs
+
+    Returns:
+        (prediction_plot, change_plot)
+    """
+    # pyplot keeps global state, so only one worker thread may draw at a time
+    with _plot_lock:
+        # Generate plots
+        plt.figure(figsize=(12, 6))
+        plt.plot(df.index[-lookback:], df['Close'].tail(lookback), label='Historical Prices')
+        plt.plot(future_dates, mean_path, 'r--', label='Predicted Price')
+        plt.fill_between(future_dates, lower_path, upper_path, alpha=0.2)
+        plt.title(f'{coin_symbol} Price Prediction')
+        plt.xlabel('Date')
+        plt.ylabel('Price (USD)')
+        plt.legend()
+        plt.grid(True)
+        
+        # Save plot to base64
+        buffer = BytesIO()
+        plt.savefig(buffer, format='png')
+        buffer.seek(0)
+        prediction_plot = base64.b64encode(buffer.getvalue()).decode()
+        plt.close()
+        
+        # Generate change plot
+        plt.figure(figsize=(12, 6))
+        daily_changes = df['Close'].pct_change() * 100
+        plt.plot(df.index[-lookback:], daily_changes.tail(lookback), label='Historical Daily Changes')
+        plt.axhline(y=0, color='r', linestyle='--')
+        plt.title(f'{coin_symbol} Daily Price Changes')
+        plt.xlabel('Date')
+        plt.ylabel('Daily Change (%)')
+        plt.legend()
+        plt.grid(True)
+        
+        buffer = BytesIO()
+        plt.savefig(buffer, format='png')
+        buffer.seek(0)
+        change_plot = base64.b64encode(buffer.getvalue()).decode()
+        plt.close()
+    return prediction_plot, change_plot
+
+def predict_crypto(coin_symbol, lookback=60, future_days=7, mc_samples=100, train_new_model=False,
+                   use_global_model=False, uncertainty_mode='mc', adaptive_mc=False, deadline=None):
+    """Main prediction function that orchestrates the entire prediction process
+
+    With use_global_model the shared multi-coin model serves the prediction
+    instead of the coin's own model (see global_model.py). uncertainty_mode
+    'fast' takes the mean and interval from the coin's distilled student in a
+    single pass (see distill.py); 'conformal' takes one deterministic pass and
+    conformal bands from the coin's backtest residuals (see conformal.py).
+    Both fall back to MC dropout when they aren't available for the coin.
+    With adaptive_mc, mc_samples caps MC dropout sampling that stops early
+    once the estimate has converged.
+
+    A deadline.Deadline bounds the whole call: the data fetch gets
+    DEADLINE_DATA_SHARE of it, MC sampling stops when only the plot reserve
+    is left, and the plots are dropped when that is gone too. The shortcuts
+    taken are listed in the result's 'degradations'.
+    """
     try:
         # Create models directory if it doesn't exist
         os.makedirs('models', exist_ok=True)
         
-        # Get historical data
-        df = get_direct_crypto_data(coin_symbol, days=lookback + future_days)
-        if df is None or df.empty:
-            print(f"Could not fetch data for {coin_symbol}, trying synthetic data...")
-            df = generate_synthetic_data_for_prediction(coin_symbol)
-            if df is None or df.empty:
-                return {
-                    'success': False,
-                    'error': f'Could not fetch or generate data for {coin_symbol}'
-                }
-
-        # Validate data
-        if len(df) < lookback:
-            return {
-                'success': False,
-                'error': f'Insufficient data points. Need at least {lookback} days of data.'
-            }
-
-        # Ensure Close prices are valid
-        if df['Close'].isna().any() or (df['Close'] <= 0).any():
+        try:
+            df, scaled_data, scaler = prepare_data(coin_symbol, lookback, future_days,
+                                                   deadline=deadline.stage(DEADLINE_DATA_SHARE) if deadline else None)
+        except ValueError as data_error:
             return {
                 'success': False,
-                'error': 'Invalid price data detected. Please try again.'
+                'error': str(data_error)
             }
-
-        # Calculate technical indicators
-        df['RSI'] = compute_rsi(df['Close'])
-        df['MACD'], df['Signal'] = compute_macd(df['Close'])
-        
-        # Check for NaN values in indicators
-        if df['RSI'].isna().any() or df['MACD'].isna().any() or df['Signal'].isna().any():
-            print("NaN values detected in indicators. Filling with default values...")
-            df['RSI'] = df['RSI'].fillna(50)
-            df['MACD'] = df['MACD'].fillna(0)
-            df['Signal'] = df['Signal'].fillna(0)
-        
-        # Prepare features
-        features = ['Close', 'RSI', 'MACD', 'Signal']
-        data = df[features].values
-        
-        # Scale the data
-        scaler = MinMaxScaler()
-        scaled_data = scaler.fit_transform(data)
-        
-        # Prepare sequences for LSTM
-        X = []
-        y = []
-        for i in range(lookback, len(scaled_data)):
-            X.append(scaled_data[i-lookback:i])
-            y.append(scaled_data[i, 0])
-        X = np.array(X)
-        y = np.array(y)
         
         # Load or train model
-        model_path = f'models/{coin_symbol.replace("-", "_")}_model.h5'
+        model_path = model_path_for(coin_symbol)
         try:
-            if os.path.exists(model_path) and not train_new_model:
-                # Register custom objects for model loading
-                custom_objects = {
-                    'mse': losses.MeanSquaredError(),
-                    'mean_squared_error': losses.MeanSquaredError(),
-                    'MSE': losses.MeanSquaredError()
-                }
-                model = load_model(model_path, custom_objects=custom_objects)
+            direct_model = None
+            student_model = None
+            if use_global_model:
+                model = get_global_model().for_coin(coin_symbol)
+            elif os.path.exists(model_path) and not train_new_model:
+                # Reuse the warmed model from the registry, loading it only on a miss
+                model = model_registry.get(coin_symbol, model_path, load_prediction_model)
             else:
-                # Create and train new model
-                model = Sequential([
-                    LSTM(50, return_sequences=True, input_shape=(lookback, len(features))),
-                    Dropout(0.2),
-                    LSTM(50, return_sequences=False),
-                    Dropout(0.2),
-                    Dense(1)
-                ])
-                
-                model.compile(optimizer='adam', loss=losses.MeanSquaredError())
-                
-                early_stopping = EarlyStopping(monitor='val_loss', patience=10)
-                model.fit(X, y, epochs=50, batch_size=32, validation_split=0.2, callbacks=[early_stopping], verbose=0)
-                
-                # Save model with custom objects
-                model.save(model_path, save_format='tf')
+                model, _ = train_prediction_model(coin_symbol, scaled_data, lookback, trained_through=df.index[-1])
+            if not use_global_model and uncertainty_mode == 'fast':
+                student_model = get_student_model(coin_symbol)
+            if not use_global_model and student_model is None:
+                direct_model = get_direct_model(coin_symbol, future_days)
         except Exception as model_error:
             print(f"Error with model: {str(model_error)}")
             return {
@@ -503,49 +823,84 @@ def predict_crypto(coin_symbol, lookback=60, future_days=7, mc_samples=100, trai
         try:
             # Make predictions
             last_sequence = scaled_data[-lookback:]
-            mean_pred, std_pred, lower_bound, upper_bound = mc_predict(model, last_sequence.reshape(1, lookback, len(features)), mc_samples)
+            samples_used, standard_error = None, None
+            mc_deadline = deadline.stage(reserve_ms=DEADLINE_PLOT_RESERVE_MS) if deadline else None
+            conformal = None
+            if uncertainty_mode == 'conformal' and not use_global_model:
+                conformal = conformal_forecast(coin_symbol, model, model_path, df, last_sequence, scaler, future_days,
+                                               deadline=deadline)
+                if conformal is None:
+                    print(f"[DEBUG] Not enough residuals for conformal bands of {coin_symbol}, using MC dropout")
+            if conformal is not None:
+                mean_path, lower_path, upper_path = conformal['mean'], conformal['lower'], conformal['upper']
+                mean_pred = mean_path[-1]
+            elif direct_model is not None:
+                # The direct head predicts every day of the horizon in one pass per sample
+                forecast = direct_forecast(direct_model, last_sequence, future_days, mc_samples, adaptive=adaptive_mc,
+                                           deadline=mc_deadline)
+                scale, offset = scaler.scale_[0], scaler.min_[0]
+                mean_path, lower_path, upper_path = ((forecast[name] - offset) / scale
+                                                     for name in ('mean', 'lower', 'upper'))
+                mean_pred = mean_path[-1]
+                samples_used = forecast['samples']
+                standard_error = forecast['std'][-1] / np.sqrt(samples_used) / scale
+            else:
+                X = last_sequence.reshape(1, lookback, len(FEATURES))
+                if student_model is not None:
+                    # One deterministic pass instead of mc_samples dropout passes
+                    mean_pred, std_pred, lower_bound, upper_bound = student_predict(student_model, X)
+                else:
+                    mean_pred, std_pred, lower_bound, upper_bound, samples_used = mc_predict(
+                        model, X, mc_samples, adaptive=adaptive_mc, deadline=mc_deadline)
+                    if samples_used:
+                        standard_error = float(np.squeeze(std_pred)) / np.sqrt(samples_used) / scaler.scale_[0]
             
-            # Convert predictions back to original scale
-            if isinstance(mean_pred, np.ndarray):
-                mean_pred = mean_pred[0]
-            if isinstance(lower_bound, np.ndarray):
-                lower_bound = lower_bound[0]
-            if isinstance(upper_bound, np.ndarray):
-                upper_bound = upper_bound[0]
+                # Convert predictions back to original scale
+                if isinstance(mean_pred, np.ndarray):
+                    mean_pred = mean_pred[0]
+                if isinstance(lower_bound, np.ndarray):
+                    lower_bound = lower_bound[0]
+                if isinstance(upper_bound, np.ndarray):
+                    upper_bound = upper_bound[0]
             
-            # Ensure predictions are valid
-            if np.isnan(mean_pred) or np.isnan(lower_bound) or np.isnan(upper_bound):
-                print("Invalid predictions after conversion, using fallback values")
-                last_close = df['Close'].iloc[-1]
-                mean_pred = last_close
-                lower_bound = last_close * 0.95
-                upper_bound = last_close * 1.05
+                # Ensure predictions are valid
+                if np.isnan(mean_pred) or np.isnan(lower_bound) or np.isnan(upper_bound):
+                    print("Invalid predictions after conversion, using fallback values")
+                    last_close = df['Close'].iloc[-1]
+                    mean_pred = last_close
+                    lower_bound = last_close * 0.95
+                    upper_bound = last_close * 1.05
             
-            # Convert to original scale
-            try:
-                mean_pred = scaler.inverse_transform([[mean_pred, 0, 0, 0]])[0, 0]
-                lower_bound = scaler.inverse_transform([[lower_bound, 0, 0, 0]])[0, 0]
-                upper_bound = scaler.inverse_transform([[upper_bound, 0, 0, 0]])[0, 0]
-            except Exception as e:
-                print(f"Error in inverse transform: {str(e)}")
-                last_close = df['Close'].iloc[-1]
-                mean_pred = last_close
-                lower_bound = last_close * 0.95
-                upper_bound = last_close * 1.05
+                # Convert to original scale
+                try:
+                    mean_pred = scaler.inverse_transform([[mean_pred, 0, 0, 0]])[0, 0]
+                    lower_bound = scaler.inverse_transform([[lower_bound, 0, 0, 0]])[0, 0]
+                    upper_bound = scaler.inverse_transform([[upper_bound, 0, 0, 0]])[0, 0]
+                except Exception as e:
+                    print(f"Error in inverse transform: {str(e)}")
+                    last_close = df['Close'].iloc[-1]
+                    mean_pred = last_close
+                    lower_bound = last_close * 0.95
+                    upper_bound = last_close * 1.05
             
-            # Final validation of transformed values
-            if np.isnan(mean_pred) or np.isnan(lower_bound) or np.isnan(upper_bound):
-                print("Invalid transformed values, using fallback values")
-                last_close = df['Close'].iloc[-1]
-                mean_pred = last_close
-                lower_bound = last_close * 0.95
-                upper_bound = last_close * 1.05
+                # Final validation of transformed values
+                if np.isnan(mean_pred) or np.isnan(lower_bound) or np.isnan(upper_bound):
+                    print("Invalid transformed values, using fallback values")
+                    last_close = df['Close'].iloc[-1]
+                    mean_pred = last_close
+                    lower_bound = last_close * 0.95
+                    upper_bound = last_close * 1.05
             
-            # Ensure bounds are reasonable
-            if lower_bound < 0:
-                lower_bound = mean_pred * 0.95
-            if upper_bound > mean_pred * 2:
-                upper_bound = mean_pred * 1.05
+                # Ensure bounds are reasonable
+                if lower_bound < 0:
+                    lower_bound = mean_pred * 0.95
+                if upper_bound > mean_pred * 2:
+                    upper_bound = mean_pred * 1.05
+                
+                # The one-step model forecasts a single level for the whole horizon
+                mean_path = np.full(future_days, mean_pred)
+                lower_path = np.full(future_days, lower_bound)
+                upper_path = np.full(future_days, upper_bound)
             
             # Generate dates for predictions
             last_date = df.index[-1]
@@ -556,12 +911,12 @@ def predict_crypto(coin_symbol, lookback=60, future_days=7, mc_samples=100, trai
             last_close = float(df['Close'].iloc[-1])
             
             for i, date in enumerate(future_dates):
-                daily_change = float((mean_pred - last_close) / last_close * 100)
+                daily_change = float((mean_path[i] - last_close) / last_close * 100)
                 predictions.append({
                     'Date': date.strftime('%Y-%m-%d'),
-                    'Predicted_Price': float(mean_pred),
-                    'Lower_Bound': float(lower_bound),
-                    'Upper_Bound': float(upper_bound),
+                    'Predicted_Price': float(mean_path[i]),
+                    'Lower_Bound': float(lower_path[i]),
+                    'Upper_Bound': float(upper_path[i]),
                     'Daily_Change': daily_change
                 })
             
@@ -589,40 +944,13 @@ def predict_crypto(coin_symbol, lookback=60, future_days=7, mc_samples=100, trai
             else:
                 signals.append({'type': 'HOLD', 'strength': 'NEUTRAL', 'reason': 'Price expected to remain relatively stable'})
             
-            # Generate plots
-            plt.figure(figsize=(12, 6))
-            plt.plot(df.index[-lookback:], df['Close'].tail(lookback), label='Historical Prices')
-            plt.plot(future_dates, [mean_pred] * future_days, 'r--', label='Predicted Price')
-            plt.fill_between(future_dates, [lower_bound] * future_days, [upper_bound] * future_days, alpha=0.2)
-            plt.title(f'{coin_symbol} Price Prediction')
-            plt.xlabel('Date')
-            plt.ylabel('Price (USD)')
-            plt.legend()
-            plt.grid(True)
-            
-            # Save plot to base64
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png')
-            buffer.seek(0)
-            prediction_plot = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
-            
-            # Generate change plot
-            plt.figure(figsize=(12, 6))
-            daily_changes = df['Close'].pct_change() * 100
-            plt.plot(df.index[-lookback:], daily_changes.tail(lookback), label='Historical Daily Changes')
-            plt.axhline(y=0, color='r', linestyle='--')
-            plt.title(f'{coin_symbol} Daily Price Changes')
-            plt.xlabel('Date')
-            plt.ylabel('Daily Change (%)')
-            plt.legend()
-            plt.grid(True)
-            
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png')
-            buffer.seek(0)
-            change_plot = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
+            if deadline is not None and deadline.remaining() * 1000 < DEADLINE_PLOT_RESERVE_MS:
+                # Not enough time left to draw: answer without the charts
+                deadline.degrade('plots_skipped')
+                prediction_plot, change_plot = None, None
+            else:
+                prediction_plot, change_plot = _draw_plots(coin_symbol, df, lookback, future_dates,
+                                                           mean_path, lower_path, upper_path)
             
             return {
                 'success': True,
@@ -634,6 +962,13 @@ def predict_crypto(coin_symbol, lookback=60, future_days=7, mc_samples=100, trai
                 'prediction_plot_base64': prediction_plot,
                 'change_plot_base64': change_plot,
                 'training_plot_base64': None,
+                'uncertainty_mode': ('fast' if student_model is not None
+                                     else 'conformal' if conformal is not None else 'mc'),
+                'mc_samples_used': samples_used,
+                'mc_standard_error': float(standard_error) if standard_error is not None else None,
+                'degradations': list(deadline.degradations) if deadline is not None else None,
+                'data_through': _candle_date(df.index[-1]).isoformat(),
+                'synthetic_data': bool(df.attrs.get('synthetic', False)),
                 'date_generated': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
             
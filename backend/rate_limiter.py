@@ -0,0 +1,214 @@
+"""Token-bucket rate limiting of upstream sources with priority classes
+
+Every limited source (see QUOTAS) has a token bucket that encodes its
+free-tier quota. Requests wait for a token in priority order, so
+interactive requests go ahead of queued background ones; background
+requests also leave RATE_LIMIT_BACKGROUND_RESERVE tokens in the bucket,
+which keeps a little burst free for interactive traffic even when the
+other party is a training process. With RATE_LIMIT_STATE_DIR set, the
+buckets live in files under a lock and are shared by every process
+(API workers, training jobs, train_batch.py) on the machine.
+
+The priority of a request comes from the request_priority context
+variable of the code that makes it (INTERACTIVE unless set otherwise).
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import time
+
+# Free-tier quotas: requests per minute and burst size per source (0 requests per minute disables the limit)
+RATE_LIMIT_COINGECKO_PER_MINUTE = float(os.environ.get('RATE_LIMIT_COINGECKO_PER_MINUTE', 30))
+RATE_LIMIT_COINGECKO_BURST = int(os.environ.get('RATE_LIMIT_COINGECKO_BURST', 5))
+RATE_LIMIT_CRYPTOCOMPARE_PER_MINUTE = float(os.environ.get('RATE_LIMIT_CRYPTOCOMPARE_PER_MINUTE', 100))
+RATE_LIMIT_CRYPTOCOMPARE_BURST = int(os.environ.get('RATE_LIMIT_CRYPTOCOMPARE_BURST', 10))
+# Tokens background requests leave in a bucket for interactive ones
+RATE_LIMIT_BACKGROUND_RESERVE = float(os.environ.get('RATE_LIMIT_BACKGROUND_RESERVE', 2))
+# Directory of bucket files shared across processes; unset keeps one bucket per process
+RATE_LIMIT_STATE_DIR = os.environ.get('RATE_LIMIT_STATE_DIR')
+
+QUOTAS = {
+    'coingecko': (RATE_LIMIT_COINGECKO_PER_MINUTE, RATE_LIMIT_COINGECKO_BURST),
+    'cryptocompare': (RATE_LIMIT_CRYPTOCOMPARE_PER_MINUTE, RATE_LIMIT_CRYPTOCOMPARE_BURST),
+}
+
+# Lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+request_priority = contextvars.ContextVar('request_priority', default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def priority(level):
+    """Run the upstream requests made inside the block with the given priority"""
+    token = request_priority.set(level)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class TokenBucket:
+    """In-process token bucket refilled at `rate` tokens per second up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _take(self, tokens, updated, now, reserve):
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1 + reserve:
+            return tokens - 1, 0.0
+        return tokens, (1 + reserve - tokens) / self.rate
+
+    def take(self, reserve=0.0):
+        """Take a token if at least `reserve` remain afterwards
+
+        Returns:
+            0.0 when a token was taken, otherwise seconds until one can be
+        """
+        now = time.monotonic()
+        self._tokens, wait = self._take(self._tokens, self._updated, now, reserve)
+        self._updated = now
+        return wait
+
+    def available(self):
+        return min(self.burst, self._tokens + (time.monotonic() - self._updated) * self.rate)
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket kept in a file under an exclusive lock, shared by every process using the same path"""
+
+    def __init__(self, rate, burst, path):
+        super().__init__(rate, burst)
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def _update(self, reserve=None):
+        import fcntl
+
+        with open(self.path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            now = time.time()
+            try:
+                state = json.loads(f.read())
+                tokens, updated = state['tokens'], state['updated']
+            except (ValueError, KeyError):
+                tokens, updated = float(self.burst), now
+            if reserve is None:
+                return min(self.burst, tokens + (now - updated) * self.rate)
+            tokens, wait = self._take(tokens, updated, now, reserve)
+            f.seek(0)
+            f.truncate()
+            json.dump({'tokens': tokens, 'updated': now}, f)
+            return wait
+
+    def take(self, reserve=0.0):
+        return self._update(reserve)
+
+    def available(self):
+        return self._update()
+
+
+class RateLimiter:
+    """Priority queue of requests waiting for one source's tokens
+
+    Must be used from the upstream client loop.
+    """
+
+    def __init__(self, name, bucket, background_reserve=RATE_LIMIT_BACKGROUND_RESERVE):
+        self.name = name
+        self.bucket = bucket
+        self.background_reserve = background_reserve
+        self._waiters = []
+        self._seq = itertools.count()
+        self._wake = None
+        self._dispatcher = None
+        self.granted = {label: 0 for label in PRIORITY_NAMES.values()}
+        self.waited = 0.0
+
+    async def acquire(self, level=INTERACTIVE):
+        """Wait for a token; higher priority requests are served first"""
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._seq), waiter))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wake = asyncio.Event()
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        else:
+            self._wake.set()
+        await waiter
+        self.granted[PRIORITY_NAMES[level]] += 1
+        self.waited += time.monotonic() - started
+
+    async def _dispatch(self):
+        while self._waiters:
+            level, _, waiter = self._waiters[0]
+            if waiter.done():
+                # Its request was cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            wait = self.bucket.take(min(self.background_reserve, self.bucket.burst - 1) if level == BACKGROUND else 0.0)
+            if wait == 0.0:
+                heapq.heappop(self._waiters)
+                waiter.set_result(None)
+                continue
+            # Sleep until a token is due, or until a new (possibly more urgent) request arrives
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self):
+        queued = {label: 0 for label in PRIORITY_NAMES.values()}
+        for level, _, waiter in list(self._waiters):
+            if not waiter.done():
+                queued[PRIORITY_NAMES[level]] += 1
+        return {
+            'per_minute': self.bucket.rate * 60,
+            'burst': self.bucket.burst,
+            'shared': isinstance(self.bucket, FileTokenBucket),
+            'tokens_available': self.bucket.available(),
+            'queued': queued,
+            'granted': dict(self.granted),
+            'total_wait_seconds': self.waited,
+        }
+
+
+class RateLimiters:
+    """Rate limiter of every source with a quota, created on first use"""
+
+    def __init__(self, quotas=QUOTAS, state_dir=RATE_LIMIT_STATE_DIR):
+        self.quotas = quotas
+        self.state_dir = state_dir
+        self._limiters = {}
+
+    def get(self, source):
+        """The source's limiter, or None for sources without a quota"""
+        if source not in self._limiters:
+            per_minute, burst = self.quotas.get(source, (0, 0))
+            if per_minute <= 0:
+                self._limiters[source] = None
+            elif self.state_dir:
+                path = os.path.join(self.state_dir, f"{source}.bucket")
+                self._limiters[source] = RateLimiter(source, FileTokenBucket(per_minute / 60, burst, path))
+            else:
+                self._limiters[source] = RateLimiter(source, TokenBucket(per_minute / 60, burst))
+        return self._limiters[source]
+
+    def stats(self):
+        return {name: limiter.stats() for name, limiter in sorted(self._limiters.items()) if limiter is not None}
+
+
+# Shared limiters for the whole process
+rate_limiters = RateLimiters()
@@ -0,0 +1,106 @@
+import asyncio
+import os
+from collections import OrderedDict
+
+# Maximum number of prediction results kept in memory
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 256))
+
+
+class ResultCache:
+    """LRU cache of prediction results with single-flight deduplication
+
+    Keys end with the timestamp of the last closed candle, so every entry
+    goes stale on its own when a new daily candle lands. Concurrent misses
+    for the same key share one computation instead of each starting their
+    own. Only successful results without degradations (shortcuts taken to
+    meet a deadline) are cached, and only if they were computed on real
+    data through that candle: a result built on synthetic or stale data
+    during an upstream outage would otherwise be served until the next one.
+
+    All methods must be called from the event loop thread.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get_or_compute(self, key, compute, coalesce=True):
+        """Return the cached result for key, or await compute() exactly once for it
+
+        With coalesce=False a miss neither joins nor leads a shared
+        computation; compute() runs for this caller alone.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        if not coalesce:
+            self.misses += 1
+            result = await compute()
+            if self._cacheable(key, result):
+                self._store(key, result)
+            return result
+
+        task = self._pending.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._compute_and_store(key, compute))
+            self._pending[key] = task
+        else:
+            self.coalesced += 1
+
+        # Shielded so a disconnecting client doesn't cancel the work others are waiting on
+        return await asyncio.shield(task)
+
+    async def _compute_and_store(self, key, compute):
+        try:
+            result = await compute()
+            if self._cacheable(key, result):
+                self._store(key, result)
+            return result
+        finally:
+            self._pending.pop(key, None)
+
+    def _cacheable(self, key, result):
+        if not isinstance(result, dict) or not result.get('success') or result.get('degradations'):
+            return False
+        return not result.get('synthetic_data') and result.get('data_through', key[-1]) == key[-1]
+
+    def _store(self, key, result):
+        # Results for the same request on an older candle can never be hit again
+        params, candle = key[:-1], key[-1]
+        for stale in [k for k in self._entries if k[:-1] == params and k[-1] != candle]:
+            del self._entries[stale]
+
+        self._entries[key] = result
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every cached result"""
+        self._entries.clear()
+
+    def stats(self):
+        """Counters and occupancy for diagnostics"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'in_flight': len(self._pending),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+# Shared cache for the whole process
+result_cache = ResultCache()
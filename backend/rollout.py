@@ -0,0 +1,132 @@
+import os
+import time
+
+import numpy as np
+
+from indicators import MACDState, RSIState
+from mc_dropout import mc_forward
+
+# 'stateful' (default) carries the LSTM state forward and advances one timestep
+# per day (NumPy backend only; other models fall back); 'window' re-runs the
+# full lookback window every day
+ROLLOUT_MODE = os.environ.get('ROLLOUT_MODE', 'stateful').lower()
+
+
+def supports_stateful(model):
+    """True if the model can be advanced one timestep at a time"""
+    return hasattr(model, 'start_stepping')
+
+
+def rollout_forecast(model, history, scaler, future_days, n_samples=100,
+                     quantiles=(0.025, 0.975), chunk_size=None, close_history=None,
+                     stateful=None):
+    """Advance all Monte Carlo trajectories through the forecast horizon together
+
+    Every trajectory keeps its own sampled path: the close predicted for a path
+    is fed back into that path's window together with its own RSI/MACD/Signal,
+    so the spread between paths compounds over the horizon. Indicators are
+    carried as streaming RSI/MACD state, one O(1) update per path and day.
+    All paths live in one preallocated (n_samples, lookback + future_days,
+    features) buffer and each forecast day costs a single batched forward pass.
+
+    Per-day statistics are reduced from the day's sample vector as soon as it
+    is produced, so the full (days, samples) tensor is never kept.
+
+    In stateful mode the history window is run once and each later day feeds a
+    single new timestep into the carried LSTM state, instead of re-running all
+    `lookback` timesteps. Each trajectory then keeps one set of dropout masks
+    for the whole horizon, and its state also remembers the rows that a
+    sliding window would have dropped, so results differ slightly from window
+    mode; compare_stateful_vs_window measures by how much.
+
+    Args:
+        model: Keras model with dropout layers
+        history: Scaled feature window of shape (lookback, features)
+        scaler: Fitted MinMaxScaler used for the features
+        future_days: Number of days to forecast
+        n_samples: Number of Monte Carlo trajectories
+        quantiles: Lower and upper quantiles of the reported band
+        chunk_size: Maximum rows per forward pass
+        close_history: Unscaled close series used to seed the indicator state
+            (defaults to the closes in the history window)
+        stateful: Advance the LSTM state one day at a time instead of
+            re-running the window (defaults to ROLLOUT_MODE == 'stateful');
+            models that can't step fall back to window mode
+
+    Returns:
+        Dictionary of per-day arrays in scaled units: mean, std, lower, upper
+    """
+    history = np.asarray(history, dtype=np.float32)
+    lookback, n_features = history.shape
+    scale, offset = scaler.scale_, scaler.min_
+
+    paths = np.empty((n_samples, lookback + future_days, n_features), dtype=np.float32)
+    paths[:, :lookback] = history
+    if close_history is None:
+        close_history = (history[:, 0] - offset[0]) / scale[0]
+    rsi_state = RSIState.from_history(close_history, n_paths=n_samples)
+    macd_state = MACDState.from_history(close_history, n_paths=n_samples)
+
+    stats = {name: np.empty(future_days) for name in ('mean', 'std', 'lower', 'upper')}
+
+    if stateful is None:
+        stateful = ROLLOUT_MODE == 'stateful'
+    if stateful and not supports_stateful(model):
+        print("[DEBUG] Model can't step its LSTM state, using window rollout")
+        stateful = False
+    if stateful:
+        stepper = model.start_stepping(paths[:, :lookback], training=True)
+
+    for day in range(future_days):
+        if not stateful:
+            preds = mc_forward(model, paths[:, day:day + lookback], chunk_size)
+        elif day == 0:
+            preds = stepper.output
+        else:
+            preds = stepper.step(paths[:, lookback + day - 1])
+
+        stats['mean'][day] = preds.mean()
+        stats['std'][day] = preds.std()
+        stats['lower'][day], stats['upper'][day] = np.quantile(preds, quantiles)
+
+        # Feed each path's own prediction back with freshly computed indicators
+        new_close = (preds - offset[0]) / scale[0]
+        rsi = rsi_state.update(new_close)
+        macd, signal = macd_state.update(new_close)
+        paths[:, lookback + day] = np.stack([new_close, rsi, macd, signal], axis=1) * scale + offset
+
+    return stats
+
+
+def compare_stateful_vs_window(model, history, scaler, future_days, n_samples=100, close_history=None):
+    """Run both rollout modes on the same input and report their cost and disagreement
+
+    Differences are in unscaled close prices. The MC noise floor is the band
+    of the window run, so a mean difference well inside it is sampling noise
+    rather than a systematic bias of the stateful mode.
+
+    Returns:
+        Dictionary with per-mode wall time, speedup and mean/max absolute
+        difference between the per-day mean forecasts
+    """
+    scale, offset = scaler.scale_[0], scaler.min_[0]
+    results = {}
+    for mode in ('window', 'stateful'):
+        started = time.perf_counter()
+        forecast = rollout_forecast(model, history, scaler, future_days, n_samples=n_samples,
+                                    close_history=close_history, stateful=mode == 'stateful')
+        elapsed = time.perf_counter() - started
+        results[mode] = ({name: (values - offset) / scale for name, values in forecast.items()
+                          if name != 'std'}, elapsed)
+
+    window, window_seconds = results['window']
+    stepped, stateful_seconds = results['stateful']
+    diff = np.abs(stepped['mean'] - window['mean'])
+    return {
+        'window_seconds': window_seconds,
+        'stateful_seconds': stateful_seconds,
+        'speedup': window_seconds / stateful_seconds if stateful_seconds else float('inf'),
+        'mean_abs_diff': float(diff.mean()),
+        'max_abs_diff': float(diff.max()),
+        'mean_band_width': float(np.mean(window['upper'] - window['lower'])),
+    }
@@ -0,0 +1,83 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+# Approximate market price, daily volatility, daily drift and RNG seed per coin
+SYNTHETIC_PROFILES = {
+    'BTC-USD': {'price': 66000, 'volatility': 0.028, 'uptrend': 0.0005, 'seed': 42},
+    'ETH-USD': {'price': 3500, 'volatility': 0.032, 'uptrend': 0.0006, 'seed': 43},
+    'SOL-USD': {'price': 140, 'volatility': 0.045, 'uptrend': 0.0008, 'seed': 44},
+    'ADA-USD': {'price': 0.45, 'volatility': 0.035, 'uptrend': 0.0002, 'seed': 45},
+    'DOGE-USD': {'price': 0.12, 'volatility': 0.055, 'uptrend': 0.0001, 'seed': 46},
+    'DOT-USD': {'price': 7.2, 'volatility': 0.035, 'uptrend': 0.0003, 'seed': 47},
+    'AVAX-USD': {'price': 35, 'volatility': 0.045, 'uptrend': 0.0004, 'seed': 48},
+    'XRP-USD': {'price': 0.50, 'volatility': 0.040, 'uptrend': 0.0003, 'seed': 49},
+    'MATIC-USD': {'price': 0.60, 'volatility': 0.042, 'uptrend': 0.0005, 'seed': 50},
+    'BNB-USD': {'price': 600, 'volatility': 0.030, 'uptrend': 0.0004, 'seed': 51},
+}
+
+DEFAULT_PROFILE = {'price': 100, 'volatility': 0.035, 'uptrend': 0.0003, 'seed': 42}
+
+# Market cycle (bull and bear phases) added to the daily returns
+CYCLE_PERIOD = 365
+CYCLE_AMPLITUDE = 0.5
+
+
+def synthetic_profile(coin_symbol):
+    """Price, volatility, drift and seed used to simulate a coin"""
+    if coin_symbol in SYNTHETIC_PROFILES:
+        return SYNTHETIC_PROFILES[coin_symbol]
+    profile = dict(DEFAULT_PROFILE)
+    if '-USD' in coin_symbol:
+        # Guess a baseline price for well-known names, otherwise a moderate default
+        symbol = coin_symbol.replace('-USD', '').lower()
+        profile['price'] = {'btc': 65000, 'bitcoin': 65000, 'eth': 3400, 'ethereum': 3400,
+                            'sol': 140, 'solana': 140}.get(symbol, 50)
+    return profile
+
+
+@functools.lru_cache(maxsize=64)
+def _synthetic_history(coin_symbol, end_date, days):
+    profile = synthetic_profile(coin_symbol)
+    price, volatility, uptrend = profile['price'], profile['volatility'], profile['uptrend']
+    rng = np.random.default_rng(profile['seed'])
+
+    # Walk backwards from today's price: p[i] = p[i - 1] / (1 + r[i])
+    i = np.arange(1, days)
+    returns = rng.normal(0, volatility, days - 1) - uptrend + np.sin(2 * np.pi * i / CYCLE_PERIOD) * CYCLE_AMPLITUDE / 100
+    close = np.concatenate(([price], price / np.cumprod(1 + returns)))[::-1]
+
+    index = pd.date_range(end=end_date, periods=days, freq='D')
+    open_ = np.empty(days)
+    open_[1:] = close[:-1] * (1 + rng.normal(0, volatility / 2, days - 1))
+    open_[0] = close[0] * 0.99
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, volatility / 2, days)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, volatility / 2, days)))
+    volume = price * 1000 * (1 + rng.normal(0, 0.3, days))
+
+    # Lower weekend volume, wider ranges around the turn of the month
+    volume[index.weekday >= 5] *= 0.7
+    month_edge = (index.day <= 3) | (index.day >= 28)
+    high[month_edge] *= 1.003
+    low[month_edge] *= 0.997
+
+    return pd.DataFrame({
+        'Close': close,
+        'Open': open_,
+        'High': high,
+        'Low': low,
+        'Adj Close': close,
+        'Volume': volume,
+    }, index=index)
+
+
+def generate_synthetic_data(coin_symbol, days=1095):
+    """Deterministic synthetic daily OHLCV history ending with yesterday's candle
+
+    The series for a coin only changes when the date does, so it is built
+    once per (coin, day) and served from memory afterwards. Callers get
+    their own copy and may modify it.
+    """
+    yesterday = pd.Timestamp.now().normalize() - pd.Timedelta(days=1)
+    return _synthetic_history(coin_symbol, yesterday, days).copy()
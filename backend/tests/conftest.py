@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Backend modules are imported flat (`from indicators import ...`), as the app does
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conformal import CONFORMAL_ALPHA, ResidualStore, deterministic_predict, walk_forward_residuals
+from prediction_utils import scale_features
+
+LOOKBACK = 60
+FUTURE_DAYS = 7
+CALIBRATION_DAYS = 700
+
+
+class BiasedLastClose:
+    """Model stand-in predicting the window's last scaled close plus a bias in scaled units
+
+    The bias is worth a different price at every scaling, so scores are only
+    exchangeable with served errors if each origin is scaled as serving does.
+    """
+
+    def __call__(self, X, training=False):
+        return np.asarray(X)[:, -1, :1] + 0.05
+
+
+def _history(n_days, seed=4):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.03, n_days)))
+    return pd.DataFrame({'Close': closes}, index=pd.date_range('2022-01-01', periods=n_days, freq='D'))
+
+
+def _served_scores(model, df, origins, horizon):
+    """Errors of forecasts made the way conformal_forecast serves them, at each origin (row position)"""
+    span = LOOKBACK + FUTURE_DAYS
+    closes = df['Close'].to_numpy()
+    scores = []
+    for origin in origins:
+        scaled_data, scaler = scale_features(df[['Close']].iloc[origin - span + 1:origin + 1].copy())
+        prediction = (deterministic_predict(model, scaled_data[None, -LOOKBACK:])[0] - scaler.min_[0]) / scaler.scale_[0]
+        scores.append(abs(np.log(closes[origin + horizon] / prediction)))
+    return np.array(scores)
+
+
+def test_backtest_quantiles_cover_held_out_origins(tmp_path):
+    df = _history(2 * CALIBRATION_DAYS)
+    model = BiasedLastClose()
+    store = ResidualStore(root=str(tmp_path))
+    store.replace('TEST-USD', 0.0, walk_forward_residuals(model, df.iloc[:CALIBRATION_DAYS], LOOKBACK, FUTURE_DAYS))
+    quantiles = store.quantiles('TEST-USD', FUTURE_DAYS)
+    assert quantiles is not None
+
+    # Held-out origins after the calibration history, forecast as requests on those days would be
+    origins = range(CALIBRATION_DAYS + LOOKBACK + FUTURE_DAYS, len(df) - FUTURE_DAYS)
+    for h in range(1, FUTURE_DAYS + 1):
+        coverage = np.mean(_served_scores(model, df, origins, h) <= quantiles[h - 1])
+        assert coverage == pytest.approx(1 - CONFORMAL_ALPHA, abs=0.04), f"day {h}"
+
+
+def test_scores_line_up_with_the_following_closes():
+    df = _history(200)
+    span = LOOKBACK + FUTURE_DAYS
+    residuals = walk_forward_residuals(BiasedLastClose(), df, LOOKBACK, FUTURE_DAYS, max_horizon=3)
+    for h in (1, 3):
+        origins = range(span - 1, len(df) - h)
+        np.testing.assert_allclose(residuals[h], _served_scores(BiasedLastClose(), df, origins, h), rtol=1e-5)
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import os
+
+import pytest
+from fastapi import HTTPException
+
+import global_model
+import main
+
+
+@pytest.fixture
+def global_model_dir(tmp_path, monkeypatch):
+    """Working directory with a global model trained on a 60-day lookback and no per-coin models"""
+    models = tmp_path / 'models'
+    models.mkdir()
+    (models / 'global_model.h5').write_bytes(b'')
+    (models / 'global_model.coins.json').write_text(json.dumps({'coins': {'BTC-USD': 1}, 'lookback': 60}))
+    monkeypatch.chdir(tmp_path)
+    assert os.path.exists(global_model.GLOBAL_MODEL_PATH)
+    return tmp_path
+
+
+def test_global_model_only_serves_its_training_lookback(global_model_dir):
+    assert global_model.global_model_lookback() == 60
+    assert global_model.use_global_model(False, 60)
+    assert not global_model.use_global_model(False, 90)
+    with pytest.raises(ValueError):
+        global_model.predict_many(['BTC-USD'], lookback=90)
+
+
+def test_predict_with_another_lookback_queues_training(global_model_dir, monkeypatch):
+    submitted = []
+
+    def submit(coin_symbol, **kwargs):
+        submitted.append((coin_symbol, kwargs))
+        return {'job_id': 'job-1', 'status': 'queued'}
+
+    monkeypatch.setattr(main.training_jobs, 'submit', submit)
+    request = main.PredictionRequest(coin_symbol='BTC-USD', lookback=90)
+    response = asyncio.run(main.make_prediction(request, x_max_latency_ms=None))
+
+    assert response.status_code == 202
+    assert json.loads(response.body)['training_job_id'] == 'job-1'
+    assert submitted == [('BTC-USD', {'lookback': 90, 'future_days': 7})]
+
+
+def test_predict_many_with_another_lookback_is_rejected(global_model_dir):
+    request = main.PredictManyRequest(coin_symbols=['BTC-USD'], lookback=90)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.make_many_predictions(request))
+    assert error.value.status_code == 400
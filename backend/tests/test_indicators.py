@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import MACDState, RSIState
+from prediction_utils import compute_macd, compute_rsi
+
+ROLLOUT_DAYS = 30
+N_PATHS = 4
+
+
+def _random_walk(rng, n):
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.03, n)))
+
+
+@pytest.mark.parametrize('n_seed', [10, 20, 200])
+def test_streaming_indicators_match_full_series(n_seed):
+    rng = np.random.default_rng(n_seed)
+    seed_closes = _random_walk(rng, n_seed)
+    # Every path continues the shared history with its own closes
+    future = seed_closes[-1] * np.exp(np.cumsum(rng.normal(0, 0.03, (N_PATHS, ROLLOUT_DAYS)), axis=1))
+
+    rsi_state = RSIState.from_history(seed_closes, n_paths=N_PATHS)
+    macd_state = MACDState.from_history(seed_closes, n_paths=N_PATHS)
+
+    expected_rsi = compute_rsi(pd.Series(seed_closes)).iloc[-1]
+    expected_macd, expected_signal = (s.iloc[-1] for s in compute_macd(pd.Series(seed_closes)))
+    np.testing.assert_allclose(rsi_state.value(), expected_rsi, rtol=1e-9)
+    np.testing.assert_allclose(macd_state.value()[0], expected_macd, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(macd_state.value()[1], expected_signal, rtol=1e-9, atol=1e-12)
+
+    for day in range(ROLLOUT_DAYS):
+        rsi = rsi_state.update(future[:, day])
+        macd, signal = macd_state.update(future[:, day])
+        for path in range(N_PATHS):
+            closes = pd.Series(np.concatenate([seed_closes, future[path, :day + 1]]))
+            full_macd, full_signal = compute_macd(closes)
+            assert rsi[path] == pytest.approx(compute_rsi(closes).iloc[-1], rel=1e-9)
+            assert macd[path] == pytest.approx(full_macd.iloc[-1], rel=1e-9, abs=1e-12)
+            assert signal[path] == pytest.approx(full_signal.iloc[-1], rel=1e-9, abs=1e-12)
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+
+from mc_dropout import mc_sample
+from numpy_lstm import NumpyLSTMModel
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'XRP_USD_model.h5')
+MC_SAMPLES = 2000
+
+pytestmark = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason='saved XRP model not available')
+
+
+@pytest.fixture(scope='module')
+def models():
+    pytest.importorskip('tensorflow')
+    from prediction_utils import load_keras_model
+
+    return load_keras_model(MODEL_PATH), NumpyLSTMModel.from_h5(MODEL_PATH)
+
+
+@pytest.fixture(scope='module')
+def windows(models):
+    keras_model, _ = models
+    _, lookback, n_features = keras_model.input_shape
+    return np.random.default_rng(0).uniform(0, 1, (8, lookback, n_features)).astype(np.float32)
+
+
+def test_deterministic_outputs_match(models, windows):
+    keras_model, numpy_model = models
+    assert numpy_model.input_shape == keras_model.input_shape
+    assert numpy_model.count_params() == keras_model.count_params()
+    expected = np.asarray(keras_model(windows, training=False))
+    np.testing.assert_allclose(numpy_model(windows, training=False), expected, rtol=1e-4, atol=1e-5)
+
+
+def test_mc_dropout_distributions_agree(models, windows):
+    keras_model, numpy_model = models
+    window = windows[:1]
+    keras_samples = mc_sample(keras_model, window, MC_SAMPLES)[:, 0]
+    numpy_samples = mc_sample(numpy_model, window, MC_SAMPLES)[:, 0]
+
+    keras_std, numpy_std = keras_samples.std(), numpy_samples.std()
+    assert keras_std > 0 and numpy_std > 0
+    # Means within five standard errors of their difference, spreads within 10%
+    standard_error = np.sqrt((keras_std ** 2 + numpy_std ** 2) / MC_SAMPLES)
+    assert abs(keras_samples.mean() - numpy_samples.mean()) < 5 * standard_error
+    assert numpy_std == pytest.approx(keras_std, rel=0.1)
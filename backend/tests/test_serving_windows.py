@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from prediction_utils import scale_features, serving_targets, serving_windows
+
+LOOKBACK = 60
+FUTURE_DAYS = 7
+
+
+def _history(n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.03, n_days)))
+    return pd.DataFrame({'Close': closes}, index=pd.date_range('2024-01-01', periods=n_days, freq='D'))
+
+
+def test_every_window_matches_a_request_at_its_origin():
+    df = _history(120)
+    span = LOOKBACK + FUTURE_DAYS
+    windows, scale, offset = serving_windows(df, LOOKBACK, FUTURE_DAYS)
+    assert windows.shape == (len(df) - span + 1, LOOKBACK, 4)
+
+    for origin in (0, 17, len(windows) - 1):
+        # What prepare_data builds from the span of days a request at this origin fetches
+        served = df.iloc[origin:origin + span].copy()
+        scaled_data, scaler = scale_features(served)
+        np.testing.assert_allclose(windows[origin], scaled_data[-LOOKBACK:], rtol=1e-6, atol=1e-6)
+        assert scale[origin] == scaler.scale_[0]
+        assert offset[origin] == scaler.min_[0]
+
+
+def test_targets_follow_each_window_in_its_own_scale():
+    df = _history(120)
+    span = LOOKBACK + FUTURE_DAYS
+    windows, scale, offset = serving_windows(df, LOOKBACK, FUTURE_DAYS)
+    targets = serving_targets(df, LOOKBACK, FUTURE_DAYS, scale, offset, horizon=5)
+    assert targets.shape == (len(df) - span - 5 + 1, 5)
+
+    closes = df['Close'].to_numpy()
+    for origin in (0, len(targets) - 1):
+        expected = closes[origin + span:origin + span + 5]
+        np.testing.assert_allclose((targets[origin] - offset[origin]) / scale[origin], expected, rtol=1e-9)
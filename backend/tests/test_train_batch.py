@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import Future
+
+import pytest
+
+import train_batch
+
+
+class InlineExecutor:
+    """ProcessPoolExecutor stand-in that runs every job in the calling process"""
+
+    def __init__(self, max_workers=None, mp_context=None, initializer=None, initargs=()):
+        pass
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+@pytest.fixture
+def trained(monkeypatch):
+    """(coin, mode) of every training run, with coins listed in `failing` failing once"""
+    calls, failing = [], set()
+
+    def train_one(coin_symbol, lookback, future_days, mode, epochs):
+        calls.append((coin_symbol, mode))
+        if coin_symbol in failing:
+            failing.discard(coin_symbol)
+            return {'status': 'failed', 'error': 'boom', 'seconds': 1.0}
+        return {'status': 'completed', 'seconds': 1.0, 'epochs_run': 1, 'samples_per_sec': 1.0, 'loss': 0.1}
+
+    monkeypatch.setattr(train_batch, 'ProcessPoolExecutor', InlineExecutor)
+    monkeypatch.setattr(train_batch, '_train_one', train_one)
+    return calls, failing
+
+
+def test_finished_run_does_not_block_the_next_mode(trained, tmp_path):
+    calls, _ = trained
+    state_path = str(tmp_path / 'state.json')
+    coins = ['BTC-USD', 'ETH-USD']
+
+    train_batch.run_batch(coins, workers=1, threads=1, mode='full', state_path=state_path)
+    assert not os.path.exists(state_path)
+    train_batch.run_batch(coins, workers=1, threads=1, mode='distill', state_path=state_path)
+
+    assert calls == [('BTC-USD', 'full'), ('ETH-USD', 'full'), ('BTC-USD', 'distill'), ('ETH-USD', 'distill')]
+
+
+def test_only_an_interrupted_run_with_the_same_parameters_resumes(trained, tmp_path):
+    calls, failing = trained
+    state_path = str(tmp_path / 'state.json')
+    coins = ['BTC-USD', 'ETH-USD']
+
+    failing.add('ETH-USD')
+    train_batch.run_batch(coins, workers=1, threads=1, mode='full', state_path=state_path)
+    assert os.path.exists(state_path)
+    train_batch.run_batch(coins, workers=1, threads=1, mode='full', state_path=state_path)
+    assert calls[2:] == [('ETH-USD', 'full')]
+    assert not os.path.exists(state_path)
+
+    # An unfinished run of other parameters doesn't count as progress
+    calls.clear()
+    failing.add('ETH-USD')
+    train_batch.run_batch(coins, workers=1, threads=1, mode='full', state_path=state_path)
+    train_batch.run_batch(coins, workers=1, threads=1, mode='incremental', state_path=state_path)
+    assert calls[2:] == [('BTC-USD', 'incremental'), ('ETH-USD', 'incremental')]
@@ -0,0 +1,172 @@
+"""Train models for many coins in parallel
+
+Each coin is fitted in a worker process with explicit TensorFlow thread
+limits, so workers x intra-op threads never exceeds the cores available.
+Progress is saved to a state file after every coin; running the same
+command again skips coins that already finished. The file records the run
+parameters (mode, lookback, future_days, epochs), so only a rerun of the
+same batch resumes, and it is removed once every coin has completed.
+
+Usage:
+    python train_batch.py BTC-USD ETH-USD SOL-USD --workers 4 --threads 4
+    python train_batch.py --coins-file coins.txt --mode incremental
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from rate_limiter import BACKGROUND, priority
+from training_jobs import TRAINING_MODES, configure_worker_threads
+
+DEFAULT_STATE_PATH = os.path.join('data', 'train_batch_state.json')
+
+
+def _load_state(path, run):
+    """Per-coin results of an unfinished run with the same parameters, else {}"""
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(saved, dict) or saved.get('run') != run:
+        return {}
+    return saved.get('coins', {})
+
+
+def _save_state(path, run, state):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'run': run, 'coins': state}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _clear_state(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _train_one(coin_symbol, lookback, future_days, mode, epochs):
+    """Worker entry point: train one coin and time it"""
+    from prediction_utils import train_coin_model
+
+    started = time.perf_counter()
+    try:
+        with priority(BACKGROUND):
+            summary = train_coin_model(coin_symbol, lookback, future_days, mode=mode, epochs=epochs)
+        summary['status'] = 'completed'
+    except Exception as e:
+        summary = {'status': 'failed', 'error': str(e) or type(e).__name__}
+    summary['seconds'] = time.perf_counter() - started
+    samples = summary.get('windows', 0) * summary.get('epochs_run', 0)
+    summary['samples_per_sec'] = samples / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
+
+
+def plan_threads(workers=None, threads=None, cpus=None):
+    """Split the cores between workers: returns (workers, intra-op threads per worker)"""
+    cpus = cpus or os.cpu_count() or 1
+    if workers is None and threads is None:
+        threads = min(4, cpus)
+    if workers is None:
+        workers = max(1, cpus // threads)
+    if threads is None:
+        threads = max(1, cpus // workers)
+    return workers, threads
+
+
+def run_batch(coins, workers=None, threads=None, inter_op_threads=1, lookback=60, future_days=7,
+              mode='full', epochs=50, state_path=DEFAULT_STATE_PATH, resume=True):
+    """Train every coin, skipping the ones an interrupted run with the same parameters completed
+
+    The state file is removed once every coin has completed, so the next
+    run (e.g. the daily incremental refresh) trains every coin again.
+
+    Returns:
+        The state dictionary of per-coin results
+    """
+    workers, threads = plan_threads(workers, threads)
+    run = {'mode': mode, 'lookback': lookback, 'future_days': future_days, 'epochs': epochs}
+    state = _load_state(state_path, run) if resume else {}
+    pending = [coin for coin in coins if state.get(coin, {}).get('status') != 'completed']
+    skipped = len(coins) - len(pending)
+    print(f"Training {len(pending)} coins ({skipped} already done) on {workers} workers "
+          f"x {threads} intra-op / {inter_op_threads} inter-op threads")
+    if not pending:
+        _clear_state(state_path)
+        return state
+
+    started = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=configure_worker_threads, initargs=(threads, inter_op_threads))
+    try:
+        futures = {executor.submit(_train_one, coin, lookback, future_days, mode, epochs): coin
+                   for coin in pending}
+        for future in as_completed(futures):
+            coin = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'status': 'failed', 'error': str(e) or type(e).__name__}
+            state[coin] = result
+            _save_state(state_path, run, state)
+
+            if result['status'] == 'completed':
+                print(f"{coin:>12}  {result['seconds']:7.1f}s  {result['epochs_run']:3d} epochs  "
+                      f"{result['samples_per_sec']:9.0f} samples/s  loss={result['loss']}")
+            else:
+                print(f"{coin:>12}  failed: {result['error']}")
+    except KeyboardInterrupt:
+        print("Interrupted; finished coins are saved, rerun the same command to resume")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    wall = time.perf_counter() - started
+    done = [state[coin] for coin in pending if state[coin]['status'] == 'completed']
+    busy = sum(result['seconds'] for result in done)
+    print(f"Finished {len(done)}/{len(pending)} coins in {wall:.1f}s "
+          f"({len(done) / wall * 3600:.1f} coins/hour, {busy / wall:.2f} workers busy on average)")
+    if all(state.get(coin, {}).get('status') == 'completed' for coin in coins):
+        _clear_state(state_path)
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train models for many coins in parallel")
+    parser.add_argument('coins', nargs='*', help="Coin symbols, e.g. BTC-USD ETH-USD")
+    parser.add_argument('--coins-file', help="File with one coin symbol per line")
+    parser.add_argument('--workers', type=int, help="Parallel training processes (default: cores / threads)")
+    parser.add_argument('--threads', type=int, help="Intra-op threads per process (default: min(4, cores))")
+    parser.add_argument('--inter-op-threads', type=int, default=1, help="Inter-op threads per process")
+    parser.add_argument('--mode', choices=TRAINING_MODES, default='full')
+    parser.add_argument('--lookback', type=int, default=60)
+    parser.add_argument('--future-days', type=int, default=7)
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH, help="Progress file used to resume")
+    parser.add_argument('--fresh', action='store_true', help="Ignore the progress file and train every coin")
+    args = parser.parse_args(argv)
+
+    coins = list(args.coins)
+    if args.coins_file:
+        with open(args.coins_file) as f:
+            coins += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    coins = [coin.upper() if coin.upper().endswith('-USD') else f"{coin.upper()}-USD" for coin in coins]
+    coins = list(dict.fromkeys(coins))
+    if not coins:
+        parser.error("no coins given")
+
+    state = run_batch(coins, workers=args.workers, threads=args.threads, inter_op_threads=args.inter_op_threads,
+                      lookback=args.lookback, future_days=args.future_days, mode=args.mode,
+                      epochs=args.epochs, state_path=args.state, resume=not args.fresh)
+    return 0 if all(state.get(coin, {}).get('status') == 'completed' for coin in coins) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
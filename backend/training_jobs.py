@@ -0,0 +1,233 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from rate_limiter import BACKGROUND, priority
+
+# Number of models trained at the same time, each in its own process
+TRAINING_WORKERS = int(os.environ.get('TRAINING_WORKERS', 1))
+# TensorFlow intra/inter-op threads per training process (0 keeps TensorFlow's default of all cores)
+TRAINING_INTRA_OP_THREADS = int(os.environ.get('TRAINING_INTRA_OP_THREADS', 0))
+TRAINING_INTER_OP_THREADS = int(os.environ.get('TRAINING_INTER_OP_THREADS', 0))
+# Where worker processes publish per-job progress
+TRAINING_JOBS_DIR = os.environ.get('TRAINING_JOBS_DIR', os.path.join('data', 'jobs'))
+# Finished jobs remembered for /jobs/{id} before the oldest are forgotten
+TRAINING_JOBS_KEEP = int(os.environ.get('TRAINING_JOBS_KEEP', 200))
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# 'full' retrains from scratch; 'incremental' fine-tunes the saved model on new candles;
+# 'direct' trains the coin's direct multi-horizon model; 'distill' fits its fast uncertainty student
+TRAINING_MODES = ('full', 'incremental', 'direct', 'distill')
+
+
+def _write_progress(path, progress):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
+
+
+def _read_progress(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def configure_worker_threads(intra_op_threads=0, inter_op_threads=0):
+    """Cap TensorFlow's thread pools in a fresh worker process; 0 keeps the default
+
+    Must run before TensorFlow executes anything in the process, which is why
+    it is used as the process pool initializer.
+    """
+    if intra_op_threads:
+        os.environ['OMP_NUM_THREADS'] = str(intra_op_threads)
+        os.environ['TF_NUM_INTRAOP_THREADS'] = str(intra_op_threads)
+    if inter_op_threads:
+        os.environ['TF_NUM_INTEROP_THREADS'] = str(inter_op_threads)
+    if intra_op_threads or inter_op_threads:
+        import tensorflow as tf
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+def _run_training_job(progress_path, coin_symbol, lookback, future_days, epochs, mode):
+    """Entry point of a training worker process"""
+    from prediction_utils import train_coin_model
+
+    progress = {'status': 'running', 'started_at': time.time(), 'epoch': 0, 'epochs': epochs}
+    _write_progress(progress_path, progress)
+
+    def on_epoch_end(epoch, logs):
+        progress['epoch'] = epoch + 1
+        progress.update({name: float(value) for name, value in (logs or {}).items()})
+        _write_progress(progress_path, progress)
+
+    # Data fetched for training waits behind interactive requests for rate limit tokens
+    with priority(BACKGROUND):
+        return train_coin_model(coin_symbol, lookback, future_days, mode=mode, epochs=epochs,
+                                on_epoch_end=on_epoch_end)
+
+
+class TrainingJobs:
+    """Background model training in a separate process pool
+
+    Jobs are deduplicated per coin: submitting a coin that already has a
+    queued or running job returns that job. Worker processes report epoch
+    progress through a small JSON file per job, and each finished model is
+    moved over the served artifact atomically, where the model registry
+    picks it up by its new mtime.
+    """
+
+    def __init__(self, max_workers=TRAINING_WORKERS, jobs_dir=TRAINING_JOBS_DIR, keep=TRAINING_JOBS_KEEP,
+                 intra_op_threads=TRAINING_INTRA_OP_THREADS, inter_op_threads=TRAINING_INTER_OP_THREADS):
+        self.max_workers = max_workers
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.jobs_dir = jobs_dir
+        self.keep = keep
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            # Spawned workers start clean instead of inheriting the server's threads and TF state
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=configure_worker_threads,
+                                                 initargs=(self.intra_op_threads, self.inter_op_threads))
+        return self._executor
+
+    def _progress_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def submit(self, coin_symbol, lookback=60, future_days=7, epochs=50, mode='full'):
+        """Queue training for a coin, or return the job already training it"""
+        if mode not in TRAINING_MODES:
+            raise ValueError(f"Unknown training mode: {mode}")
+        with self._lock:
+            job_id = self._active.get(coin_symbol)
+            if job_id is not None:
+                self.deduplicated += 1
+                return self._snapshot(job_id)
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'coin': coin_symbol,
+                'status': 'queued',
+                'mode': mode,
+                'lookback': lookback,
+                'epoch': 0,
+                'epochs': epochs,
+                'created_at': time.time(),
+            }
+            self._active[coin_symbol] = job_id
+            self.submitted += 1
+
+            os.makedirs(self.jobs_dir, exist_ok=True)
+            args = (_run_training_job, self._progress_path(job_id), coin_symbol, lookback, future_days, epochs, mode)
+            try:
+                try:
+                    future = self._ensure_executor().submit(*args)
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for memory); replace the pool and try once more
+                    self._executor = None
+                    future = self._ensure_executor().submit(*args)
+            except Exception as e:
+                self._finish(job_id, error=str(e))
+                raise
+            snapshot = self._snapshot(job_id)
+
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return snapshot
+
+    def _on_done(self, job_id, future):
+        try:
+            result, error = future.result(), None
+        except Exception as e:
+            result, error = None, str(e) or type(e).__name__
+        with self._lock:
+            self._finish(job_id, result=result, error=error)
+
+    def _finish(self, job_id, result=None, error=None):
+        job = self._jobs[job_id]
+        job.update({key: value for key, value in _read_progress(self._progress_path(job_id)).items()
+                    if key != 'status'})
+        job['finished_at'] = time.time()
+        if error is None:
+            job['status'] = 'completed'
+            job.update(result or {})
+            self.completed += 1
+        else:
+            job['status'] = 'failed'
+            job['error'] = error
+            self.failed += 1
+        if self._active.get(job['coin']) == job_id:
+            del self._active[job['coin']]
+        try:
+            os.remove(self._progress_path(job_id))
+        except OSError:
+            pass
+        self._forget_old_jobs()
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
+
+    def _snapshot(self, job_id):
+        job = dict(self._jobs[job_id])
+        if job['status'] in ACTIVE_STATUSES:
+            job.update(_read_progress(self._progress_path(job_id)))
+        return job
+
+    def get(self, job_id):
+        """Current status and progress of a job, or None if unknown"""
+        with self._lock:
+            if job_id not in self._jobs:
+                return None
+            return self._snapshot(job_id)
+
+    def active_job(self, coin_symbol):
+        """Queued or running job for a coin, or None"""
+        with self._lock:
+            job_id = self._active.get(coin_symbol)
+            return self._snapshot(job_id) if job_id is not None else None
+
+    def shutdown(self):
+        """Stop accepting jobs and cancel the ones that haven't started"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        """Job counters for diagnostics"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'active': len(self._active),
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+
+
+# Shared job service for the whole process
+training_jobs = TrainingJobs()
@@ -0,0 +1,365 @@
+"""Local stand-in for the CoinGecko and CryptoCompare endpoints the backend calls
+
+Serves a synthetic market of many correlated assets so benchmarks and load
+tests can run offline. Every asset's daily log return is a beta-weighted
+common market factor plus its own noise. Candles are keyed by absolute date
+(every asset closes at its listed price on STANDIN_ANCHOR_DATE), so a past
+candle never changes as days go by and only today's one is new. Series are
+generated lazily, so large universes cost nothing until an asset is
+requested. Ids outside the generated universe (e.g. a symbol the backend
+guesses) get a series of their own too.
+
+Latency, 429 responses and server failures can be injected at start-up or
+changed at runtime with POST /_standin/config.
+
+Usage:
+    python upstream_standin.py --port 8100 --assets 500 --latency-ms 40 --rate-limit-rate 0.05
+    COINGECKO_BASE_URL=http://127.0.0.1:8100/api/v3 \\
+    CRYPTOCOMPARE_BASE_URL=http://127.0.0.1:8100 uvicorn main:app
+"""
+import argparse
+import asyncio
+import os
+import random
+import zlib
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+# Size of the generated universe and length of every asset's history
+STANDIN_ASSETS = int(os.environ.get('STANDIN_ASSETS', 250))
+STANDIN_HISTORY_DAYS = int(os.environ.get('STANDIN_HISTORY_DAYS', 2000))
+STANDIN_SEED = int(os.environ.get('STANDIN_SEED', 7))
+# Day on which every asset closes at its listed price
+STANDIN_ANCHOR_DATE = os.environ.get('STANDIN_ANCHOR_DATE', '2024-01-01')
+# Fault injection: mean added latency and its jitter, and the share of
+# requests answered with 429 (with Retry-After) or with a 500/503
+STANDIN_LATENCY_MS = float(os.environ.get('STANDIN_LATENCY_MS', 0))
+STANDIN_LATENCY_JITTER_MS = float(os.environ.get('STANDIN_LATENCY_JITTER_MS', 0))
+STANDIN_RATE_LIMIT_RATE = float(os.environ.get('STANDIN_RATE_LIMIT_RATE', 0))
+STANDIN_FAILURE_RATE = float(os.environ.get('STANDIN_FAILURE_RATE', 0))
+STANDIN_RETRY_AFTER = int(os.environ.get('STANDIN_RETRY_AFTER', 1))
+
+# Daily volatility of the common market factor
+MARKET_VOLATILITY = 0.025
+
+# Days of noise drawn from one generator, and asset histories kept per server
+BLOCK_DAYS = 256
+HISTORY_CACHE_SIZE = 4096
+
+# Real names for the ids the backend maps symbols to: (id, symbol, name, price on the anchor date)
+KNOWN_ASSETS = [
+    ('bitcoin', 'btc', 'Bitcoin', 66000),
+    ('ethereum', 'eth', 'Ethereum', 3500),
+    ('binancecoin', 'bnb', 'BNB', 600),
+    ('solana', 'sol', 'Solana', 140),
+    ('ripple', 'xrp', 'XRP', 0.50),
+    ('cardano', 'ada', 'Cardano', 0.45),
+    ('dogecoin', 'doge', 'Dogecoin', 0.12),
+    ('avalanche-2', 'avax', 'Avalanche', 35),
+    ('polkadot', 'dot', 'Polkadot', 7.2),
+    ('matic-network', 'matic', 'Polygon', 0.60),
+    ('chainlink', 'link', 'Chainlink', 14),
+    ('litecoin', 'ltc', 'Litecoin', 80),
+]
+
+
+def _day_normals(seed, stream, first, last, size):
+    """Standard normal draws for the days first..last (date ordinals), `size` per day
+
+    Draws come in blocks of BLOCK_DAYS seeded by (seed, stream, block), so
+    the values of a day don't depend on the range that was asked for.
+    """
+    first_block, last_block = first // BLOCK_DAYS, last // BLOCK_DAYS
+    draws = np.concatenate([np.random.default_rng([seed, stream, block]).standard_normal((BLOCK_DAYS, size))
+                            for block in range(first_block, last_block + 1)])
+    offset = first - first_block * BLOCK_DAYS
+    return draws[offset:offset + last - first + 1]
+
+
+class Asset:
+    def __init__(self, asset_id, symbol, name, price, seed):
+        rng = np.random.default_rng(seed)
+        self.id = asset_id
+        self.symbol = symbol
+        self.name = name
+        self.price = price
+        self.seed = seed
+        self.beta = rng.uniform(0.5, 1.5)
+        self.volatility = rng.uniform(0.01, 0.035)
+        self.supply = float(rng.uniform(1e7, 1e10))
+
+
+class SyntheticMarket:
+    """Universe of assets with correlated daily OHLCV history ending today"""
+
+    def __init__(self, n_assets=STANDIN_ASSETS, history_days=STANDIN_HISTORY_DAYS, seed=STANDIN_SEED,
+                 anchor_date=STANDIN_ANCHOR_DATE):
+        self.history_days = history_days
+        self.seed = seed
+        self.anchor_date = pd.Timestamp(anchor_date, tz='UTC').normalize()
+        # Per-instance caches: asset id -> (end date, frame) and (end date, ranking)
+        self._histories = {}
+        self._ranking = None
+        rng = np.random.default_rng(seed)
+        self.assets = {}
+        for i, (asset_id, symbol, name, price) in enumerate(KNOWN_ASSETS[:n_assets]):
+            self.assets[asset_id] = Asset(asset_id, symbol, name, price, seed + i + 1)
+        for i in range(len(self.assets), n_assets):
+            asset_id = f"asset-{i:05d}"
+            # Log-uniform prices between a cent and a few thousand dollars
+            price = float(np.exp(rng.uniform(np.log(0.01), np.log(5000))))
+            self.assets[asset_id] = Asset(asset_id, f"a{i:05d}", f"Asset {i:05d}", price, seed + i + 1)
+        self.by_symbol = {asset.symbol: asset for asset in self.assets.values()}
+
+    def asset(self, asset_id):
+        """Asset for an id or symbol; unknown ids get a deterministic asset of their own"""
+        asset_id = asset_id.lower()
+        asset = self.assets.get(asset_id) or self.by_symbol.get(asset_id)
+        if asset is None:
+            seed = zlib.crc32(asset_id.encode())
+            price = float(np.exp(np.random.default_rng(seed).uniform(np.log(0.01), np.log(5000))))
+            asset = Asset(asset_id, asset_id[:6], asset_id.capitalize(), price, seed)
+        return asset
+
+    def _market_factor(self, first, last):
+        return 0.0002 + MARKET_VOLATILITY * _day_normals(self.seed, 0, first, last, 1)[:, 0]
+
+    def _history(self, asset_id, end_date):
+        cached = self._histories.get(asset_id)
+        if cached is not None and cached[0] == end_date:
+            return cached[1]
+
+        asset = self.asset(asset_id)
+        dates = pd.date_range(end=end_date, periods=self.history_days, freq='D', tz='UTC')
+        # Generate from the anchor (or the first day, if earlier) so closes don't depend on end_date
+        span = pd.date_range(min(dates[0], self.anchor_date), max(end_date, self.anchor_date), freq='D', tz='UTC')
+        first, last = span[0].toordinal(), span[-1].toordinal()
+        noise = _day_normals(asset.seed, 1, first, last, 5)
+        returns = asset.beta * self._market_factor(first, last) + asset.volatility * noise[:, 0]
+
+        # Accumulate outwards from the anchor, so a day's close is the same whatever the span
+        anchor = span.get_loc(self.anchor_date)
+        log_close = np.concatenate([-np.cumsum(returns[anchor:0:-1])[::-1], [0.0], np.cumsum(returns[anchor + 1:])])
+        close = asset.price * np.exp(log_close)
+        # Each day opens near the previous close
+        open_ = close * np.exp(-returns + asset.volatility / 4 * noise[:, 1])
+        spread = np.abs(noise[:, 2:4]) * asset.volatility / 2
+        volume = asset.supply * 0.02 * np.exp(0.3 * noise[:, 4] + 5 * np.abs(returns))
+        df = pd.DataFrame({
+            'open': open_,
+            'high': np.maximum(open_, close) * (1 + spread[:, 0]),
+            'low': np.minimum(open_, close) * (1 - spread[:, 1]),
+            'close': close,
+            'volume': volume,
+        }, index=span).loc[dates[0]:dates[-1]]
+
+        if asset_id not in self._histories and len(self._histories) >= HISTORY_CACHE_SIZE:
+            self._histories.pop(next(iter(self._histories)))
+        self._histories[asset_id] = (end_date, df)
+        return df
+
+    def history(self, asset_id, days=None):
+        """Daily OHLCV frame of the last `days` days, today's (still open) candle included"""
+        df = self._history(asset_id.lower(), pd.Timestamp.now(tz='UTC').normalize())
+        return df if days is None else df.iloc[-min(int(days), len(df)):]
+
+    def summary(self, asset):
+        """Market snapshot in the shape of CoinGecko's /coins/markets rows"""
+        df = self.history(asset.id, 31)
+        close = df['close'].to_numpy()
+        high = self.history(asset.id)['close']
+        return {
+            'id': asset.id,
+            'symbol': asset.symbol,
+            'name': asset.name,
+            'image': f"https://example.invalid/{asset.id}.png",
+            'current_price': float(close[-1]),
+            'market_cap': float(close[-1] * asset.supply),
+            'total_volume': float(df['volume'].iloc[-1] * close[-1]),
+            'high_24h': float(df['high'].iloc[-1]),
+            'low_24h': float(df['low'].iloc[-1]),
+            'price_change_24h': float(close[-1] - close[-2]),
+            'price_change_percentage_24h': float((close[-1] / close[-2] - 1) * 100),
+            'price_change_percentage_7d': float((close[-1] / close[-8] - 1) * 100),
+            'price_change_percentage_30d': float((close[-1] / close[0] - 1) * 100),
+            'circulating_supply': asset.supply,
+            'total_supply': asset.supply,
+            'max_supply': None,
+            'ath': float(high.max()),
+            'ath_change_percentage': float((close[-1] / high.max() - 1) * 100),
+            'ath_date': high.idxmax().isoformat(),
+            'atl': float(high.min()),
+            'atl_change_percentage': float((close[-1] / high.min() - 1) * 100),
+            'atl_date': high.idxmin().isoformat(),
+            'last_updated': pd.Timestamp.now(tz='UTC').isoformat(),
+        }
+
+    def ranked(self):
+        """Assets by market cap, largest first"""
+        end_date = pd.Timestamp.now(tz='UTC').normalize()
+        if self._ranking is None or self._ranking[0] != end_date:
+            ranked = sorted(self.assets.values(), key=lambda a: self.summary(a)['market_cap'], reverse=True)
+            self._ranking = (end_date, ranked)
+        return self._ranking[1]
+
+    def rank(self, asset):
+        """Market cap rank, or None for ids outside the universe"""
+        ranked = self.ranked()
+        return ranked.index(asset) + 1 if asset in ranked else None
+
+
+class FaultConfig(BaseModel):
+    latency_ms: Optional[float] = Field(default=None, ge=0)
+    latency_jitter_ms: Optional[float] = Field(default=None, ge=0)
+    rate_limit_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    failure_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    retry_after: Optional[int] = Field(default=None, ge=0)
+
+
+faults = {
+    'latency_ms': STANDIN_LATENCY_MS,
+    'latency_jitter_ms': STANDIN_LATENCY_JITTER_MS,
+    'rate_limit_rate': STANDIN_RATE_LIMIT_RATE,
+    'failure_rate': STANDIN_FAILURE_RATE,
+    'retry_after': STANDIN_RETRY_AFTER,
+}
+counters = {'requests': 0, 'rate_limited': 0, 'failed': 0}
+
+market = SyntheticMarket()
+app = FastAPI(title="Market data stand-in", description="Offline CoinGecko/CryptoCompare stand-in")
+
+
+@app.middleware("http")
+async def inject_faults(request, call_next):
+    if request.url.path.startswith('/_standin'):
+        return await call_next(request)
+    counters['requests'] += 1
+    delay = faults['latency_ms'] + random.uniform(-1, 1) * faults['latency_jitter_ms']
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+    roll = random.random()
+    if roll < faults['rate_limit_rate']:
+        counters['rate_limited'] += 1
+        return JSONResponse(status_code=429, headers={'Retry-After': str(faults['retry_after'])},
+                            content={'status': {'error_code': 429, 'error_message': "You've exceeded the Rate Limit"}})
+    if roll < faults['rate_limit_rate'] + faults['failure_rate']:
+        counters['failed'] += 1
+        return JSONResponse(status_code=random.choice((500, 503)), content={'error': 'injected failure'})
+    return await call_next(request)
+
+
+@app.get("/api/v3/coins/markets")
+async def coins_markets(vs_currency: str = 'usd', per_page: int = 100, page: int = 1):
+    ranked = market.ranked()[(page - 1) * per_page:page * per_page]
+    rows = []
+    for rank, asset in enumerate(ranked, start=(page - 1) * per_page + 1):
+        rows.append(dict(market.summary(asset), market_cap_rank=rank))
+    return rows
+
+
+@app.get("/api/v3/coins/{coin_id}/market_chart")
+async def market_chart(coin_id: str, vs_currency: str = 'usd', days: str = '30', interval: str = 'daily'):
+    n_days = market.history_days if days == 'max' else int(float(days)) + 1
+    df = market.history(coin_id, n_days)
+    ms = [int(ts.timestamp() * 1000) for ts in df.index]
+    supply = market.asset(coin_id).supply
+    return {
+        'prices': [[t, p] for t, p in zip(ms, df['close'].tolist())],
+        'market_caps': [[t, p * supply] for t, p in zip(ms, df['close'].tolist())],
+        'total_volumes': [[t, v * p] for t, v, p in zip(ms, df['volume'].tolist(), df['close'].tolist())],
+    }
+
+
+@app.get("/api/v3/coins/{coin_id}")
+async def coin_details(coin_id: str):
+    asset = market.asset(coin_id)
+    summary = market.summary(asset)
+    usd = ('current_price', 'market_cap', 'total_volume', 'high_24h', 'low_24h', 'ath', 'ath_change_percentage',
+           'ath_date', 'atl', 'atl_change_percentage', 'atl_date')
+    market_data = {key: ({'usd': value} if key in usd else value) for key, value in summary.items()
+                   if key not in ('id', 'symbol', 'name', 'image')}
+    market_data['market_cap_change_24h'] = summary['price_change_24h'] * asset.supply
+    market_data['market_cap_change_percentage_24h'] = summary['price_change_percentage_24h']
+    return {
+        'id': asset.id,
+        'symbol': asset.symbol,
+        'name': asset.name,
+        'image': {'large': summary['image']},
+        'description': {'en': f"Synthetic asset {asset.name} served by the local stand-in."},
+        'genesis_date': None,
+        'market_cap_rank': market.rank(asset),
+        'market_data': market_data,
+    }
+
+
+@app.get("/api/v3/search")
+async def search(query: str = ''):
+    query = query.lower()
+    matches = [asset for asset in market.assets.values()
+               if query and (query in asset.id or query == asset.symbol or query in asset.name.lower())]
+    return {'coins': [{'id': a.id, 'name': a.name, 'symbol': a.symbol.upper(), 'market_cap_rank': None}
+                      for a in matches[:25]]}
+
+
+@app.get("/data/v2/histoday")
+async def histoday(fsym: str, tsym: str = 'USD', limit: int = 30, api_key: Optional[str] = None):
+    if tsym.upper() != 'USD':
+        return {'Response': 'Error', 'Message': f"Only USD is supported, got {tsym}"}
+    df = market.history(fsym, min(limit, 2000) + 1)
+    return {
+        'Response': 'Success',
+        'Data': {
+            'TimeFrom': int(df.index[0].timestamp()),
+            'TimeTo': int(df.index[-1].timestamp()),
+            'Data': [
+                {'time': int(ts.timestamp()), 'open': o, 'high': h, 'low': lo, 'close': c,
+                 'volumefrom': v, 'volumeto': v * c}
+                for ts, o, h, lo, c, v in zip(df.index, df['open'], df['high'], df['low'], df['close'], df['volume'])
+            ],
+        },
+    }
+
+
+@app.get("/_standin/stats")
+async def standin_stats():
+    return {'assets': len(market.assets), 'faults': faults, **counters}
+
+
+@app.post("/_standin/config")
+async def standin_config(config: FaultConfig):
+    """Change fault injection while the server runs"""
+    faults.update({key: value for key, value in config.dict().items() if value is not None})
+    return faults
+
+
+def main(argv=None):
+    global market
+    parser = argparse.ArgumentParser(description="Offline stand-in for the market data APIs")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--assets', type=int, default=STANDIN_ASSETS)
+    parser.add_argument('--history-days', type=int, default=STANDIN_HISTORY_DAYS)
+    parser.add_argument('--seed', type=int, default=STANDIN_SEED)
+    parser.add_argument('--anchor-date', default=STANDIN_ANCHOR_DATE)
+    parser.add_argument('--latency-ms', type=float, default=STANDIN_LATENCY_MS)
+    parser.add_argument('--latency-jitter-ms', type=float, default=STANDIN_LATENCY_JITTER_MS)
+    parser.add_argument('--rate-limit-rate', type=float, default=STANDIN_RATE_LIMIT_RATE)
+    parser.add_argument('--failure-rate', type=float, default=STANDIN_FAILURE_RATE)
+    args = parser.parse_args(argv)
+
+    market = SyntheticMarket(args.assets, args.history_days, args.seed, args.anchor_date)
+    faults.update(latency_ms=args.latency_ms, latency_jitter_ms=args.latency_jitter_ms,
+                  rate_limit_rate=args.rate_limit_rate, failure_rate=args.failure_rate)
+    print(f"Serving {args.assets} synthetic assets on http://{args.host}:{args.port} "
+          f"(CoinGecko root /api/v3, CryptoCompare root /)")
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
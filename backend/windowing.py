@@ -0,0 +1,76 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(data, lookback, horizon=1):
+    """Every lookback-long window of data followed by `horizon` rows to predict
+
+    Returns a read-only (len(data) - lookback - horizon + 1, lookback, features)
+    strided view sharing memory with data, so building it copies nothing.
+    Window i covers rows i .. i + lookback - 1 and its targets are rows
+    i + lookback .. i + lookback + horizon - 1.
+    """
+    data = np.asarray(data)
+    return sliding_window_view(data[:len(data) - horizon], lookback, axis=0).transpose(0, 2, 1)
+
+
+def window_targets(data, lookback, column=0, horizon=1):
+    """Values of `column` following every window from sliding_windows
+
+    Shape (windows,) for horizon 1, otherwise a (windows, horizon) view.
+    """
+    values = np.asarray(data)[lookback:, column]
+    if horizon == 1:
+        return values
+    return sliding_window_view(values, horizon)
+
+
+def iter_batches(windows, targets, batch_size=32, shuffle=True, seed=None):
+    """Yield (X, y) batches forever, reshuffling once per pass over the windows
+
+    Only the rows of the current batch are copied out of the strided view.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(windows)
+    while True:
+        order = rng.permutation(n) if shuffle else np.arange(n)
+        for start in range(0, n, batch_size):
+            index = order[start:start + batch_size]
+            yield np.ascontiguousarray(windows[index], dtype=np.float32), targets[index].astype(np.float32)
+
+
+def training_batches(scaled_data, lookback, batch_size=32, validation_split=0.2, seed=None, horizon=1):
+    """Streaming replacement for model.fit(X, y, batch_size=..., validation_split=...)
+
+    Splits the windows the same way Keras' validation_split does (the last
+    fraction is held out, unshuffled) but never materializes the full
+    (samples, lookback, features) array.
+
+    Returns:
+        Keyword arguments for model.fit: x, steps_per_epoch and, when there is
+        a validation set, validation_data and validation_steps
+    """
+    windows = sliding_windows(scaled_data, lookback, horizon)
+    targets = window_targets(scaled_data, lookback, horizon=horizon)
+    return window_batches(windows, targets, batch_size, validation_split, seed)
+
+
+def window_batches(windows, targets, batch_size=32, validation_split=0.2, seed=None):
+    """training_batches for windows that were already built, e.g. scaled per origin
+
+    Returns:
+        Keyword arguments for model.fit, as training_batches
+    """
+    n_train = int(len(windows) * (1 - validation_split))
+    n_val = len(windows) - n_train
+    if n_train == 0:
+        raise ValueError(f"Not enough data to train: {len(windows)} windows of {windows.shape[1]} days")
+
+    fit_args = {
+        'x': iter_batches(windows[:n_train], targets[:n_train], batch_size, seed=seed),
+        'steps_per_epoch': -(-n_train // batch_size),
+    }
+    if n_val:
+        fit_args['validation_data'] = iter_batches(windows[n_train:], targets[n_train:], batch_size, shuffle=False)
+        fit_args['validation_steps'] = -(-n_val // batch_size)
+    return fit_args